@@ -0,0 +1,43 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Number of threads dedicated to database work
+# WAL mode lets readers run in parallel with the writer so a few threads go a long way
+DB_EXECUTOR_WORKERS = 4
+
+# Executor used only for SQLite calls so database I/O never competes with FastAPI's shared threadpool
+# Each executor thread keeps its own persistent connection through get_db
+_db_executor: Optional[ThreadPoolExecutor] = None
+
+def get_db_executor() -> ThreadPoolExecutor:
+    global _db_executor
+    
+    # Create the executor the first time it's needed
+    if _db_executor is None:
+        _db_executor = ThreadPoolExecutor(
+            max_workers=DB_EXECUTOR_WORKERS,
+            thread_name_prefix="db",
+        )
+        
+    return _db_executor
+
+async def run_in_db_executor(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    # Run the blocking database function on the DB executor and await its result without blocking the event loop
+    loop = asyncio.get_running_loop()
+    
+    return await loop.run_in_executor(
+        get_db_executor(),
+        functools.partial(func, *args, **kwargs)
+    )
+
+def shutdown_db_executor() -> None:
+    global _db_executor
+    
+    # Wait for in-flight database work to finish and release the executor threads
+    if _db_executor is not None:
+        _db_executor.shutdown(wait=True)
+        _db_executor = None
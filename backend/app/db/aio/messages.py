@@ -0,0 +1,29 @@
+from typing import List, Optional, Tuple
+from app.db import messages
+from app.db.aio.database import run_in_db_executor
+
+async def get_session_messages(session_id: str) -> List[Tuple[str, str, str]]:
+    # Get all messages associated with the session ID from the database
+    return await run_in_db_executor(messages.get_session_messages, session_id)
+
+async def search_messages(
+    match_query: str,
+    session_id: Optional[str],
+    model_id: Optional[str],
+    limit: int,
+    offset: int
+) -> List[Tuple[int, str, str, str, Optional[str], str, str, float, str]]:
+    # Get a page of messages matching the full-text query, best matches first
+    return await run_in_db_executor(messages.search_messages, match_query, session_id, model_id, limit, offset)
+
+async def insert_messages_batch(rows: List[Tuple[str, str, str, str]]) -> None:
+    # Insert every (session_id, model_id, role, content) row in a single transaction
+    await run_in_db_executor(messages.insert_messages_batch, rows)
+
+async def delete_session_messages(session_id: str) -> None:
+    # Delete all messages associated with a session
+    await run_in_db_executor(messages.delete_session_messages, session_id)
+
+async def delete_session_model_messages(session_id: str, model_id: str) -> None:
+    # Delete messages associated with session + model
+    await run_in_db_executor(messages.delete_session_model_messages, session_id, model_id)
@@ -0,0 +1,84 @@
+from typing import List, Optional, Tuple
+from app.db import model
+from app.db.aio.database import run_in_db_executor
+from app.utils.types.model_types import DownloadModelRequest
+
+async def delete_model(model_id: str) -> None:
+    # Delete model data from models + download tasks tables
+    await run_in_db_executor(model.delete_model, model_id)
+
+async def insert_pending_task(model_id: str) -> None:
+    # Insert pending download status for a model
+    await run_in_db_executor(model.insert_pending_task, model_id)
+
+async def enqueue_download_task(request: DownloadModelRequest) -> bool:
+    # Insert a pending download task, an existing one is only reset when its download failed / is corrupt
+    return await run_in_db_executor(model.enqueue_download_task, request)
+
+async def get_pending_download_tasks(limit: int) -> List[Tuple[str, Optional[str], bool, bool]]:
+    # Get the next pending downloads, highest priority + oldest first
+    return await run_in_db_executor(model.get_pending_download_tasks, limit)
+
+async def get_download_task_status(model_id: str) -> Optional[str]:
+    # Get the current status of a download task
+    return await run_in_db_executor(model.get_download_task_status, model_id)
+
+async def update_download_task_status(model_id: str, status: str) -> None:
+    # Set the status of a download task (paused, pending, ...)
+    await run_in_db_executor(model.update_download_task_status, model_id, status)
+
+async def requeue_interrupted_download_tasks() -> int:
+    # Put downloads that were running when the server stopped back in the queue
+    return await run_in_db_executor(model.requeue_interrupted_download_tasks)
+
+async def delete_download_task(model_id: str) -> None:
+    # Delete model data from download tasks table
+    await run_in_db_executor(model.delete_download_task, model_id)
+
+async def update_downloading_task(model_id: str) -> None:
+    # Update to downloading status for a model
+    await run_in_db_executor(model.update_downloading_task, model_id)
+
+async def update_download_progress(model_id: str, progress: int, bytes_downloaded: int, total_bytes: int, speed_bps: float) -> None:
+    # Update byte-level progress + throughput for a downloading model
+    await run_in_db_executor(model.update_download_progress, model_id, progress, bytes_downloaded, total_bytes, speed_bps)
+
+async def update_ready_task(model_id: str, local_path: str) -> None:
+    # Update to ready status for a model
+    await run_in_db_executor(model.update_ready_task, model_id, local_path)
+
+async def update_downloaded_task(model_id: str, local_path: str, revision: Optional[str]) -> None:
+    # Store where the files are + the commit they came from, the status changes once they are verified
+    await run_in_db_executor(model.update_downloaded_task, model_id, local_path, revision)
+
+async def update_failed_task(model_id: str) -> None:
+    # Update to error status for a model
+    await run_in_db_executor(model.update_failed_task, model_id)
+
+async def insert_model(request: DownloadModelRequest) -> None:
+    # Insert model into database if download is successful
+    await run_in_db_executor(model.insert_model, request)
+
+async def get_download_status() -> List[Tuple[str, str, int, Optional[str], int, int, float, Optional[float]]]:
+    # Get download statuses for all models
+    return await run_in_db_executor(model.get_download_status)
+
+async def get_download_task(model_id: str) -> Optional[Tuple[str, str, int, Optional[str], int, int, float, Optional[float]]]:
+    # Get the download status of a single model
+    return await run_in_db_executor(model.get_download_task, model_id)
+
+async def get_all_models() -> List[Tuple[str, str, bool, bool]]:
+    # Get all model data from database
+    return await run_in_db_executor(model.get_all_models)
+
+async def get_model_directory_path(model_id: str) -> Optional[Tuple[str]]:
+    # Get local directory path of model from database
+    return await run_in_db_executor(model.get_model_directory_path, model_id)
+
+async def update_verification_result(model_id: str, status: str, verified_at: Optional[float], errors: Optional[str]) -> None:
+    # Store the outcome of an integrity check, status becomes ready or corrupt
+    await run_in_db_executor(model.update_verification_result, model_id, status, verified_at, errors)
+
+async def get_verification_result(model_id: str) -> Optional[Tuple[str, Optional[str], Optional[float], Optional[str], Optional[str]]]:
+    # Get status, local path, the last integrity check result and the downloaded revision of a download
+    return await run_in_db_executor(model.get_verification_result, model_id)
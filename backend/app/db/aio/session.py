@@ -0,0 +1,19 @@
+from typing import List, Optional, Tuple
+from app.db import session
+from app.db.aio.database import run_in_db_executor
+
+async def insert_new_session(session_id: str, session_name: str) -> None:
+    # Insert a new session with a distinct ID + name into the database
+    await run_in_db_executor(session.insert_new_session, session_id, session_name)
+        
+async def get_all_sessions() -> List[Tuple[str, str]]:
+    # Retrieve all sessions from the database
+    return await run_in_db_executor(session.get_all_sessions)
+
+async def get_session(session_id: str) -> Optional[Tuple[str, str]]:
+    # Retrieve a single session, None if it doesn't exist
+    return await run_in_db_executor(session.get_session, session_id)
+
+async def delete_session(session_id: str) -> None:
+    # Delete session from the database
+    await run_in_db_executor(session.delete_session, session_id)
@@ -0,0 +1,42 @@
+from typing import List, Optional, Tuple
+from app.db.init_database import get_db
+from app.db.sql_queries import (
+    COUNT_BLOB_REFERENCES,
+    DELETE_MODEL_FILES,
+    GET_BLOB_STORE_USAGE,
+    GET_MODEL_FILE_HASH,
+    GET_MODEL_FILE_HASHES,
+    INSERT_MODEL_FILE,
+)
+
+def replace_model_files(model_id: str, rows: List[Tuple[str, str, str, int]]) -> None:
+    with get_db() as conn:
+        # Drop the previous file list of the model and store the new one in the same transaction
+        conn.execute(DELETE_MODEL_FILES, (model_id,))
+        conn.executemany(INSERT_MODEL_FILE, rows)
+
+def release_model_files(model_id: str) -> List[str]:
+    with get_db() as conn:
+        # Get the blobs the model references, then drop its references
+        hashes = [row[0] for row in conn.execute(GET_MODEL_FILE_HASHES, (model_id,)).fetchall()]
+        conn.execute(DELETE_MODEL_FILES, (model_id,))
+        
+        # Return the blobs no other model references anymore
+        return [
+            sha256 for sha256 in hashes
+            if conn.execute(COUNT_BLOB_REFERENCES, (sha256,)).fetchone()[0] == 0
+        ]
+
+def get_model_file_hash(model_id: str, path: str) -> Optional[str]:
+    with get_db() as conn:
+        # Get the blob a model file was linked to
+        row = conn.execute(GET_MODEL_FILE_HASH, (model_id, path)).fetchone()
+        
+    return row[0] if row else None
+
+def get_blob_store_usage() -> Tuple[int, int, int, int, int]:
+    with get_db() as conn:
+        # Get models, files, logical bytes, unique blobs and bytes actually stored on disk
+        row = conn.execute(GET_BLOB_STORE_USAGE).fetchone()
+        
+    return row
@@ -0,0 +1,66 @@
+from typing import Dict, List, Optional, Tuple
+from app.db.init_database import get_db
+from app.db.sql_queries import (
+    GET_CATALOG_LAST_MODIFIED,
+    GET_CATALOG_SYNC_STATE,
+    SEARCH_MODEL_CATALOG,
+    UPDATE_CATALOG_MODEL_COUNTS,
+    UPSERT_CATALOG_MODEL,
+    UPSERT_CATALOG_SYNC_STATE,
+)
+
+# Columns the catalog can be sorted by, keeps user input out of the ORDER BY clause
+CATALOG_SORT_COLUMNS = {
+    "downloads": "downloads",
+    "likes": "likes",
+    "trending_score": "trending_score",
+}
+
+def upsert_catalog_models(rows: List[Tuple]) -> None:
+    with get_db() as conn:
+        # Insert new catalog models or overwrite the ones that changed
+        conn.executemany(UPSERT_CATALOG_MODEL, rows)
+
+def update_catalog_model_counts(rows: List[Tuple[int, int, Optional[int], float, str]]) -> None:
+    with get_db() as conn:
+        # Refresh likes / downloads / trending for models whose files haven't changed
+        conn.executemany(UPDATE_CATALOG_MODEL_COUNTS, rows)
+
+def get_catalog_last_modified() -> Dict[str, Optional[str]]:
+    with get_db() as conn:
+        # Get the lastModified value of every fully synced catalog model
+        rows = conn.execute(GET_CATALOG_LAST_MODIFIED).fetchall()
+        
+    return dict(rows)
+
+def search_model_catalog(
+    match_query: Optional[str],
+    sort_by: str,
+    limit: int
+) -> List[Tuple[str, int, int, int, bool, bool, Optional[int]]]:
+    # Fall back to downloads if the sort column is unknown
+    order_column = CATALOG_SORT_COLUMNS.get(sort_by, "downloads")
+    
+    with get_db() as conn:
+        # Get the top catalog models matching the full-text query
+        rows = conn.execute(
+            SEARCH_MODEL_CATALOG.format(order_column=order_column),
+            (match_query, match_query, limit)
+        ).fetchall()
+        
+    return rows
+
+def get_catalog_sync_state() -> Optional[Tuple[float, Optional[str], int]]:
+    with get_db() as conn:
+        # Get last sync time, lastModified watermark and number of catalog models
+        row = conn.execute(GET_CATALOG_SYNC_STATE).fetchone()
+        
+    return row
+
+def set_catalog_sync_state(last_synced_at: float, watermark: Optional[str]) -> None:
+    with get_db() as conn:
+        # Record when the catalog was last synced
+        conn.execute(
+            UPSERT_CATALOG_SYNC_STATE,
+            (last_synced_at, watermark)
+        )
@@ -0,0 +1,29 @@
+from typing import Optional, Tuple
+from app.db.init_database import get_db
+from app.db.sql_queries import DELETE_EXPIRED_HUB_CACHE_ENTRIES, GET_HUB_CACHE_ENTRY, UPSERT_HUB_CACHE_ENTRY
+
+def get_hub_cache_entry(namespace: str, cache_key: str, now: float) -> Optional[Tuple[str, float]]:
+    with get_db() as conn:
+        # Get the cached JSON value + expiry if it hasn't expired yet
+        row = conn.execute(
+            GET_HUB_CACHE_ENTRY,
+            (namespace, cache_key, now)
+        ).fetchone()
+        
+    return row
+
+def set_hub_cache_entry(namespace: str, cache_key: str, value: str, expires_at: float) -> None:
+    with get_db() as conn:
+        # Insert or overwrite the cached JSON value
+        conn.execute(
+            UPSERT_HUB_CACHE_ENTRY,
+            (namespace, cache_key, value, expires_at)
+        )
+
+def delete_expired_hub_cache_entries(now: float) -> None:
+    with get_db() as conn:
+        # Remove every entry that has expired
+        conn.execute(
+            DELETE_EXPIRED_HUB_CACHE_ENTRIES,
+            (now,)
+        )
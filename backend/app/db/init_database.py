@@ -1,19 +1,46 @@
 import sqlite3
+import threading
 from contextlib import contextmanager
 from pathlib import Path
+from typing import List
 
+from app.db.migrations import run_migrations
 from app.db.sql_queries import (
     CREATE_SESSIONS_TABLE,
     CREATE_DOWNLOAD_TASKS_TABLE,
     CREATE_MESSAGES_TABLE,
     CREATE_MODELS_TABLE,
     ENABLE_FOREIGN_KEYS,
+    ENABLE_WAL_JOURNAL_MODE,
+    SET_BUSY_TIMEOUT,
+    SET_CACHE_SIZE,
+    SET_MMAP_SIZE,
+    SET_SYNCHRONOUS_NORMAL,
 )
 
 # Path to SQLite file (will be created if missing)
 # Resolves to FreeAI/backend/data/app.db
 DB_PATH = Path(__file__).resolve().parent.parent.parent / "data" / "app.db"
 
+# Memory map up to 256 MB of the database file so reads skip the read() syscall path
+DB_MMAP_SIZE = 256 * 1024 * 1024
+
+# Negative values are in KiB, so this gives each connection a ~64 MB page cache
+DB_CACHE_SIZE = -64 * 1024
+
+# How long (ms) a connection waits on a locked database before raising "database is locked"
+DB_BUSY_TIMEOUT = 5000
+
+# Every thread gets its own persistent connection (sqlite3 connections can't be shared across threads)
+_thread_local = threading.local()
+
+# Keep track of every connection that has been opened so they can all be closed on shutdown
+_open_connections: List[sqlite3.Connection] = []
+_open_connections_lock = threading.Lock()
+
+# Bumped every time the connections are closed so threads know their cached connection is stale
+_connections_generation: int = 0
+
 def init_db() -> None:
     # Init a connection variable
     connection: sqlite3.Connection = None
@@ -21,6 +48,10 @@ def init_db() -> None:
     try:
         # Create an app.db file at the DB_Path if it doesn't exist and create connection instance
         connection = sqlite3.connect(DB_PATH, isolation_level="DEFERRED")
+        
+        # Switch the database file to write-ahead logging so writers no longer block readers
+        # WAL mode is persistent, it only needs to be set once for the database file
+        connection.execute(ENABLE_WAL_JOURNAL_MODE)
 
         # Create database tables if they don't exist
         connection.execute(CREATE_SESSIONS_TABLE)
@@ -31,7 +62,10 @@ def init_db() -> None:
         # Save changes
         connection.commit()
         
-        print("[INFO]: Database initialized successfully.")
+        # Bring an existing database up to the latest schema version (indexes etc.)
+        schema_version: int = run_migrations(connection)
+        
+        print(f"[INFO]: Database initialized successfully (schema version {schema_version}).")
         
     except sqlite3.Error as error:
         if connection:
@@ -44,19 +78,48 @@ def init_db() -> None:
         if connection:
             connection.close()
 
+def _create_connection() -> sqlite3.Connection:
+    # Create an app.db file at the target DB_Path directory if it doesn't exist and create connection instance
+    # check_same_thread is disabled only so close_db_connections can close it on shutdown
+    # The connection itself is still only ever used by the thread that created it
+    connection = sqlite3.connect(DB_PATH, isolation_level="DEFERRED", check_same_thread=False)
+    
+    # Per connection settings, these only need to run once since the connection is reused
+    connection.execute(ENABLE_WAL_JOURNAL_MODE)
+    connection.execute(SET_SYNCHRONOUS_NORMAL)
+    connection.execute(SET_MMAP_SIZE.format(mmap_size=DB_MMAP_SIZE))
+    connection.execute(SET_CACHE_SIZE.format(cache_size=DB_CACHE_SIZE))
+    connection.execute(SET_BUSY_TIMEOUT.format(busy_timeout=DB_BUSY_TIMEOUT))
+    
+    # Enforce foreign key checking
+    # Seems I always need to run this query for cascade updates to take place in SQLite
+    connection.execute(ENABLE_FOREIGN_KEYS)
+    
+    # Register the connection so it can be closed when the server shuts down
+    with _open_connections_lock:
+        _open_connections.append(connection)
+    
+    return connection
+
+def _get_thread_connection() -> sqlite3.Connection:
+    # Reuse the connection already opened by this thread if it is still open
+    connection: sqlite3.Connection | None = getattr(_thread_local, "connection", None)
+    generation: int | None = getattr(_thread_local, "generation", None)
+    
+    # Otherwise open a new connection and pin it to this thread
+    if connection is None or generation != _connections_generation:
+        connection = _create_connection()
+        _thread_local.connection = connection
+        _thread_local.generation = _connections_generation
+        
+    return connection
+
 @contextmanager
 def get_db():
-    # Init connection variable to hold SQLite connection
-    connection: sqlite3.Connection = None
+    # Get the persistent SQLite connection that belongs to the calling thread
+    connection: sqlite3.Connection = _get_thread_connection()
     
     try:
-        # Create an app.db file at the target DB_Path directory if it doesn't exist and create connection instance
-        connection = sqlite3.connect(DB_PATH, isolation_level="DEFERRED")
-        
-        # Enforce foreign key checking
-        # Seems I always need to run this query for cascade updates to take place in SQLite
-        connection.execute(ENABLE_FOREIGN_KEYS)
-        
         # Return / yield the conenction object to be used
         yield connection
         
@@ -64,11 +127,39 @@ def get_db():
         connection.commit()
         
     except Exception:
-        if connection:
-            connection.rollback()
+        connection.rollback()
         raise
+
+def close_db_connections() -> None:
+    global _connections_generation
     
-    finally:
-        if connection:
+    # Grab every connection opened so far, clear the registry and invalidate cached thread connections
+    with _open_connections_lock:
+        connections = list(_open_connections)
+        _open_connections.clear()
+        _connections_generation += 1
+    
+    # Close each connection, if one fails to close we still want to close the rest
+    for connection in connections:
+        try:
             connection.close()
-            
\ No newline at end of file
+        except sqlite3.Error:
+            pass
+
+def close_thread_connection() -> None:
+    # Close the connection owned by the calling thread, used by short-lived threads before they exit
+    connection: sqlite3.Connection | None = getattr(_thread_local, "connection", None)
+    
+    if connection is None:
+        return
+    
+    _thread_local.connection = None
+    
+    with _open_connections_lock:
+        if connection in _open_connections:
+            _open_connections.remove(connection)
+    
+    try:
+        connection.close()
+    except sqlite3.Error:
+        pass
@@ -0,0 +1,28 @@
+from typing import List, Optional, Tuple
+from app.db.init_database import get_db
+from app.db.sql_queries import (
+    GET_ALL_MODEL_INVENTORY,
+    GET_MODEL_INVENTORY,
+    UPSERT_MODEL_INVENTORY,
+)
+
+InventoryRow = Tuple[str, Optional[str], int, Optional[str], Optional[int], int, int, int, int, int]
+
+def upsert_model_inventory(row: Tuple) -> None:
+    with get_db() as conn:
+        # Insert or overwrite the scanned metadata of a model
+        conn.execute(UPSERT_MODEL_INVENTORY, row)
+
+def get_model_inventory(model_id: str) -> Optional[InventoryRow]:
+    with get_db() as conn:
+        # Get the scanned metadata of a model
+        row = conn.execute(GET_MODEL_INVENTORY, (model_id,)).fetchone()
+        
+    return row
+
+def get_all_model_inventory() -> List[InventoryRow]:
+    with get_db() as conn:
+        # Get the scanned metadata of every model
+        rows = conn.execute(GET_ALL_MODEL_INVENTORY).fetchall()
+        
+    return rows
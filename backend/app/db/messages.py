@@ -1,7 +1,6 @@
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 from app.db.init_database import get_db
-from app.utils.types.model_types import RunInferenceRequest
-from app.db.sql_queries import DELETE_MODEL_MESSAGES, DELETE_SESSION_MESSAGES, GET_SESSION_MESSAGES, INSERT_MESSAGE
+from app.db.sql_queries import DELETE_MODEL_MESSAGES, DELETE_SESSION_MESSAGES, GET_SESSION_MESSAGES, INSERT_SINGLE_MESSAGE, SEARCH_MESSAGES
 
 def get_session_messages(session_id: str) -> List[Tuple[str, str, str]]:
     with get_db() as conn:
@@ -11,17 +10,27 @@ def get_session_messages(session_id: str) -> List[Tuple[str, str, str]]:
     # Return session messages
     return rows
 
-def persist_user_and_assistant_message(request: RunInferenceRequest, inference_output: str ) -> None:
-    with get_db() as connection:
-        # Insert User + Assistant messages into the database
-        connection.execute(
-           INSERT_MESSAGE,
-            (
-                request.session_id, request.model_id, "user", request.prompt,
-                request.session_id, request.model_id, "assistant", inference_output
-            )
-        )
+def search_messages(
+    match_query: str,
+    session_id: Optional[str],
+    model_id: Optional[str],
+    limit: int,
+    offset: int
+) -> List[Tuple[int, str, str, str, Optional[str], str, str, float, str]]:
+    with get_db() as conn:
+        # Get a page of messages matching the full-text query, best matches first
+        rows = conn.execute(
+            SEARCH_MESSAGES,
+            (match_query, session_id, session_id, model_id, model_id, limit, offset)
+        ).fetchall()
         
+    return rows
+
+def insert_messages_batch(rows: List[Tuple[str, str, str, str]]) -> None:
+    with get_db() as connection:
+        # Insert every (session_id, model_id, role, content) row in a single transaction
+        connection.executemany(INSERT_SINGLE_MESSAGE, rows)
+
 def delete_session_messages(session_id: str):
     with get_db() as connection:
         # Delete all messages associated with a session
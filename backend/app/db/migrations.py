@@ -0,0 +1,194 @@
+import sqlite3
+from typing import List, Tuple
+
+from app.db.sql_queries import (
+    ADD_DOWNLOAD_TASKS_BYTES_DOWNLOADED_COLUMN,
+    ADD_DOWNLOAD_TASKS_IS_QUANTIZED_COLUMN,
+    ADD_DOWNLOAD_TASKS_IS_UNCENSORED_COLUMN,
+    ADD_DOWNLOAD_TASKS_MODEL_NAME_COLUMN,
+    ADD_DOWNLOAD_TASKS_PRIORITY_COLUMN,
+    ADD_DOWNLOAD_TASKS_QUEUED_AT_COLUMN,
+    ADD_DOWNLOAD_TASKS_REVISION_COLUMN,
+    ADD_DOWNLOAD_TASKS_SPEED_COLUMN,
+    ADD_DOWNLOAD_TASKS_TOTAL_BYTES_COLUMN,
+    ADD_DOWNLOAD_TASKS_VERIFICATION_ERRORS_COLUMN,
+    ADD_DOWNLOAD_TASKS_VERIFIED_AT_COLUMN,
+    ANALYZE_DATABASE,
+    BEGIN_TRANSACTION,
+    CREATE_MESSAGES_SESSION_MODEL_INDEX,
+    CREATE_MESSAGES_SESSION_TIMESTAMP_INDEX,
+    CREATE_MESSAGES_TIMESTAMP_INDEX,
+    CREATE_MESSAGES_FTS_DELETE_TRIGGER,
+    CREATE_MESSAGES_FTS_INSERT_TRIGGER,
+    CREATE_MESSAGES_FTS_TABLE,
+    CREATE_MESSAGES_FTS_UPDATE_TRIGGER,
+    CREATE_DOWNLOAD_TASKS_QUEUE_INDEX,
+    CREATE_HUB_CACHE_TABLE,
+    CREATE_MODEL_CATALOG_DOWNLOADS_INDEX,
+    CREATE_MODEL_CATALOG_FTS_DELETE_TRIGGER,
+    CREATE_MODEL_CATALOG_FTS_INSERT_TRIGGER,
+    CREATE_MODEL_CATALOG_FTS_TABLE,
+    CREATE_MODEL_CATALOG_FTS_UPDATE_TRIGGER,
+    CREATE_MODEL_CATALOG_LIKES_INDEX,
+    CREATE_MODEL_CATALOG_SYNC_TABLE,
+    CREATE_MODEL_CATALOG_TABLE,
+    CREATE_MODEL_CATALOG_TRENDING_INDEX,
+    CREATE_MODEL_FILES_SHA256_INDEX,
+    CREATE_MODEL_FILES_TABLE,
+    CREATE_MODEL_INVENTORY_TABLE,
+    CREATE_CONVERSATION_SUMMARIES_TABLE,
+    REBUILD_MESSAGES_FTS,
+    GET_SCHEMA_VERSION,
+    SET_SCHEMA_VERSION,
+)
+
+# Ordered list of (schema version, statements) pairs
+# Never edit or reorder a migration that has shipped, append a new version instead
+MIGRATIONS: List[Tuple[int, List[str]]] = [
+    (
+        1,
+        [
+            # GET_SESSION_MESSAGES, DELETE_SESSION_MESSAGES and the sessions ON DELETE CASCADE
+            CREATE_MESSAGES_SESSION_TIMESTAMP_INDEX,
+            # DELETE_MODEL_MESSAGES
+            CREATE_MESSAGES_SESSION_MODEL_INDEX,
+            # Time range scans / pruning old messages
+            CREATE_MESSAGES_TIMESTAMP_INDEX,
+            # Refresh planner statistics so the new indexes get picked
+            ANALYZE_DATABASE,
+        ],
+    ),
+    (
+        2,
+        [
+            # Full-text index over message content, external content so the text isn't stored twice
+            CREATE_MESSAGES_FTS_TABLE,
+            # Keep the index in sync with every write to messages
+            CREATE_MESSAGES_FTS_INSERT_TRIGGER,
+            CREATE_MESSAGES_FTS_DELETE_TRIGGER,
+            CREATE_MESSAGES_FTS_UPDATE_TRIGGER,
+            # Index the messages that already exist
+            REBUILD_MESSAGES_FTS,
+        ],
+    ),
+    (
+        3,
+        [
+            # On-disk cache of Hugging Face Hub search pages + model metadata
+            CREATE_HUB_CACHE_TABLE,
+        ],
+    ),
+    (
+        4,
+        [
+            # Local mirror of the Hub model catalog so search works offline
+            CREATE_MODEL_CATALOG_TABLE,
+            # Sorting by downloads / likes / trending
+            CREATE_MODEL_CATALOG_DOWNLOADS_INDEX,
+            CREATE_MODEL_CATALOG_LIKES_INDEX,
+            CREATE_MODEL_CATALOG_TRENDING_INDEX,
+            # Full-text search over model IDs + tags, kept in sync with triggers
+            CREATE_MODEL_CATALOG_FTS_TABLE,
+            CREATE_MODEL_CATALOG_FTS_INSERT_TRIGGER,
+            CREATE_MODEL_CATALOG_FTS_DELETE_TRIGGER,
+            CREATE_MODEL_CATALOG_FTS_UPDATE_TRIGGER,
+            # Last sync time + lastModified watermark for incremental syncs
+            CREATE_MODEL_CATALOG_SYNC_TABLE,
+        ],
+    ),
+    (
+        5,
+        [
+            # Byte-level download progress + throughput
+            ADD_DOWNLOAD_TASKS_BYTES_DOWNLOADED_COLUMN,
+            ADD_DOWNLOAD_TASKS_TOTAL_BYTES_COLUMN,
+            ADD_DOWNLOAD_TASKS_SPEED_COLUMN,
+        ],
+    ),
+    (
+        6,
+        [
+            # Everything needed to (re)start a queued download after a restart
+            ADD_DOWNLOAD_TASKS_MODEL_NAME_COLUMN,
+            ADD_DOWNLOAD_TASKS_IS_QUANTIZED_COLUMN,
+            ADD_DOWNLOAD_TASKS_IS_UNCENSORED_COLUMN,
+            # Queue ordering
+            ADD_DOWNLOAD_TASKS_PRIORITY_COLUMN,
+            ADD_DOWNLOAD_TASKS_QUEUED_AT_COLUMN,
+            CREATE_DOWNLOAD_TASKS_QUEUE_INDEX,
+        ],
+    ),
+    (
+        7,
+        [
+            # Content hash of every downloaded model file, shared blobs are referenced by several models
+            CREATE_MODEL_FILES_TABLE,
+            # Reference counting blobs on delete
+            CREATE_MODEL_FILES_SHA256_INDEX,
+        ],
+    ),
+    (
+        8,
+        [
+            # Parameter count / dtype / context length + memory estimates of downloaded models
+            CREATE_MODEL_INVENTORY_TABLE,
+        ],
+    ),
+    (
+        9,
+        [
+            # Result of the last integrity check of the downloaded files
+            ADD_DOWNLOAD_TASKS_VERIFIED_AT_COLUMN,
+            ADD_DOWNLOAD_TASKS_VERIFICATION_ERRORS_COLUMN,
+        ],
+    ),
+    (
+        10,
+        [
+            # Summaries of the oldest turns of long conversations, they replace those turns in the prompt
+            CREATE_CONVERSATION_SUMMARIES_TABLE,
+        ],
+    ),
+    (
+        11,
+        [
+            # Hub commit the files were downloaded from, integrity checks compare against it
+            ADD_DOWNLOAD_TASKS_REVISION_COLUMN,
+        ],
+    ),
+]
+
+def get_schema_version(connection: sqlite3.Connection) -> int:
+    # The schema version is stored in the database header via PRAGMA user_version
+    return connection.execute(GET_SCHEMA_VERSION).fetchone()[0]
+
+def run_migrations(connection: sqlite3.Connection) -> int:
+    # Get the version the database file is currently at
+    current_version: int = get_schema_version(connection)
+    
+    for version, statements in MIGRATIONS:
+        # Skip migrations that have already been applied
+        if version <= current_version:
+            continue
+        
+        try:
+            # Run each migration in its own transaction so a failure leaves the database at the previous version
+            # DDL doesn't open a transaction implicitly in sqlite3 so we start one ourselves
+            connection.execute(BEGIN_TRANSACTION)
+            
+            for statement in statements:
+                connection.execute(statement)
+            
+            # Record the new schema version in the same transaction
+            connection.execute(SET_SCHEMA_VERSION.format(version=version))
+            connection.commit()
+            
+        except sqlite3.Error:
+            connection.rollback()
+            raise
+        
+        print(f"[INFO]: Applied database migration {version}.")
+        current_version = version
+        
+    # Return the version the database is now at
+    return current_version
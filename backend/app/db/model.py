@@ -1,7 +1,29 @@
 from typing import List, Optional, Tuple
 from app.db.init_database import get_db
 from app.utils.types.model_types import DownloadModelRequest
-from app.db.sql_queries import DELETE_MODEL, DELETE_TASKS, GET_ALL_MODELS, GET_DOWNLOAD_STATUS, GET_MODEL_DIRECTORY_PATH, INSERT_MODEL, INSERT_PENDING_TASK, UPDATE_DOWNLOADING_TASK, UPDATE_FAILED_TASK, UPDATE_READY_TASK
+from app.db.sql_queries import (
+    DELETE_MODEL,
+    DELETE_MODEL_INVENTORY,
+    DELETE_TASKS,
+    ENQUEUE_DOWNLOAD_TASK,
+    GET_ALL_MODELS,
+    GET_DOWNLOAD_STATUS,
+    GET_DOWNLOAD_TASK,
+    GET_DOWNLOAD_TASK_STATUS,
+    GET_MODEL_DIRECTORY_PATH,
+    GET_PENDING_DOWNLOAD_TASKS,
+    GET_VERIFICATION_RESULT,
+    INSERT_MODEL,
+    INSERT_PENDING_TASK,
+    REQUEUE_INTERRUPTED_DOWNLOAD_TASKS,
+    UPDATE_DOWNLOAD_PROGRESS,
+    UPDATE_DOWNLOAD_TASK_STATUS,
+    UPDATE_DOWNLOADED_TASK,
+    UPDATE_DOWNLOADING_TASK,
+    UPDATE_FAILED_TASK,
+    UPDATE_READY_TASK,
+    UPDATE_VERIFICATION_RESULT,
+)
 
 def delete_model(model_id: str) -> None:
     with get_db() as conn:
@@ -16,6 +38,12 @@ def delete_model(model_id: str) -> None:
             DELETE_TASKS,
             (model_id,)
         )
+        
+        # Delete the model's inventory entry
+        conn.execute(
+            DELETE_MODEL_INVENTORY,
+            (model_id,)
+        )
 
 def insert_pending_task(model_id: str) -> None:
     with get_db() as conn:
@@ -25,6 +53,68 @@ def insert_pending_task(model_id: str) -> None:
             (model_id,),
         )
 
+def enqueue_download_task(request: DownloadModelRequest) -> bool:
+    with get_db() as conn:
+        # Insert a pending download task with everything needed to run it later
+        # An existing task is only reset when its download failed / is corrupt, returns False otherwise
+        cursor = conn.execute(
+            ENQUEUE_DOWNLOAD_TASK,
+            (
+                request.model_id,
+                request.model_name,
+                request.is_quantized,
+                request.is_uncensored,
+                request.priority,
+            ),
+        )
+
+    return cursor.rowcount > 0
+
+def get_pending_download_tasks(limit: int) -> List[Tuple[str, Optional[str], bool, bool]]:
+    with get_db() as conn:
+        # Get the next pending downloads, highest priority + oldest first
+        rows = conn.execute(
+            GET_PENDING_DOWNLOAD_TASKS,
+            (limit,),
+        ).fetchall()
+        
+    return rows
+
+def get_download_task_status(model_id: str) -> Optional[str]:
+    with get_db() as conn:
+        # Get the current status of a download task
+        row = conn.execute(
+            GET_DOWNLOAD_TASK_STATUS,
+            (model_id,),
+        ).fetchone()
+        
+    return row[0] if row else None
+
+def update_download_task_status(model_id: str, status: str) -> None:
+    with get_db() as conn:
+        # Set the status of a download task (paused, pending, ...)
+        conn.execute(
+            UPDATE_DOWNLOAD_TASK_STATUS,
+            (status, model_id),
+        )
+
+def requeue_interrupted_download_tasks() -> int:
+    with get_db() as conn:
+        # Put downloads that were running when the server stopped back in the queue
+        cursor = conn.execute(
+            REQUEUE_INTERRUPTED_DOWNLOAD_TASKS
+        )
+        
+    return cursor.rowcount
+
+def delete_download_task(model_id: str) -> None:
+    with get_db() as conn:
+        # Delete model data from download tasks table
+        conn.execute(
+            DELETE_TASKS,
+            (model_id,)
+        )
+
 def update_downloading_task(model_id: str) -> None:
     with get_db() as conn:
         # Update to downloading status for a model
@@ -33,6 +123,14 @@ def update_downloading_task(model_id: str) -> None:
             (model_id,),
         )
 
+def update_download_progress(model_id: str, progress: int, bytes_downloaded: int, total_bytes: int, speed_bps: float) -> None:
+    with get_db() as conn:
+        # Update byte-level progress + throughput for a downloading model
+        conn.execute(
+            UPDATE_DOWNLOAD_PROGRESS,
+            (progress, bytes_downloaded, total_bytes, speed_bps, model_id),
+        )
+
 def update_ready_task(model_id: str, local_path: str) -> None:
     with get_db() as conn:
         # Update to ready status for a model
@@ -41,6 +139,14 @@ def update_ready_task(model_id: str, local_path: str) -> None:
             (local_path, model_id),
         )
 
+def update_downloaded_task(model_id: str, local_path: str, revision: Optional[str]) -> None:
+    with get_db() as conn:
+        # Store where the files are + the commit they came from, the status changes once they are verified
+        conn.execute(
+            UPDATE_DOWNLOADED_TASK,
+            (local_path, revision, model_id),
+        )
+
 def update_failed_task(model_id: str) -> None:
     with get_db() as conn:
         # Update to error status for a model
@@ -62,7 +168,7 @@ def insert_model(request: DownloadModelRequest) -> None:
             ),
         )
         
-def get_download_status() -> List[Tuple[str, str, int, Optional[str]]]:
+def get_download_status() -> List[Tuple[str, str, int, Optional[str], int, int, float, Optional[float]]]:
     with get_db() as conn:
         # Get download statuses for all models
         rows = conn.execute(
@@ -71,6 +177,16 @@ def get_download_status() -> List[Tuple[str, str, int, Optional[str]]]:
         
     return rows
 
+def get_download_task(model_id: str) -> Optional[Tuple[str, str, int, Optional[str], int, int, float, Optional[float]]]:
+    with get_db() as conn:
+        # Get the download status of a single model
+        row = conn.execute(
+            GET_DOWNLOAD_TASK,
+            (model_id,)
+        ).fetchone()
+        
+    return row
+
 def get_all_models() -> List[Tuple[str, str, bool, bool]]:
     with get_db() as conn:
         # Get all model data from database
@@ -88,4 +204,22 @@ def get_model_directory_path(model_id: str) -> Optional[Tuple[str]]:
             (model_id,)
         ).fetchone()
         
-    return row 
\ No newline at end of file
+    return row 
+
+def update_verification_result(model_id: str, status: str, verified_at: Optional[float], errors: Optional[str]) -> None:
+    with get_db() as conn:
+        # Store the outcome of an integrity check, status becomes ready or corrupt
+        conn.execute(
+            UPDATE_VERIFICATION_RESULT,
+            (status, verified_at, errors, model_id),
+        )
+
+def get_verification_result(model_id: str) -> Optional[Tuple[str, Optional[str], Optional[float], Optional[str], Optional[str]]]:
+    with get_db() as conn:
+        # Get status, local path, the last integrity check result and the downloaded revision of a download
+        row = conn.execute(
+            GET_VERIFICATION_RESULT,
+            (model_id,)
+        ).fetchone()
+        
+    return row
@@ -1,6 +1,6 @@
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 from app.db.init_database import get_db
-from app.db.sql_queries import DELETE_SESSION, INSERT_NEW_SESSION, GET_ALL_SESSIONS
+from app.db.sql_queries import DELETE_SESSION, INSERT_NEW_SESSION, GET_ALL_SESSIONS, GET_SESSION
 
 def insert_new_session(session_id: str, session_name: str) -> None:
     with get_db() as connection:
@@ -14,6 +14,13 @@ def get_all_sessions() -> List[Tuple[str, str]]:
         
     return rows
 
+def get_session(session_id: str) -> Optional[Tuple[str, str]]:
+    with get_db() as connection:
+        # Retrieve a single session, None if it doesn't exist
+        row = connection.execute(GET_SESSION, (session_id,)).fetchone()
+        
+    return row
+
 def delete_session(session_id: str) -> None:
     with get_db() as connection:
         # Delete session from the database
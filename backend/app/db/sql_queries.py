@@ -65,6 +65,12 @@ GET_ALL_SESSIONS = (
     """
 )
 
+GET_SESSION = (
+    """
+        SELECT id, name FROM sessions WHERE id = ?
+    """
+)
+
 GET_SESSION_MESSAGES = (
     """
             SELECT
@@ -90,6 +96,13 @@ INSERT_MESSAGE = (
     """
 )
 
+INSERT_SINGLE_MESSAGE = (
+    """
+        INSERT INTO messages (session_id, model_id, role, content)
+        VALUES (?, ?, ?, ?)
+    """
+)
+
 DELETE_MODEL = (
     """
         DELETE FROM models WHERE model_id = ?
@@ -118,6 +131,14 @@ UPDATE_DOWNLOADING_TASK = (
     """
 )
 
+UPDATE_DOWNLOAD_PROGRESS = (
+    """
+        UPDATE download_tasks
+        SET progress = ?, bytes_downloaded = ?, total_bytes = ?, speed_bps = ?
+        WHERE model_id = ?
+    """
+)
+
 UPDATE_READY_TASK = (
     """
         UPDATE download_tasks
@@ -144,7 +165,8 @@ INSERT_MODEL = (
 
 GET_DOWNLOAD_STATUS = (
     """
-        SELECT model_id, status, progress, local_path FROM download_tasks
+        SELECT model_id, status, progress, local_path, bytes_downloaded, total_bytes, speed_bps, verified_at
+        FROM download_tasks
     """
 )
 
@@ -180,4 +202,624 @@ DELETE_SESSION_MESSAGES = (
 
 ENABLE_FOREIGN_KEYS = (
     "PRAGMA foreign_keys = ON;"
-)
\ No newline at end of file
+)
+
+ENABLE_WAL_JOURNAL_MODE = (
+    "PRAGMA journal_mode = WAL;"
+)
+
+SET_SYNCHRONOUS_NORMAL = (
+    "PRAGMA synchronous = NORMAL;"
+)
+
+SET_MMAP_SIZE = (
+    "PRAGMA mmap_size = {mmap_size};"
+)
+
+SET_CACHE_SIZE = (
+    "PRAGMA cache_size = {cache_size};"
+)
+
+SET_BUSY_TIMEOUT = (
+    "PRAGMA busy_timeout = {busy_timeout};"
+)
+
+GET_SCHEMA_VERSION = (
+    "PRAGMA user_version;"
+)
+
+SET_SCHEMA_VERSION = (
+    "PRAGMA user_version = {version};"
+)
+
+BEGIN_TRANSACTION = (
+    "BEGIN;"
+)
+
+CREATE_MESSAGES_SESSION_TIMESTAMP_INDEX = (
+    """
+        CREATE INDEX IF NOT EXISTS idx_messages_session_timestamp
+        ON messages (session_id, timestamp)
+    """
+)
+
+CREATE_MESSAGES_SESSION_MODEL_INDEX = (
+    """
+        CREATE INDEX IF NOT EXISTS idx_messages_session_model
+        ON messages (session_id, model_id)
+    """
+)
+
+CREATE_MESSAGES_TIMESTAMP_INDEX = (
+    """
+        CREATE INDEX IF NOT EXISTS idx_messages_timestamp
+        ON messages (timestamp)
+    """
+)
+
+ANALYZE_DATABASE = (
+    "ANALYZE;"
+)
+
+CREATE_MESSAGES_FTS_TABLE = (
+    """
+        CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+            content,
+            content = 'messages',
+            content_rowid = 'id',
+            tokenize = 'porter unicode61'
+        )
+    """
+)
+
+CREATE_MESSAGES_FTS_INSERT_TRIGGER = (
+    """
+        CREATE TRIGGER IF NOT EXISTS messages_fts_after_insert AFTER INSERT ON messages BEGIN
+            INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+        END
+    """
+)
+
+CREATE_MESSAGES_FTS_DELETE_TRIGGER = (
+    """
+        CREATE TRIGGER IF NOT EXISTS messages_fts_after_delete AFTER DELETE ON messages BEGIN
+            INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        END
+    """
+)
+
+CREATE_MESSAGES_FTS_UPDATE_TRIGGER = (
+    """
+        CREATE TRIGGER IF NOT EXISTS messages_fts_after_update AFTER UPDATE OF content ON messages BEGIN
+            INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+            INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+        END
+    """
+)
+
+REBUILD_MESSAGES_FTS = (
+    """
+        INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')
+    """
+)
+
+SEARCH_MESSAGES = (
+    """
+        SELECT
+            m.id,
+            m.session_id,
+            s.name,
+            m.model_id,
+            mdl.model_name,
+            m.role,
+            snippet(messages_fts, 0, '[', ']', '...', 16),
+            bm25(messages_fts) AS rank,
+            m.timestamp
+        FROM messages_fts
+        JOIN messages   AS m
+          ON m.id = messages_fts.rowid
+        JOIN sessions   AS s
+          ON s.id = m.session_id
+        LEFT JOIN models AS mdl
+          ON mdl.model_id = m.model_id
+        WHERE messages_fts MATCH ?
+          AND (? IS NULL OR m.session_id = ?)
+          AND (? IS NULL OR m.model_id = ?)
+        ORDER BY rank
+        LIMIT ? OFFSET ?
+    """
+)
+
+CREATE_HUB_CACHE_TABLE = (
+    """
+        CREATE TABLE IF NOT EXISTS hub_cache (
+            namespace  TEXT NOT NULL,
+            cache_key  TEXT NOT NULL,
+            value      TEXT NOT NULL,
+            expires_at REAL NOT NULL,
+            PRIMARY KEY (namespace, cache_key)
+        );
+    """
+)
+
+GET_HUB_CACHE_ENTRY = (
+    """
+        SELECT value, expires_at FROM hub_cache
+        WHERE namespace = ? AND cache_key = ? AND expires_at > ?
+    """
+)
+
+UPSERT_HUB_CACHE_ENTRY = (
+    """
+        INSERT OR REPLACE INTO hub_cache
+        (namespace, cache_key, value, expires_at)
+        VALUES (?, ?, ?, ?)
+    """
+)
+
+DELETE_EXPIRED_HUB_CACHE_ENTRIES = (
+    """
+        DELETE FROM hub_cache WHERE expires_at <= ?
+    """
+)
+
+CREATE_MODEL_CATALOG_TABLE = (
+    """
+        CREATE TABLE IF NOT EXISTS model_catalog (
+            id             INTEGER PRIMARY KEY AUTOINCREMENT,
+            model_id       TEXT    UNIQUE NOT NULL,
+            likes          INTEGER NOT NULL DEFAULT 0,
+            downloads      INTEGER NOT NULL DEFAULT 0,
+            trending_score INTEGER,
+            tags           TEXT    NOT NULL DEFAULT '',
+            size_bytes     INTEGER,
+            is_quantized   INTEGER NOT NULL DEFAULT 0,
+            is_uncensored  INTEGER NOT NULL DEFAULT 0,
+            last_modified  TEXT,
+            synced_at      REAL    NOT NULL
+        );
+    """
+)
+
+CREATE_MODEL_CATALOG_DOWNLOADS_INDEX = (
+    """
+        CREATE INDEX IF NOT EXISTS idx_model_catalog_downloads
+        ON model_catalog (downloads)
+    """
+)
+
+CREATE_MODEL_CATALOG_LIKES_INDEX = (
+    """
+        CREATE INDEX IF NOT EXISTS idx_model_catalog_likes
+        ON model_catalog (likes)
+    """
+)
+
+CREATE_MODEL_CATALOG_TRENDING_INDEX = (
+    """
+        CREATE INDEX IF NOT EXISTS idx_model_catalog_trending_score
+        ON model_catalog (trending_score)
+    """
+)
+
+CREATE_MODEL_CATALOG_FTS_TABLE = (
+    """
+        CREATE VIRTUAL TABLE IF NOT EXISTS model_catalog_fts USING fts5(
+            model_id,
+            tags,
+            content = 'model_catalog',
+            content_rowid = 'id'
+        )
+    """
+)
+
+CREATE_MODEL_CATALOG_FTS_INSERT_TRIGGER = (
+    """
+        CREATE TRIGGER IF NOT EXISTS model_catalog_fts_after_insert AFTER INSERT ON model_catalog BEGIN
+            INSERT INTO model_catalog_fts (rowid, model_id, tags) VALUES (new.id, new.model_id, new.tags);
+        END
+    """
+)
+
+CREATE_MODEL_CATALOG_FTS_DELETE_TRIGGER = (
+    """
+        CREATE TRIGGER IF NOT EXISTS model_catalog_fts_after_delete AFTER DELETE ON model_catalog BEGIN
+            INSERT INTO model_catalog_fts (model_catalog_fts, rowid, model_id, tags) VALUES ('delete', old.id, old.model_id, old.tags);
+        END
+    """
+)
+
+CREATE_MODEL_CATALOG_FTS_UPDATE_TRIGGER = (
+    """
+        CREATE TRIGGER IF NOT EXISTS model_catalog_fts_after_update AFTER UPDATE OF model_id, tags ON model_catalog BEGIN
+            INSERT INTO model_catalog_fts (model_catalog_fts, rowid, model_id, tags) VALUES ('delete', old.id, old.model_id, old.tags);
+            INSERT INTO model_catalog_fts (rowid, model_id, tags) VALUES (new.id, new.model_id, new.tags);
+        END
+    """
+)
+
+CREATE_MODEL_CATALOG_SYNC_TABLE = (
+    """
+        CREATE TABLE IF NOT EXISTS model_catalog_sync (
+            id             INTEGER PRIMARY KEY CHECK (id = 1),
+            last_synced_at REAL    NOT NULL,
+            watermark      TEXT
+        );
+    """
+)
+
+UPSERT_CATALOG_MODEL = (
+    """
+        INSERT INTO model_catalog
+        (model_id, likes, downloads, trending_score, tags, size_bytes, is_quantized, is_uncensored, last_modified, synced_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (model_id) DO UPDATE SET
+            likes          = excluded.likes,
+            downloads      = excluded.downloads,
+            trending_score = excluded.trending_score,
+            tags           = excluded.tags,
+            size_bytes     = excluded.size_bytes,
+            is_quantized   = excluded.is_quantized,
+            is_uncensored  = excluded.is_uncensored,
+            last_modified  = excluded.last_modified,
+            synced_at      = excluded.synced_at
+    """
+)
+
+UPDATE_CATALOG_MODEL_COUNTS = (
+    """
+        UPDATE model_catalog
+        SET likes = ?, downloads = ?, trending_score = ?, synced_at = ?
+        WHERE model_id = ?
+    """
+)
+
+GET_CATALOG_LAST_MODIFIED = (
+    """
+        SELECT model_id, last_modified FROM model_catalog WHERE size_bytes IS NOT NULL
+    """
+)
+
+SEARCH_MODEL_CATALOG = (
+    """
+        SELECT
+            c.model_id,
+            c.likes,
+            c.downloads,
+            c.size_bytes,
+            c.is_quantized,
+            c.is_uncensored,
+            c.trending_score
+        FROM model_catalog AS c
+        WHERE c.size_bytes > 0
+          AND (? IS NULL OR c.id IN (
+                SELECT rowid FROM model_catalog_fts WHERE model_catalog_fts MATCH ?
+          ))
+        ORDER BY c.{order_column} DESC
+        LIMIT ?
+    """
+)
+
+GET_CATALOG_SYNC_STATE = (
+    """
+        SELECT
+            s.last_synced_at,
+            s.watermark,
+            (SELECT COUNT(*) FROM model_catalog)
+        FROM model_catalog_sync AS s
+        WHERE s.id = 1
+    """
+)
+
+UPSERT_CATALOG_SYNC_STATE = (
+    """
+        INSERT OR REPLACE INTO model_catalog_sync (id, last_synced_at, watermark)
+        VALUES (1, ?, ?)
+    """
+)
+
+ADD_DOWNLOAD_TASKS_BYTES_DOWNLOADED_COLUMN = (
+    """
+        ALTER TABLE download_tasks ADD COLUMN bytes_downloaded INTEGER NOT NULL DEFAULT 0
+    """
+)
+
+ADD_DOWNLOAD_TASKS_TOTAL_BYTES_COLUMN = (
+    """
+        ALTER TABLE download_tasks ADD COLUMN total_bytes INTEGER NOT NULL DEFAULT 0
+    """
+)
+
+ADD_DOWNLOAD_TASKS_SPEED_COLUMN = (
+    """
+        ALTER TABLE download_tasks ADD COLUMN speed_bps REAL NOT NULL DEFAULT 0
+    """
+)
+
+ADD_DOWNLOAD_TASKS_MODEL_NAME_COLUMN = (
+    """
+        ALTER TABLE download_tasks ADD COLUMN model_name TEXT
+    """
+)
+
+ADD_DOWNLOAD_TASKS_IS_QUANTIZED_COLUMN = (
+    """
+        ALTER TABLE download_tasks ADD COLUMN is_quantized INTEGER NOT NULL DEFAULT 0
+    """
+)
+
+ADD_DOWNLOAD_TASKS_IS_UNCENSORED_COLUMN = (
+    """
+        ALTER TABLE download_tasks ADD COLUMN is_uncensored INTEGER NOT NULL DEFAULT 0
+    """
+)
+
+ADD_DOWNLOAD_TASKS_PRIORITY_COLUMN = (
+    """
+        ALTER TABLE download_tasks ADD COLUMN priority INTEGER NOT NULL DEFAULT 0
+    """
+)
+
+ADD_DOWNLOAD_TASKS_QUEUED_AT_COLUMN = (
+    """
+        ALTER TABLE download_tasks ADD COLUMN queued_at DATETIME
+    """
+)
+
+CREATE_DOWNLOAD_TASKS_QUEUE_INDEX = (
+    """
+        CREATE INDEX IF NOT EXISTS idx_download_tasks_queue
+        ON download_tasks (status, priority DESC, queued_at)
+    """
+)
+
+ENQUEUE_DOWNLOAD_TASK = (
+    """
+        INSERT INTO download_tasks
+        (model_id, status, progress, local_path, model_name, is_quantized, is_uncensored, priority, queued_at)
+        VALUES (?, 'pending', 0, NULL, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(model_id) DO UPDATE SET
+            status = 'pending',
+            progress = 0,
+            model_name = excluded.model_name,
+            is_quantized = excluded.is_quantized,
+            is_uncensored = excluded.is_uncensored,
+            priority = excluded.priority,
+            queued_at = excluded.queued_at
+        WHERE download_tasks.status IN ('failed', 'corrupt')
+    """
+)
+
+GET_PENDING_DOWNLOAD_TASKS = (
+    """
+        SELECT model_id, model_name, is_quantized, is_uncensored
+        FROM download_tasks
+        WHERE status = 'pending'
+        ORDER BY priority DESC, queued_at
+        LIMIT ?
+    """
+)
+
+GET_DOWNLOAD_TASK_STATUS = (
+    """
+        SELECT status FROM download_tasks WHERE model_id = ?
+    """
+)
+
+UPDATE_DOWNLOAD_TASK_STATUS = (
+    """
+        UPDATE download_tasks
+        SET status = ?, speed_bps = 0
+        WHERE model_id = ?
+    """
+)
+
+REQUEUE_INTERRUPTED_DOWNLOAD_TASKS = (
+    """
+        UPDATE download_tasks
+        SET status = 'pending', speed_bps = 0
+        WHERE status = 'downloading'
+    """
+)
+
+CREATE_MODEL_FILES_TABLE = (
+    """
+        CREATE TABLE IF NOT EXISTS model_files (
+            model_id TEXT    NOT NULL,
+            path     TEXT    NOT NULL,
+            sha256   TEXT    NOT NULL,
+            size     INTEGER NOT NULL,
+            PRIMARY KEY (model_id, path)
+        );
+    """
+)
+
+CREATE_MODEL_FILES_SHA256_INDEX = (
+    """
+        CREATE INDEX IF NOT EXISTS idx_model_files_sha256
+        ON model_files (sha256);
+    """
+)
+
+INSERT_MODEL_FILE = (
+    """
+        INSERT OR REPLACE INTO model_files
+        (model_id, path, sha256, size)
+        VALUES (?, ?, ?, ?)
+    """
+)
+
+GET_MODEL_FILE_HASHES = (
+    """
+        SELECT DISTINCT sha256 FROM model_files WHERE model_id = ?
+    """
+)
+
+DELETE_MODEL_FILES = (
+    """
+        DELETE FROM model_files WHERE model_id = ?
+    """
+)
+
+COUNT_BLOB_REFERENCES = (
+    """
+        SELECT COUNT(*) FROM model_files WHERE sha256 = ?
+    """
+)
+
+GET_BLOB_STORE_USAGE = (
+    """
+        SELECT
+            COUNT(DISTINCT model_id),
+            COUNT(*),
+            COALESCE(SUM(size), 0),
+            COUNT(DISTINCT sha256),
+            (SELECT COALESCE(SUM(size), 0) FROM (SELECT MAX(size) AS size FROM model_files GROUP BY sha256))
+        FROM model_files
+    """
+)
+
+CREATE_MODEL_INVENTORY_TABLE = (
+    """
+        CREATE TABLE IF NOT EXISTS model_inventory (
+            model_id        TEXT PRIMARY KEY,
+            architecture    TEXT,
+            parameter_count INTEGER NOT NULL,
+            dtype           TEXT,
+            context_length  INTEGER,
+            weights_bytes   INTEGER NOT NULL,
+            memory_fp32     INTEGER NOT NULL,
+            memory_fp16     INTEGER NOT NULL,
+            memory_8bit     INTEGER NOT NULL,
+            memory_4bit     INTEGER NOT NULL,
+            scanned_at      REAL    NOT NULL
+        );
+    """
+)
+
+UPSERT_MODEL_INVENTORY = (
+    """
+        INSERT OR REPLACE INTO model_inventory
+        (model_id, architecture, parameter_count, dtype, context_length, weights_bytes,
+         memory_fp32, memory_fp16, memory_8bit, memory_4bit, scanned_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """
+)
+
+GET_MODEL_INVENTORY = (
+    """
+        SELECT model_id, architecture, parameter_count, dtype, context_length, weights_bytes,
+               memory_fp32, memory_fp16, memory_8bit, memory_4bit
+        FROM model_inventory
+        WHERE model_id = ?
+    """
+)
+
+GET_ALL_MODEL_INVENTORY = (
+    """
+        SELECT model_id, architecture, parameter_count, dtype, context_length, weights_bytes,
+               memory_fp32, memory_fp16, memory_8bit, memory_4bit
+        FROM model_inventory
+    """
+)
+
+DELETE_MODEL_INVENTORY = (
+    """
+        DELETE FROM model_inventory WHERE model_id = ?
+    """
+)
+
+ADD_DOWNLOAD_TASKS_VERIFIED_AT_COLUMN = (
+    """
+        ALTER TABLE download_tasks ADD COLUMN verified_at REAL
+    """
+)
+
+ADD_DOWNLOAD_TASKS_VERIFICATION_ERRORS_COLUMN = (
+    """
+        ALTER TABLE download_tasks ADD COLUMN verification_errors TEXT
+    """
+)
+
+UPDATE_VERIFICATION_RESULT = (
+    """
+        UPDATE download_tasks
+        SET status = ?, verified_at = ?, verification_errors = ?
+        WHERE model_id = ?
+    """
+)
+
+GET_VERIFICATION_RESULT = (
+    """
+        SELECT status, local_path, verified_at, verification_errors, revision FROM download_tasks WHERE model_id = ?
+    """
+)
+
+ADD_DOWNLOAD_TASKS_REVISION_COLUMN = (
+    """
+        ALTER TABLE download_tasks ADD COLUMN revision TEXT
+    """
+)
+
+UPDATE_DOWNLOADED_TASK = (
+    """
+        UPDATE download_tasks
+        SET local_path = ?, revision = ?
+        WHERE model_id = ?
+    """
+)
+
+GET_MODEL_FILE_HASH = (
+    """
+        SELECT sha256 FROM model_files WHERE model_id = ? AND path = ?
+    """
+)
+
+GET_DOWNLOAD_TASK = (
+    """
+        SELECT model_id, status, progress, local_path, bytes_downloaded, total_bytes, speed_bps, verified_at
+        FROM download_tasks
+        WHERE model_id = ?
+    """
+)
+
+CREATE_CONVERSATION_SUMMARIES_TABLE = (
+    """
+        CREATE TABLE IF NOT EXISTS conversation_summaries (
+            session_id          TEXT    NOT NULL,
+            model_id            TEXT    NOT NULL,
+            summary             TEXT    NOT NULL,
+            summarized_messages INTEGER NOT NULL,
+            updated_at          REAL    NOT NULL,
+            PRIMARY KEY (session_id, model_id),
+            FOREIGN KEY(session_id) REFERENCES sessions(id)
+            ON DELETE CASCADE
+        );
+    """
+)
+
+UPSERT_CONVERSATION_SUMMARY = (
+    """
+        INSERT OR REPLACE INTO conversation_summaries
+        (session_id, model_id, summary, summarized_messages, updated_at)
+        VALUES (?, ?, ?, ?, ?)
+    """
+)
+
+GET_SESSION_SUMMARIES = (
+    """
+        SELECT model_id, summary, summarized_messages FROM conversation_summaries WHERE session_id = ?
+    """
+)
+
+DELETE_SESSION_SUMMARIES = (
+    """
+        DELETE FROM conversation_summaries WHERE session_id = ?
+    """
+)
+
+DELETE_MODEL_SUMMARY = (
+    """
+        DELETE FROM conversation_summaries WHERE session_id = ? AND model_id = ?
+    """
+)
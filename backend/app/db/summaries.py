@@ -0,0 +1,31 @@
+import time
+from typing import List, Tuple
+from app.db.init_database import get_db
+from app.db.sql_queries import (
+    DELETE_MODEL_SUMMARY,
+    DELETE_SESSION_SUMMARIES,
+    GET_SESSION_SUMMARIES,
+    UPSERT_CONVERSATION_SUMMARY,
+)
+
+def upsert_conversation_summary(session_id: str, model_id: str, summary: str, summarized_messages: int) -> None:
+    with get_db() as conn:
+        # Insert or overwrite the summary of a session + model's oldest messages
+        conn.execute(UPSERT_CONVERSATION_SUMMARY, (session_id, model_id, summary, summarized_messages, time.time()))
+
+def get_session_summaries(session_id: str) -> List[Tuple[str, str, int]]:
+    with get_db() as conn:
+        # Get the (model_id, summary, summarized_messages) rows of a session
+        rows = conn.execute(GET_SESSION_SUMMARIES, (session_id,)).fetchall()
+        
+    return rows
+
+def delete_session_summaries(session_id: str) -> None:
+    with get_db() as conn:
+        # Delete the summaries of every model in a session
+        conn.execute(DELETE_SESSION_SUMMARIES, (session_id,))
+        
+def delete_model_summary(session_id: str, model_id: str) -> None:
+    with get_db() as conn:
+        # Delete the summary of a session + model
+        conn.execute(DELETE_MODEL_SUMMARY, (session_id, model_id))
@@ -1,6 +1,13 @@
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.db.init_database import init_db
+from app.db.aio.database import shutdown_db_executor
+from app.db.init_database import close_db_connections, init_db
+from app.services.cache.message_writer import start_message_writer, stop_message_writer
+from app.services.events.status_events import start_status_events
+from app.services.model.catalog_service import run_catalog_sync_loop
+from app.services.model.download_scheduler import resume_download_queue, stop_download_queue
+from app.services.model.hub_cache import prune_expired_hub_cache
 from contextlib import asynccontextmanager
 from app.routers.session_router import (
     router as session_router
@@ -8,13 +15,50 @@ from app.routers.session_router import (
 from app.routers.model_router import (
     router as model_router
 )
+from app.routers.chat_router import (
+    router as chat_router
+)
+from app.routers.openai_router import (
+    router as openai_router
+)
 
 # Lifespan function that will be executed before FastAPI starts listening to requests
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Init Databse ex: create database file + add tables if don't exist
     init_db()
+    
+    # Drop expired Hugging Face Hub cache entries left over from previous runs
+    await prune_expired_hub_cache()
+    
+    # Start the background writer that batches chat messages into the database
+    start_message_writer()
+    
+    # Restart downloads that were queued or running when the server last stopped
+    resume_download_queue()
+    
+    # Push download / load status changes to event stream subscribers
+    start_status_events()
+    
+    # Keep the local model catalog in sync with the Hub in the background
+    catalog_sync_task = asyncio.create_task(run_catalog_sync_loop())
     yield
+    
+    # Stop the catalog sync loop
+    catalog_sync_task.cancel()
+    
+    # Stop running downloads, they stay queued and resume on the next start
+    # Waiting for the download threads blocks, keep it off the event loop
+    await asyncio.to_thread(stop_download_queue)
+    
+    # Flush any queued chat messages before shutting down
+    stop_message_writer()
+    
+    # Let in-flight database work finish before the connections are closed
+    shutdown_db_executor()
+    
+    # Close the persistent per-thread database connections on shutdown
+    close_db_connections()
 
 # Create FastAPI app instance and pass in lifespan function
 app = FastAPI(lifespan=lifespan)
@@ -33,6 +77,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Add custom routers for session and model handlers
+# Add custom routers for session, model and chat handlers
 app.include_router(session_router, prefix="/api")
-app.include_router(model_router, prefix="/api")
\ No newline at end of file
+app.include_router(model_router, prefix="/api")
+app.include_router(chat_router, prefix="/api")
+
+# OpenAI-compatible API lives at /v1 so SDKs can use the server root as their base URL
+app.include_router(openai_router)
\ No newline at end of file
@@ -0,0 +1,53 @@
+from fastapi import APIRouter, HTTPException, WebSocket, status
+from fastapi.responses import StreamingResponse
+
+from app.services.chat.chat_service import svc_handle_chat_socket
+from app.services.chat.compare_service import (
+    InvalidComparisonError,
+    ModelNotResidentError,
+    svc_stream_model_comparison,
+)
+from app.services.model.inference_queue import AdmissionRejected
+from app.utils.types.chat_types import CompareModelsRequest
+
+router = APIRouter(prefix="/chat", tags=["chat"])
+
+@router.websocket("/ws")
+async def chat_socket_route(websocket: WebSocket):
+    # One socket streams generations for several sessions at once
+    # Client sends {"type": "generate", "request_id", ...inference fields} or {"type": "cancel", "request_id"}
+    # Server replies with token / done / cancelled / committed / error events tagged with the request_id
+    await svc_handle_chat_socket(websocket)
+
+@router.post("/compare", status_code=status.HTTP_200_OK)
+async def compare_models_route(request: CompareModelsRequest):
+    # Runs the prompt on every listed model at the same time (each must be loaded, see keep_loaded)
+    # Streams server-sent events named after the chat socket events, tagged with the model_id,
+    # then a summary event with each model's time + the wall-clock time of the comparison
+    try:
+        events = await svc_stream_model_comparison(request)
+
+    except ModelNotResidentError as exception:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exception))
+
+    except InvalidComparisonError as exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exception))
+
+    except AdmissionRejected as exception:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(exception),
+            headers={"Retry-After": str(exception.retry_after)},
+        )
+
+    except Exception as exception:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to compare models: {exception}"
+        )
+
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,45 +1,90 @@
-from typing import List
+from typing import List, Optional
 
 from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import StreamingResponse
 from starlette.background import BackgroundTasks
 
 from app.services.cache.cache_service import (
     svc_clear_session_cache,
     svc_get_chat_history,
+    svc_get_message_writer_metrics,
 )
+from app.services.model.cpu_topology import InvalidWorkerPlacement
+from app.services.model.download_scheduler import DownloadTaskNotFoundError, DownloadTaskStateError
+from app.services.model.inference_queue import AdmissionRejected, DeadlineExceeded
+from app.services.model.inventory_service import InsufficientMemoryError
 from app.services.model.model_service import (
+    svc_cancel_model_download,
+    svc_check_model_fit,
     svc_delete_model,
+    svc_get_catalog_status,
     svc_get_all_models,
     svc_get_available_models,
+    svc_get_download_plan,
+    svc_get_download_queue_settings,
     svc_get_download_statuses,
+    svc_get_hub_cache_stats,
+    svc_get_inference_position,
+    svc_get_inference_queues,
+    svc_get_kv_snapshot_status,
     svc_get_load_statuses,
+    svc_get_model_inventory,
+    svc_get_storage_usage,
+    svc_get_worker_replicas,
+    svc_unload_model,
+    svc_pause_model_download,
+    svc_resume_model_download,
     svc_run_local_inference,
+    svc_schedule_catalog_sync,
+    svc_schedule_model_deduplication,
     svc_schedule_model_download,
     svc_schedule_model_load,
+    svc_stream_status_events,
+    svc_update_download_queue_settings,
+    svc_verify_model,
 )
 from app.utils.types.cache_types import (
     ClearSessionCacheRequest,
     GetChatHistoryData,
     GetChatHistoryRequest,
     GetChatHistoryResponse,
+    MessageWriterMetrics,
 )
 from app.utils.types.common_types import SuccessMessageResponse
 from app.utils.types.model_types import (
+    BlobStoreUsage,
+    CatalogSyncStatus,
     DeleteModelRequest,
     DownloadModelRequest,
     DownloadModelResponse,
+    DownloadPlanResponse,
+    DownloadQueueSettings,
+    DownloadTaskRequest,
     GetAllModelsResponse,
+    KvSnapshotStatus,
+    HubCacheStats,
+    HubCacheStatsResponse,
+    InferencePositionResponse,
+    InferenceQueueResponse,
+    InferenceQueueStatus,
     LoadModelRequest,
     LoadModelResponse,
     ModelData,
     ModelDownloadStatus,
+    ModelFitCheck,
+    ModelInventory,
+    ModelInventoryResponse,
     ModelDownloadStatusResponse,
     ModelLoadStatus,
+    ModelVerificationResult,
     RunInferenceRequest,
     RunInferenceResponse,
     SearchModelsRequest,
     SearchModelsResponse,
     SearchModelsResults,
+    ModelReplicas,
+    UnloadModelRequest,
+    WorkerReplicasResponse,
 )
 
 
@@ -59,11 +104,55 @@ async def search_models_route(request: SearchModelsRequest):
     # Return the list of models found {models: models}
     return SearchModelsResponse(models=models)
 
+@router.get("/models/search/cache", response_model=HubCacheStatsResponse, status_code=status.HTTP_200_OK)
+def get_hub_cache_stats_route():
+    try:
+        # Retrieve hit rates of the Hugging Face Hub caches
+        caches: List[HubCacheStats] = svc_get_hub_cache_stats()
+    except Exception as exception:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error retrieving search cache stats: {exception}"
+        )
+        
+    # Return the cache stats as a JSON response
+    return HubCacheStatsResponse(caches=caches)
+
+@router.get("/models/catalog", response_model=CatalogSyncStatus, status_code=status.HTTP_200_OK)
+async def get_catalog_status_route():
+    try:
+        # Retrieve the sync status of the local model catalog
+        catalog_status: CatalogSyncStatus = await svc_get_catalog_status()
+    except Exception as exception:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to retrieve model catalog status: {exception}"
+        )
+        
+    # Return the catalog status as a JSON response
+    return catalog_status
+
+@router.post("/models/catalog/sync", response_model=SuccessMessageResponse, status_code=status.HTTP_202_ACCEPTED)
+def sync_catalog_route(background_task: BackgroundTasks):
+    try:
+        # Schedule an incremental sync of the local model catalog
+        svc_schedule_catalog_sync(background_task)
+    except Exception as exception:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to schedule model catalog sync: {exception}"
+        )
+    
+    # Return JSON response indicating the sync has been scheduled
+    return SuccessMessageResponse(message="Model catalog sync scheduled")
+
 @router.post("/models/download", response_model=DownloadModelResponse, status_code=status.HTTP_202_ACCEPTED)
-def download_model_route(request: DownloadModelRequest, background_task: BackgroundTasks):
+async def download_model_route(request: DownloadModelRequest):
     try:
-        # Schedule the download of the model in a background task
-        svc_schedule_model_download(request, background_task)
+        # Add the model to the download queue
+        await svc_schedule_model_download(request)
+    except DownloadTaskStateError as exception:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exception))
     except Exception as exception:
         raise HTTPException(
             status.HTTP_500_INTERNAL_SERVER_ERROR, 
@@ -76,11 +165,107 @@ def download_model_route(request: DownloadModelRequest, background_task: Backgro
         status="scheduled",
     )
 
+@router.post("/models/download/plan", response_model=DownloadPlanResponse, status_code=status.HTTP_200_OK)
+async def get_download_plan_route(request: DownloadTaskRequest):
+    try:
+        # Work out which files a download would fetch + their total size
+        plan: DownloadPlanResponse = await svc_get_download_plan(request.model_id)
+    except Exception as exception:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to plan download: {exception}"
+        )
+    
+    # Return the planned files + sizes as a JSON response
+    return plan
+
+@router.post("/models/download/pause", response_model=SuccessMessageResponse, status_code=status.HTTP_200_OK)
+async def pause_download_route(request: DownloadTaskRequest):
+    try:
+        # Pause the download, finished ranges are kept so it can resume later
+        await svc_pause_model_download(request.model_id)
+    except DownloadTaskNotFoundError as exception:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exception))
+    except DownloadTaskStateError as exception:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exception))
+    except Exception as exception:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to pause download: {exception}"
+        )
+    
+    # Return JSON response indicating the download was paused
+    return SuccessMessageResponse(message="Download paused")
+
+@router.post("/models/download/resume", response_model=SuccessMessageResponse, status_code=status.HTTP_200_OK)
+async def resume_download_route(request: DownloadTaskRequest):
+    try:
+        # Put the paused / failed download back in the queue
+        await svc_resume_model_download(request.model_id)
+    except DownloadTaskNotFoundError as exception:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exception))
+    except DownloadTaskStateError as exception:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exception))
+    except Exception as exception:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to resume download: {exception}"
+        )
+    
+    # Return JSON response indicating the download was queued again
+    return SuccessMessageResponse(message="Download resumed")
+
+@router.post("/models/download/cancel", response_model=SuccessMessageResponse, status_code=status.HTTP_200_OK)
+async def cancel_download_route(request: DownloadTaskRequest):
+    try:
+        # Cancel the download and remove its partial files
+        await svc_cancel_model_download(request.model_id)
+    except DownloadTaskNotFoundError as exception:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exception))
+    except DownloadTaskStateError as exception:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exception))
+    except Exception as exception:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to cancel download: {exception}"
+        )
+    
+    # Return JSON response indicating the download was cancelled
+    return SuccessMessageResponse(message="Download cancelled")
+
+@router.get("/models/download/settings", response_model=DownloadQueueSettings, status_code=status.HTTP_200_OK)
+def get_download_settings_route():
+    try:
+        # Retrieve max concurrent downloads + bandwidth cap
+        settings: DownloadQueueSettings = svc_get_download_queue_settings()
+    except Exception as exception:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to retrieve download settings: {exception}"
+        )
+    
+    # Return the download settings as a JSON response
+    return settings
+
+@router.post("/models/download/settings", response_model=DownloadQueueSettings, status_code=status.HTTP_200_OK)
+async def update_download_settings_route(request: DownloadQueueSettings):
+    try:
+        # Update max concurrent downloads + bandwidth cap
+        settings: DownloadQueueSettings = await svc_update_download_queue_settings(request)
+    except Exception as exception:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to update download settings: {exception}"
+        )
+    
+    # Return the updated download settings as a JSON response
+    return settings
+
 @router.post("/models/delete", response_model=SuccessMessageResponse, status_code=status.HTTP_200_OK)
-def delete_model_route(request: DeleteModelRequest):
+async def delete_model_route(request: DeleteModelRequest):
     try:
         # Attempt to delete the model using the provided model_id
-        svc_delete_model(request.model_id)
+        await svc_delete_model(request.model_id)
     except Exception as exception:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -90,11 +275,53 @@ def delete_model_route(request: DeleteModelRequest):
     # Return JSON response indicating successful deletion
     return SuccessMessageResponse(message="Model deleted successfully")
     
+@router.post("/models/verify", response_model=ModelVerificationResult, status_code=status.HTTP_200_OK)
+async def verify_model_route(request: DownloadTaskRequest):
+    try:
+        # Check the downloaded files against the Hub metadata, marks the model corrupt on mismatch
+        result: ModelVerificationResult = await svc_verify_model(request.model_id)
+    except Exception as exception:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to verify model: {exception}"
+        )
+    
+    # Return the verification result as a JSON response
+    return result
+
+@router.get("/models/storage", response_model=BlobStoreUsage, status_code=status.HTTP_200_OK)
+async def get_storage_usage_route():
+    try:
+        # Retrieve disk usage of downloaded models + savings from shared files
+        usage: BlobStoreUsage = await svc_get_storage_usage()
+    except Exception as exception:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to retrieve storage usage: {exception}"
+        )
+    
+    # Return the storage usage as a JSON response
+    return usage
+
+@router.post("/models/storage/deduplicate", response_model=SuccessMessageResponse, status_code=status.HTTP_202_ACCEPTED)
+def deduplicate_models_route(background_task: BackgroundTasks):
+    try:
+        # Schedule linking identical files of downloaded models to shared blobs
+        svc_schedule_model_deduplication(background_task)
+    except Exception as exception:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to schedule model deduplication: {exception}"
+        )
+    
+    # Return JSON response indicating the deduplication has been scheduled
+    return SuccessMessageResponse(message="Model deduplication scheduled")
+
 @router.get("/models/status", response_model=ModelDownloadStatusResponse, status_code=status.HTTP_200_OK)
-def get_models_status_route():
+async def get_models_status_route():
     try:
         # Retrieve the statuses of all models
-        model_statuses: List[ModelDownloadStatus] = svc_get_download_statuses()
+        model_statuses: List[ModelDownloadStatus] = await svc_get_download_statuses()
     except Exception as exception:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -104,6 +331,16 @@ def get_models_status_route():
     # Return the model statuses as a JSON response
     return ModelDownloadStatusResponse(models=model_statuses)
 
+@router.get("/models/events", status_code=status.HTTP_200_OK)
+async def stream_status_events_route():
+    # Push download + load status changes as server-sent events instead of polling
+    # The stream starts with the current state of every model, then only sends changes
+    return StreamingResponse(
+        svc_stream_status_events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @router.post("/models/infer/", response_model=RunInferenceResponse, status_code=status.HTTP_200_OK)
 async def run_model_inference_route(request: RunInferenceRequest):
     try:
@@ -111,6 +348,22 @@ async def run_model_inference_route(request: RunInferenceRequest):
         # This will call the service function that handles the inference logic
         inference_response: str | dict = await svc_run_local_inference(request)
         
+    except AdmissionRejected as exception:
+        # The model's queue is full, the client should back off instead of piling on
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(exception),
+            headers={"Retry-After": str(exception.retry_after)},
+        )
+        
+    except DeadlineExceeded as exception:
+        # Dropped before it reached the model worker
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(exception),
+            headers={"Retry-After": str(exception.retry_after)},
+        )
+        
     except Exception as exception:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -122,11 +375,37 @@ async def run_model_inference_route(request: RunInferenceRequest):
         message=inference_response
     )
 
+@router.get("/models/infer/queue", response_model=InferenceQueueResponse, status_code=status.HTTP_200_OK)
+async def get_inference_queues_route():
+    try:
+        # Running + waiting inference requests for every model
+        queues: List[InferenceQueueStatus] = svc_get_inference_queues()
+    except Exception as exception:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to retrieve inference queues: {exception}"
+        )
+        
+    return InferenceQueueResponse(queues=queues)
+
+@router.get("/models/infer/queue/{request_id}", response_model=InferencePositionResponse, status_code=status.HTTP_200_OK)
+async def get_inference_position_route(request_id: str):
+    # Position of a request in its model's queue, 0 means the model is running it
+    position: Optional[int] = svc_get_inference_position(request_id)
+    
+    if position is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Request {request_id} is not queued or running"
+        )
+        
+    return InferencePositionResponse(request_id=request_id, position=position)
+
 @router.get("/models", response_model=GetAllModelsResponse, status_code=status.HTTP_200_OK)
-def get_all_models_route():
+async def get_all_models_route():
     try:
         # Retrieve data for all locally stored models
-        models: List[ModelData] = svc_get_all_models()
+        models: List[ModelData] = await svc_get_all_models()
     except Exception as exception:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -137,18 +416,53 @@ def get_all_models_route():
     return GetAllModelsResponse(models=models)
 
 @router.post("/models/load", response_model=LoadModelResponse, status_code=status.HTTP_202_ACCEPTED)
-def load_model_route(request: LoadModelRequest, background_task: BackgroundTasks):
+async def load_model_route(request: LoadModelRequest, background_task: BackgroundTasks):
     try:
         # Schedule the loading of the target model in background task
-        svc_schedule_model_load(request, background_task)
+        # Refused if the model isn't expected to fit in memory (unless forced)
+        warning: Optional[str] = await svc_schedule_model_load(request, background_task)
+    except InvalidWorkerPlacement as e:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, detail=f"Failed to load model: {e}")
+    except InsufficientMemoryError as e:
+        # Not a server error, the load can be retried with force / a lower precision / fewer replicas
+        raise HTTPException(status.HTTP_409_CONFLICT, detail=f"Failed to load model: {e}")
     except Exception as e:
         raise HTTPException(500, detail=f"Failed to load model: {e}")
     
     # Return a response indicating the model is being loaded
     return LoadModelResponse(
         model_id=request.model_id,
-        status="loading"
+        status="loading",
+        warning=warning
     )
+
+@router.post("/models/load/check", response_model=Optional[ModelFitCheck], status_code=status.HTTP_200_OK)
+async def check_model_fit_route(request: LoadModelRequest):
+    try:
+        # Compare the estimated memory of the model with the free RAM / VRAM
+        fit_check: Optional[ModelFitCheck] = await svc_check_model_fit(request)
+    except Exception as exception:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to check model memory: {exception}"
+        )
+    
+    # Return the memory check as a JSON response (null if the model couldn't be scanned)
+    return fit_check
+
+@router.get("/models/inventory", response_model=ModelInventoryResponse, status_code=status.HTTP_200_OK)
+async def get_model_inventory_route():
+    try:
+        # Retrieve parameter count, dtype, context length + memory estimates of downloaded models
+        inventory: List[ModelInventory] = await svc_get_model_inventory()
+    except Exception as exception:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to retrieve model inventory: {exception}"
+        )
+    
+    # Return the inventory as a JSON response
+    return ModelInventoryResponse(models=inventory)
     
 @router.get("/models/load/status", response_model=List[ModelLoadStatus], status_code=status.HTTP_200_OK)
 def get_model_load_status_route():
@@ -164,6 +478,54 @@ def get_model_load_status_route():
     # Return the load statuses as a JSON response
     return load_statuses
 
+@router.get("/models/load/replicas", response_model=WorkerReplicasResponse, status_code=status.HTTP_200_OK)
+def get_worker_replicas_route():
+    try:
+        # Retrieve the worker replicas of every resident model with their utilization
+        models: List[ModelReplicas] = svc_get_worker_replicas()
+    except Exception as exception:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to retrieve worker replicas: {exception}"
+        )
+        
+    # Return the replica statuses as a JSON response
+    return WorkerReplicasResponse(models=models)
+
+@router.get("/models/kv-snapshots", response_model=KvSnapshotStatus, status_code=status.HTTP_200_OK)
+def get_kv_snapshots_route():
+    try:
+        # Retrieve the disk usage of the KV cache snapshots + the hit rate of every model
+        snapshot_status: KvSnapshotStatus = svc_get_kv_snapshot_status()
+    except Exception as exception:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to retrieve KV cache snapshots: {exception}"
+        )
+        
+    # Return the snapshot status as a JSON response
+    return snapshot_status
+
+@router.post("/models/unload", response_model=SuccessMessageResponse, status_code=status.HTTP_200_OK)
+def unload_model_route(request: UnloadModelRequest):
+    try:
+        # Stop the model's workers, other resident models keep running
+        unloaded: bool = svc_unload_model(request.model_id)
+    except Exception as exception:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to unload model: {exception}"
+        )
+        
+    if not unloaded:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"{request.model_id} is not loaded"
+        )
+        
+    # Return JSON response indicating the model was unloaded
+    return SuccessMessageResponse(message="Model unloaded")
+
 @router.post("/models/clear", response_model=SuccessMessageResponse, status_code=status.HTTP_200_OK)
 def clear_chat_context_route(request: ClearSessionCacheRequest, background_task: BackgroundTasks):
     try:
@@ -192,4 +554,18 @@ def get_chat_history_route(request: GetChatHistoryRequest):
     # Return the chat history as a JSON response
     return GetChatHistoryResponse(
         messages=chat_messages
-    )
\ No newline at end of file
+    )
+
+@router.get("/models/history/metrics", response_model=MessageWriterMetrics, status_code=status.HTTP_200_OK)
+def get_message_writer_metrics_route():
+    try:
+        # Retrieve queue depth + flush latency metrics of the message writer
+        metrics: MessageWriterMetrics = svc_get_message_writer_metrics()
+    except Exception as exception:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to retrieve message writer metrics: {exception}"
+        )
+    
+    # Return the metrics as a JSON response
+    return metrics
@@ -0,0 +1,104 @@
+from typing import Optional
+
+from fastapi import APIRouter, Header, status
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.services.model.inference_queue import AdmissionRejected, DeadlineExceeded
+from app.services.openai.openai_service import (
+    ModelNotReadyError,
+    SessionNotFoundError,
+    svc_create_chat_completion,
+    svc_create_completion,
+    svc_list_openai_models,
+    svc_stream_chat_completion,
+    svc_stream_completion,
+)
+from app.utils.types.openai_types import (
+    ChatCompletion,
+    ChatCompletionRequest,
+    Completion,
+    CompletionRequest,
+    OpenAIError,
+    OpenAIErrorResponse,
+    OpenAIModelList,
+)
+
+# OpenAI-compatible API so standard client SDKs + load generators can talk to the loaded model
+router = APIRouter(prefix="/v1", tags=["openai"])
+
+# Headers sent with every event stream so proxies don't buffer it
+_STREAM_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+@router.get("/models", response_model=OpenAIModelList, status_code=status.HTTP_200_OK)
+async def list_models_route():
+    try:
+        # List the downloaded models
+        return await svc_list_openai_models()
+
+    except Exception as exception:
+        return _error_response(status.HTTP_500_INTERNAL_SERVER_ERROR, f"Failed to list models: {exception}", "server_error")
+
+@router.post("/chat/completions", response_model=ChatCompletion, status_code=status.HTTP_200_OK)
+async def chat_completions_route(
+    request: ChatCompletionRequest,
+    session_id: Optional[str] = Header(default=None, alias="X-Session-Id"),
+):
+    # With X-Session-Id the server keeps the conversation in that session (like the chat UI)
+    # and the client only sends the new messages
+    try:
+        if request.stream:
+            return StreamingResponse(
+                await svc_stream_chat_completion(request, session_id),
+                media_type="text/event-stream",
+                headers=_STREAM_HEADERS,
+            )
+
+        return await svc_create_chat_completion(request, session_id)
+
+    except ModelNotReadyError as exception:
+        return _error_response(status.HTTP_404_NOT_FOUND, str(exception), "invalid_request_error", "model_not_found")
+
+    except AdmissionRejected as exception:
+        return _error_response(status.HTTP_429_TOO_MANY_REQUESTS, str(exception), "rate_limit_error", "queue_full", exception.retry_after)
+
+    except DeadlineExceeded as exception:
+        return _error_response(status.HTTP_503_SERVICE_UNAVAILABLE, str(exception), "server_error", "deadline_exceeded", exception.retry_after)
+
+    except SessionNotFoundError as exception:
+        return _error_response(status.HTTP_404_NOT_FOUND, str(exception), "invalid_request_error", "session_not_found")
+
+    except Exception as exception:
+        return _error_response(status.HTTP_500_INTERNAL_SERVER_ERROR, f"Failed to create chat completion: {exception}", "server_error")
+
+@router.post("/completions", response_model=Completion, status_code=status.HTTP_200_OK)
+async def completions_route(request: CompletionRequest):
+    try:
+        if request.stream:
+            return StreamingResponse(
+                await svc_stream_completion(request),
+                media_type="text/event-stream",
+                headers=_STREAM_HEADERS,
+            )
+
+        return await svc_create_completion(request)
+
+    except ModelNotReadyError as exception:
+        return _error_response(status.HTTP_404_NOT_FOUND, str(exception), "invalid_request_error", "model_not_found")
+
+    except AdmissionRejected as exception:
+        return _error_response(status.HTTP_429_TOO_MANY_REQUESTS, str(exception), "rate_limit_error", "queue_full", exception.retry_after)
+
+    except DeadlineExceeded as exception:
+        return _error_response(status.HTTP_503_SERVICE_UNAVAILABLE, str(exception), "server_error", "deadline_exceeded", exception.retry_after)
+
+    except Exception as exception:
+        return _error_response(status.HTTP_500_INTERNAL_SERVER_ERROR, f"Failed to create completion: {exception}", "server_error")
+
+def _error_response(status_code: int, message: str, error_type: str, code: Optional[str] = None,
+                    retry_after: Optional[int] = None) -> JSONResponse:
+    # Errors in the OpenAI shape so client SDKs surface the message, SDKs also honour Retry-After on 429 / 503
+    return JSONResponse(
+        status_code=status_code,
+        content=OpenAIErrorResponse(error=OpenAIError(message=message, type=error_type, code=code)).model_dump(),
+        headers={"Retry-After": str(retry_after)} if retry_after is not None else None,
+    )
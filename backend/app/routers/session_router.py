@@ -3,6 +3,7 @@ from app.services.session.session_service import (
     svc_create_session,
     svc_get_all_sessions,
     svc_delete_session,
+    svc_search_messages,
 )
 from app.services.cache.cache_service import (
     svc_load_session_messages
@@ -11,17 +12,19 @@ from app.utils.types.session_types import (
     CreateSessionRequest,
     CreateSessionResponse,
     GetSessionsResponse,
-    LoadMessagesIntoCacheRequest  
+    LoadMessagesIntoCacheRequest,
+    SearchMessagesRequest,
+    SearchMessagesResponse,
 )
 from app.utils.types.common_types import SuccessMessageResponse 
 
 router = APIRouter(prefix="/sessions", tags=["sessions"])
 
 @router.post("/", response_model=CreateSessionResponse, status_code=status.HTTP_201_CREATED)
-def create_session_route(request: CreateSessionRequest):
+async def create_session_route(request: CreateSessionRequest):
     try:
         # Attempt to create a new session and return session ID
-        session_id: str = svc_create_session(request.name)
+        session_id: str = await svc_create_session(request.name)
     
     except Exception as exception:
         raise HTTPException(
@@ -33,10 +36,10 @@ def create_session_route(request: CreateSessionRequest):
     return CreateSessionResponse(id=session_id, name=request.name)
 
 @router.get("/", response_model=list[GetSessionsResponse], status_code=status.HTTP_200_OK)
-def get_sessions_route():
+async def get_sessions_route():
     try:
         # Attempt to retrieve all sessions
-        return svc_get_all_sessions()
+        return await svc_get_all_sessions()
         
     except Exception as exception:
         raise HTTPException(
@@ -45,10 +48,10 @@ def get_sessions_route():
         )
 
 @router.delete("/{session_id}", response_model=SuccessMessageResponse, status_code=status.HTTP_200_OK)
-def delete_session_route(session_id: str):
+async def delete_session_route(session_id: str):
     try:
         # Attempt to delete specified session
-        svc_delete_session(session_id)
+        await svc_delete_session(session_id)
         
     except Exception as exception:
         raise HTTPException(
@@ -60,10 +63,10 @@ def delete_session_route(session_id: str):
     return SuccessMessageResponse(message="Session deleted successfully")
 
 @router.post("/cache", response_model=SuccessMessageResponse, status_code=status.HTTP_200_OK)
-def load_cache_route(request: LoadMessagesIntoCacheRequest):
+async def load_cache_route(request: LoadMessagesIntoCacheRequest):
     try:
         # Attempt to load messages for specified session into cache
-        svc_load_session_messages(request.id)
+        await svc_load_session_messages(request.id)
         
     except Exception as exception:
         raise HTTPException(
@@ -72,4 +75,16 @@ def load_cache_route(request: LoadMessagesIntoCacheRequest):
         )
     
     # Return success message as JSON response
-    return SuccessMessageResponse(message="Session messages loaded into cache successfully")
\ No newline at end of file
+    return SuccessMessageResponse(message="Session messages loaded into cache successfully")
+
+@router.post("/search", response_model=SearchMessagesResponse, status_code=status.HTTP_200_OK)
+async def search_messages_route(request: SearchMessagesRequest):
+    try:
+        # Attempt to full-text search messages across all sessions
+        return await svc_search_messages(request)
+        
+    except Exception as exception:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error attempting to search messages: {exception}"
+        )
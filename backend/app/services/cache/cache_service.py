@@ -1,38 +1,79 @@
+import asyncio
 from datetime import datetime, timezone
-from typing import Dict, List
+from typing import Dict, List, Tuple
 
 from fastapi import BackgroundTasks
-from app.db.messages import get_session_messages
+from fastapi.concurrency import run_in_threadpool
+from app.db.aio.messages import get_session_messages
+from app.db.summaries import get_session_summaries
 from app.utils.types.cache_types import(
     ContextMessage,
+    ConversationSummary,
     GetChatHistoryData,
+    MessageWriterMetrics,
     SessionCacheEntry, 
     ClearSessionCacheRequest,
     GetChatHistoryRequest
 )
 from app.services.cache.helper import _delete_messages, _convert_utc_to_local
+from app.services.cache.message_writer import flush_message_writer, get_message_writer_metrics
 
 # Global cache to store sessions and their respective messages
 session_cache: Dict[str, List[SessionCacheEntry]] = {}
 
-def svc_load_session_messages(session_id: str) -> None:
+# Summaries of the oldest messages of compacted conversations, by (session_id, model_id)
+session_summaries: Dict[Tuple[str, str], ConversationSummary] = {}
+
+# Held while a session's messages are loaded from the database so concurrent requests load it once
+_session_load_locks: Dict[str, asyncio.Lock] = {}
+
+async def svc_load_session_messages(session_id: str) -> None:
      # If session already exists in cache, skip loading
     if session_id in session_cache:
         return
     
-    # Get all session messages from the database
-    rows = get_session_messages(session_id)
+    lock = _session_load_locks.setdefault(session_id, asyncio.Lock())
     
-    # Store message entrys into the session cache
-    session_cache[session_id] = [
-        SessionCacheEntry(
-            model_id=model,
-            name=name,
-            message=ContextMessage(role=role, content=content),
-            timestamp= _convert_utc_to_local(timestamp)
-        )
-        for model, name, role, content, timestamp in rows
-    ]
+    try:
+        async with lock:
+            # Loaded by another request while this one waited for the lock
+            if session_id in session_cache:
+                return
+            
+            # Commit any queued messages so the database has the full session history
+            await run_in_threadpool(flush_message_writer)
+            
+            # Get all session messages from the database
+            rows = await get_session_messages(session_id)
+            
+            # Summaries of compacted conversations in the session
+            summaries = await run_in_threadpool(get_session_summaries, session_id)
+            
+            # Store message entrys into the session cache
+            entries = [
+                SessionCacheEntry(
+                    model_id=model,
+                    name=name,
+                    message=ContextMessage(role=role, content=content),
+                    timestamp= _convert_utc_to_local(timestamp)
+                )
+                for model, name, role, content, timestamp in rows
+            ]
+            
+            # Messages added to the cache while the database was read go after the history instead of being overwritten,
+            # skipping the ones the message writer already committed before the read
+            added = session_cache.get(session_id, [])
+            committed = {_entry_key(entry) for entry in entries[-len(added):]} if added else set()
+            
+            session_cache[session_id] = entries + [entry for entry in added if _entry_key(entry) not in committed]
+            
+            for model_id, summary, summarized_messages in summaries:
+                session_summaries[(session_id, model_id)] = ConversationSummary(summary, summarized_messages)
+            
+    finally:
+        # Once loaded the cache answers, the lock is only needed while loading
+        if _session_load_locks.get(session_id) is lock:
+            _session_load_locks.pop(session_id)
     
 def svc_get_chat_history(request: GetChatHistoryRequest) -> List[GetChatHistoryData]:
     # If session_id is not present in cache, return an empty array
@@ -72,11 +113,16 @@ def svc_clear_session_cache(request: ClearSessionCacheRequest, background_task:
     if request.share_context:
         session_cache.pop(request.session_id, None)
         
+        for key in [key for key in session_summaries if key[0] == request.session_id]:
+            session_summaries.pop(key)
+        
     # Otherwise, remove messages for the specific model_id
     else:
         session_cache[request.session_id] = [
             m for m in session_cache[request.session_id] if m.model_id != request.model_id
         ]
+        
+        session_summaries.pop((request.session_id, request.model_id), None)
     
     background_task.add_task(
         _delete_messages,
@@ -126,4 +172,12 @@ def add_entry_to_cache(
             message=ContextMessage(role=role, content=content),
             timestamp=timestamp or datetime.now(timezone.utc).isoformat()
         )
-    )
\ No newline at end of file
+    )
+    
+def svc_get_message_writer_metrics() -> MessageWriterMetrics:
+    # Get queue depth + flush latency metrics of the background message writer
+    return get_message_writer_metrics()
+
+def _entry_key(entry: SessionCacheEntry) -> Tuple[str, str, str]:
+    # Identifies a message whether it came from the database or was added to the cache
+    return entry.model_id, entry.message.role, entry.message.content
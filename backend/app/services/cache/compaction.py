@@ -0,0 +1,127 @@
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.db.summaries import upsert_conversation_summary
+from app.services.cache.cache_service import session_cache, session_summaries
+from app.utils.constants import SYSTEM, USER
+from app.utils.types.cache_types import ContextMessage, ConversationSummary, SessionCacheEntry
+
+# The API process has no tokenizer, prompt sizes are estimated from the text (~4 characters per token in English)
+CHARS_PER_TOKEN = 4
+
+# Unsummarized history (in tokens) that makes a conversation get compacted once the model is idle
+COMPACTION_TOKEN_THRESHOLD = 1536
+
+# Latest messages that always stay in the prompt word for word (3 turns)
+COMPACTION_KEEP_RECENT_MESSAGES = 6
+
+# Max tokens of old messages folded into the summary in one go, more is left for the next compaction
+COMPACTION_MAX_FOLD_TOKENS = 3072
+
+# Max tokens of history (summary + messages) in a compacted prompt, oldest turns are dropped past it
+# while the summary is still catching up
+COMPACTION_MAX_PROMPT_TOKENS = 3072
+
+# Length of a summary
+SUMMARY_MAX_NEW_TOKENS = 256
+
+SUMMARY_SYSTEM_PROMPT = (
+    "You summarize conversations between a user and an AI assistant. Keep every fact, name, number, decision, "
+    "open question and preference of the user that later turns may rely on. Be as brief as possible."
+)
+
+@dataclass
+class CompactionPlan:
+    session_id: str
+    model_id: str
+
+    # Summarizer prompt: the previous summary + the messages to fold into it
+    messages: List[dict]
+
+    # Messages the new summary stands in for + the last of them, to detect a history that changed meanwhile
+    summarized_messages: int
+    last_entry: SessionCacheEntry
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def get_compacted_context(session_id: str, model_id: str) -> Tuple[Optional[str], List[dict]]:
+    # Summary of the oldest messages (None until there is one) + the messages after it
+    entries, summary = _model_history(session_id, model_id)
+    start = summary.summarized_messages if summary else 0
+    recent = entries[start:]
+
+    # Bounded even when the summary is behind: drop the oldest turns (user + assistant) that don't fit
+    budget = COMPACTION_MAX_PROMPT_TOKENS - (estimate_tokens(summary.summary) if summary else 0)
+    used = sum(estimate_tokens(entry.message.content) for entry in recent)
+
+    while len(recent) > 2 and used > budget:
+        used -= sum(estimate_tokens(entry.message.content) for entry in recent[:2])
+        recent = recent[2:]
+
+    return (summary.summary if summary else None), [entry.message.to_dict() for entry in recent]
+
+def plan_compaction(session_id: str, model_id: str) -> Optional[CompactionPlan]:
+    entries, summary = _model_history(session_id, model_id)
+    start = summary.summarized_messages if summary else 0
+    unsummarized = entries[start:]
+
+    # Short enough to send as is
+    if sum(estimate_tokens(entry.message.content) for entry in unsummarized) < COMPACTION_TOKEN_THRESHOLD:
+        return None
+
+    # Oldest whole turns first, the latest ones stay in the prompt word for word
+    foldable = unsummarized[:max(len(unsummarized) - COMPACTION_KEEP_RECENT_MESSAGES, 0)]
+    fold: List[SessionCacheEntry] = []
+    used = 0
+
+    for index in range(0, len(foldable) - 1, 2):
+        turn = foldable[index:index + 2]
+        used += sum(estimate_tokens(entry.message.content) for entry in turn)
+
+        if fold and used > COMPACTION_MAX_FOLD_TOKENS:
+            break
+        fold.extend(turn)
+
+    if not fold:
+        return None
+
+    transcript = "\n\n".join(f"{entry.message.role.capitalize()}: {entry.message.content}" for entry in fold)
+    previous = f"Summary of the conversation so far:\n{summary.summary}\n\n" if summary else ""
+
+    return CompactionPlan(
+        session_id=session_id,
+        model_id=model_id,
+        messages=[
+            ContextMessage(role=SYSTEM, content=SUMMARY_SYSTEM_PROMPT).to_dict(),
+            ContextMessage(
+                role=USER,
+                content=f"{previous}Messages to add to the summary:\n{transcript}\n\nWrite the updated summary.",
+            ).to_dict(),
+        ],
+        summarized_messages=start + len(fold),
+        last_entry=fold[-1],
+    )
+
+async def apply_compaction(plan: CompactionPlan, summary: str) -> bool:
+    # The history was cleared / reloaded while the model was summarizing, the summary doesn't match it anymore
+    entries, _ = _model_history(plan.session_id, plan.model_id)
+    if len(entries) < plan.summarized_messages or entries[plan.summarized_messages - 1] is not plan.last_entry:
+        return False
+
+    session_summaries[(plan.session_id, plan.model_id)] = ConversationSummary(summary, plan.summarized_messages)
+    await run_in_threadpool(upsert_conversation_summary, plan.session_id, plan.model_id, summary, plan.summarized_messages)
+
+    return True
+
+def _model_history(session_id: str, model_id: str) -> Tuple[List[SessionCacheEntry], Optional[ConversationSummary]]:
+    entries = [entry for entry in session_cache.get(session_id, []) if entry.model_id == model_id]
+    summary = session_summaries.get((session_id, model_id))
+
+    # A summary covering more messages than there are belongs to a history that was (partly) deleted
+    if summary is not None and summary.summarized_messages > len(entries):
+        summary = None
+
+    return entries, summary
@@ -1,6 +1,8 @@
 from datetime import datetime, timezone
 
 from app.db.messages import delete_session_messages, delete_session_model_messages
+from app.db.summaries import delete_model_summary, delete_session_summaries
+from app.services.cache.message_writer import flush_message_writer
 
 # Shoutout to gippity for this nice func
 def _convert_utc_to_local(utc_timestamp: str) -> str:
@@ -19,10 +21,15 @@ def _convert_utc_to_local(utc_timestamp: str) -> str:
     return dt_local.isoformat()
 
 def _delete_messages(session_id: str, model_id: str, share_context: bool) -> None:
+    # Commit any queued messages first so they don't get written after the delete
+    flush_message_writer()
+    
     # If share context, delete all session messages
     if share_context:
         delete_session_messages(session_id)
+        delete_session_summaries(session_id)
     # Only delete messages associated with session_id and passed in model_id
     else:
         delete_session_model_messages(session_id, model_id,)
+        delete_model_summary(session_id, model_id)
     
\ No newline at end of file
@@ -0,0 +1,244 @@
+import queue
+import sqlite3
+import threading
+import time
+from typing import List, Optional, Tuple, Union
+
+from app.db.messages import insert_messages_batch
+from app.utils.types.cache_types import MessageWriterMetrics
+from app.utils.constants import ASSISTANT, USER
+
+# Max number of message rows written in a single group commit
+MESSAGE_WRITER_BATCH_SIZE = 256
+
+# Max time (seconds) a queued message waits for more messages before the batch is committed
+MESSAGE_WRITER_FLUSH_INTERVAL = 0.25
+
+# Attempts at committing a batch when the database is busy / locked, waiting twice as long after each one
+MESSAGE_WRITER_MAX_ATTEMPTS = 5
+MESSAGE_WRITER_RETRY_DELAY = 0.5
+
+# Max time (seconds) flush_message_writer waits for the queued messages to be committed
+MESSAGE_WRITER_FLUSH_TIMEOUT = 30
+
+class _CommitAck:
+    """
+    Queued behind message rows, its event is set once the batch holding those rows is committed.
+    Unlike a flush Event it doesn't cut the batch short.
+    """
+    
+    def __init__(self, event: threading.Event):
+        self.event = event
+
+# A queued item is either a message row, an Event asking for a flush, a commit ack or None asking the writer to stop
+MessageRow = Tuple[str, str, str, str]
+_QueueItem = Union[MessageRow, threading.Event, _CommitAck, None]
+
+_message_queue: "queue.Queue[_QueueItem]" = queue.Queue()
+_writer_thread: Optional[threading.Thread] = None
+_writer_lock = threading.Lock()
+
+# Counters exposed through get_message_writer_metrics
+_metrics = {
+    "enqueued": 0,
+    "written": 0,
+    "failed": 0,
+    "flushes": 0,
+    "last_batch_size": 0,
+    "last_flush_ms": 0.0,
+    "max_flush_ms": 0.0,
+    "total_flush_ms": 0.0,
+}
+_metrics_lock = threading.Lock()
+
+def start_message_writer() -> None:
+    global _writer_thread
+
+    with _writer_lock:
+        # Only one writer thread should ever be running
+        if _writer_thread is not None and _writer_thread.is_alive():
+            return
+
+        # Start the background writer, daemon so it never keeps the process alive on its own
+        _writer_thread = threading.Thread(target=_writer_loop, name="message-writer", daemon=True)
+        _writer_thread.start()
+
+def stop_message_writer() -> None:
+    global _writer_thread
+
+    with _writer_lock:
+        thread = _writer_thread
+        _writer_thread = None
+
+    if thread is None or not thread.is_alive():
+        return
+
+    # Ask the writer to commit everything still queued and exit, then wait for it
+    _message_queue.put(None)
+    thread.join()
+
+def enqueue_user_and_assistant_message(
+    session_id: str,
+    model_id: str,
+    prompt: str,
+    inference_output: str
+) -> threading.Event:
+    # Make sure a writer is running to pick up the rows
+    start_message_writer()
+
+    # Queue the user + assistant message rows, they are committed by the writer in a later batch
+    _message_queue.put((session_id, model_id, USER, prompt))
+    _message_queue.put((session_id, model_id, ASSISTANT, inference_output))
+
+    # Return an event callers can wait on to know the rows are committed
+    committed = threading.Event()
+    _message_queue.put(_CommitAck(committed))
+
+    with _metrics_lock:
+        _metrics["enqueued"] += 2
+
+    return committed
+
+def flush_message_writer(timeout: float = MESSAGE_WRITER_FLUSH_TIMEOUT) -> bool:
+    # Nothing to wait on if the writer isn't running
+    thread = _writer_thread
+    if thread is None or not thread.is_alive():
+        return True
+
+    # Queue an event behind any pending rows and block until the writer has committed them
+    flushed = threading.Event()
+    _message_queue.put(flushed)
+
+    # Stop waiting if the writer dies before getting to it
+    deadline = time.monotonic() + timeout
+    while not flushed.wait(min(MESSAGE_WRITER_FLUSH_INTERVAL, max(deadline - time.monotonic(), 0))):
+        if not thread.is_alive() or time.monotonic() >= deadline:
+            print("[Message writer error] Timed out waiting for queued messages to be committed")
+            return False
+
+    return True
+
+def get_message_writer_metrics() -> MessageWriterMetrics:
+    with _metrics_lock:
+        flushes = _metrics["flushes"]
+
+        return MessageWriterMetrics(
+            queue_depth=_message_queue.qsize(),
+            enqueued=_metrics["enqueued"],
+            written=_metrics["written"],
+            failed=_metrics["failed"],
+            flushes=flushes,
+            last_batch_size=_metrics["last_batch_size"],
+            last_flush_ms=_metrics["last_flush_ms"],
+            avg_flush_ms=_metrics["total_flush_ms"] / flushes if flushes else 0.0,
+            max_flush_ms=_metrics["max_flush_ms"],
+        )
+
+def _writer_loop() -> None:
+    while True:
+        # Block until there is at least one item to handle
+        item = _message_queue.get()
+
+        batch: List[MessageRow] = []
+        waiters: List[threading.Event] = []
+        acks: List[threading.Event] = []
+        stop = item is None
+
+        _collect_item(item, batch, waiters, acks)
+
+        # Keep collecting rows until the batch is full, the flush interval passes or someone asks for a flush/stop
+        deadline = time.monotonic() + MESSAGE_WRITER_FLUSH_INTERVAL
+        while not stop and not waiters and len(batch) < MESSAGE_WRITER_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+
+            try:
+                item = _message_queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+
+            stop = item is None
+            _collect_item(item, batch, waiters, acks)
+
+        # When stopping, drain whatever else is still queued so nothing is lost on shutdown
+        if stop:
+            while True:
+                try:
+                    _collect_item(_message_queue.get_nowait(), batch, waiters, acks)
+                except queue.Empty:
+                    break
+
+        # Commit the batch in a single transaction
+        if batch:
+            _flush_batch(batch)
+
+        # Let anyone waiting on a flush / commit know their rows are committed
+        for waiter in waiters + acks:
+            waiter.set()
+
+        if stop:
+            break
+
+def _collect_item(
+    item: _QueueItem,
+    batch: List[MessageRow],
+    waiters: List[threading.Event],
+    acks: List[threading.Event]
+) -> None:
+    if isinstance(item, threading.Event):
+        waiters.append(item)
+    elif isinstance(item, _CommitAck):
+        acks.append(item.event)
+    elif item is not None:
+        batch.append(item)
+
+def _flush_batch(batch: List[MessageRow]) -> None:
+    start = time.perf_counter()
+    written = 0
+
+    try:
+        # Group commit all rows at once
+        _insert_with_retry(batch)
+        written = len(batch)
+
+    except sqlite3.IntegrityError:
+        # A row in the batch is invalid (ex: its session was deleted while queued)
+        # Fall back to inserting rows one by one so only the bad rows are dropped
+        for row in batch:
+            try:
+                _insert_with_retry([row])
+                written += 1
+            except sqlite3.Error as exception:
+                print(f"[Message writer error] Dropped message for session {row[0]}: {exception}")
+
+    except Exception as exception:
+        print(f"[Message writer error] Failed to persist {len(batch)} messages: {exception}")
+
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    with _metrics_lock:
+        _metrics["written"] += written
+        _metrics["failed"] += len(batch) - written
+        _metrics["flushes"] += 1
+        _metrics["last_batch_size"] = len(batch)
+        _metrics["last_flush_ms"] = elapsed_ms
+        _metrics["max_flush_ms"] = max(_metrics["max_flush_ms"], elapsed_ms)
+        _metrics["total_flush_ms"] += elapsed_ms
+
+def _insert_with_retry(rows: List[MessageRow]) -> None:
+    delay = MESSAGE_WRITER_RETRY_DELAY
+
+    for attempt in range(1, MESSAGE_WRITER_MAX_ATTEMPTS + 1):
+        try:
+            insert_messages_batch(rows)
+            return
+
+        except sqlite3.OperationalError as exception:
+            # Locked / busy database is transient, the rows are written once it frees up
+            if attempt == MESSAGE_WRITER_MAX_ATTEMPTS:
+                raise
+
+            print(f"[Message writer error] Retrying {len(rows)} messages in {delay}s: {exception}")
+            time.sleep(delay)
+            delay *= 2
@@ -0,0 +1,134 @@
+import math
+import re
+from collections import Counter, OrderedDict
+from typing import List
+
+from app.services.cache.cache_service import session_cache
+from app.services.cache.compaction import estimate_tokens
+from app.utils.constants import ASSISTANT, USER
+from app.utils.types.cache_types import SessionCacheEntry
+
+# Earlier turns picked by relevance to the prompt
+RETRIEVAL_TOP_K = 4
+
+# Latest turns that are always sent, whatever they're about
+RETRIEVAL_RECENT_TURNS = 2
+
+# Max tokens of history (recent + retrieved turns) in the prompt
+RETRIEVAL_TOKEN_BUDGET = 2048
+
+# BM25 term frequency saturation + length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Sessions with an index in memory, the least recently used are dropped (and rebuilt when needed again)
+MAX_INDEXED_SESSIONS = 64
+
+_TERM_PATTERN = re.compile(r"\w+")
+
+class _Turn:
+    def __init__(self, entries: List[SessionCacheEntry]):
+        self.entries = entries
+        self.terms = Counter(_terms(" ".join(entry.message.content for entry in entries)))
+        self.length = sum(self.terms.values())
+        self.tokens = sum(estimate_tokens(entry.message.content) for entry in entries)
+
+class _SessionIndex:
+    """
+    BM25 index over a session's turns (a user message + the reply to it), every model's turns together.
+    Built from the session cache the first time it's needed, new turns are added as the cache grows.
+    """
+
+    def __init__(self, entries: List[SessionCacheEntry]):
+        self.entries = entries
+        self.indexed = 0
+        self.turns: List[_Turn] = []
+        self.document_frequency: Counter = Counter()
+        self.total_length = 0
+
+    def update(self) -> None:
+        # Turns are cached as a user message directly followed by the model's reply
+        entries = self.entries
+        while self.indexed < len(entries):
+            end = self.indexed + 1
+            if (
+                end < len(entries)
+                and entries[self.indexed].message.role == USER
+                and entries[end].message.role == ASSISTANT
+                and entries[end].model_id == entries[self.indexed].model_id
+            ):
+                end += 1
+
+            turn = _Turn(entries[self.indexed:end])
+            self.turns.append(turn)
+            self.document_frequency.update(turn.terms.keys())
+            self.total_length += turn.length
+            self.indexed = end
+
+    def scores(self, query: str) -> List[float]:
+        terms = set(_terms(query))
+        average_length = self.total_length / max(len(self.turns), 1)
+
+        scores = []
+        for turn in self.turns:
+            score = 0.0
+            for term in terms:
+                frequency = turn.terms.get(term)
+                if not frequency:
+                    continue
+
+                documents = self.document_frequency[term]
+                idf = math.log(1 + (len(self.turns) - documents + 0.5) / (documents + 0.5))
+                score += idf * frequency * (BM25_K1 + 1) / (
+                    frequency + BM25_K1 * (1 - BM25_B + BM25_B * turn.length / average_length)
+                )
+            scores.append(score)
+
+        return scores
+
+_indexes: "OrderedDict[str, _SessionIndex]" = OrderedDict()
+
+def get_retrieved_context(session_id: str, query: str) -> List[dict]:
+    # The latest turns + the earlier turns most relevant to the prompt, in conversation order, within the token budget
+    index = _session_index(session_id)
+    turns = index.turns
+
+    recent = list(range(max(len(turns) - RETRIEVAL_RECENT_TURNS, 0), len(turns)))
+    earlier_scores = index.scores(query)[:len(turns) - len(recent)]
+    relevant = sorted(
+        (position for position, score in enumerate(earlier_scores) if score > 0),
+        key=lambda position: earlier_scores[position],
+        reverse=True,
+    )[:RETRIEVAL_TOP_K]
+
+    # Newest turns get the budget first, then the best matches; a turn that doesn't fit is skipped
+    selected: List[int] = []
+    used = 0
+    for position in list(reversed(recent)) + relevant:
+        if used + turns[position].tokens > RETRIEVAL_TOKEN_BUDGET and selected:
+            continue
+
+        selected.append(position)
+        used += turns[position].tokens
+
+    return [entry.message.to_dict() for position in sorted(selected) for entry in turns[position].entries]
+
+def _session_index(session_id: str) -> _SessionIndex:
+    entries = session_cache.setdefault(session_id, [])
+    index = _indexes.pop(session_id, None)
+
+    # Rebuilt when the cache's message list was replaced (reloaded from SQLite / part of it cleared)
+    if index is None or index.entries is not entries or index.indexed > len(entries):
+        index = _SessionIndex(entries)
+
+    index.update()
+
+    # Most recently used session last, the oldest index is dropped once too many are kept
+    _indexes[session_id] = index
+    if len(_indexes) > MAX_INDEXED_SESSIONS:
+        _indexes.popitem(last=False)
+
+    return index
+
+def _terms(text: str) -> List[str]:
+    return _TERM_PATTERN.findall(text.lower())
@@ -0,0 +1,112 @@
+import asyncio
+import json
+from typing import Dict
+
+from fastapi import WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+
+from app.services.model.inference_queue import AdmissionRejected, DeadlineExceeded
+from app.services.model.model_service import svc_cancel_local_inference, svc_stream_local_inference
+from app.utils.types.chat_types import ChatCancelMessage, ChatGenerateMessage, ChatSocketEvent
+from app.utils.types.model_types import RunInferenceRequest
+
+class _ChatConnection:
+    """
+    One WebSocket carrying generations for any number of sessions at the same time.
+    Every message is tagged with the request_id chosen by the client.
+    """
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.open = True
+
+        # Generations stream concurrently, only one of them may write to the socket at a time
+        self._send_lock = asyncio.Lock()
+
+    async def send(self, event: ChatSocketEvent) -> None:
+        # Generations keep running after a disconnect so the worker pipe stays in sync, just drop their output
+        if not self.open:
+            return
+
+        try:
+            async with self._send_lock:
+                await self.websocket.send_text(event.model_dump_json(exclude_none=True))
+        except (WebSocketDisconnect, RuntimeError):
+            self.open = False
+
+    def start_generation(self, message: ChatGenerateMessage) -> None:
+        # Each request_id can only run once at a time
+        if message.request_id in self.tasks:
+            return
+
+        request = RunInferenceRequest(**message.model_dump(exclude={"type", "request_id"}))
+
+        task = asyncio.create_task(self._run_generation(message.request_id, request))
+        self.tasks[message.request_id] = task
+        task.add_done_callback(lambda _: self.tasks.pop(message.request_id, None))
+
+    def cancel_generation(self, request_id: str) -> None:
+        if request_id in self.tasks:
+            svc_cancel_local_inference(request_id)
+
+    def close(self) -> None:
+        self.open = False
+
+        # Stop everything this connection started, nobody is listening anymore
+        for request_id in list(self.tasks):
+            svc_cancel_local_inference(request_id)
+
+    async def _run_generation(self, request_id: str, request: RunInferenceRequest) -> None:
+        try:
+            # Same pipeline as /models/infer/, with tokens forwarded as they're generated
+            # Awaiting each send gives backpressure: a slow client slows down the token stream
+            async for event_type, text in svc_stream_local_inference(request, request_id):
+                if event_type == "queued":
+                    await self.send(ChatSocketEvent(type=event_type, request_id=request_id, position=text))
+                else:
+                    await self.send(ChatSocketEvent(type=event_type, request_id=request_id, text=text or None))
+
+        except AdmissionRejected as exception:
+            # The model's queue is full
+            await self.send(ChatSocketEvent(type="rejected", request_id=request_id, text=str(exception), retry_after=exception.retry_after))
+
+        except DeadlineExceeded as exception:
+            # Waited too long, dropped before it reached the model worker
+            await self.send(ChatSocketEvent(type="expired", request_id=request_id, text=str(exception), retry_after=exception.retry_after))
+
+        except Exception as exception:
+            await self.send(ChatSocketEvent(type="error", request_id=request_id, text=f"Failed to run inference: {exception}"))
+
+async def svc_handle_chat_socket(websocket: WebSocket) -> None:
+    await websocket.accept()
+    connection = _ChatConnection(websocket)
+
+    try:
+        while True:
+            raw_message = await websocket.receive_text()
+            data = None
+
+            try:
+                data = json.loads(raw_message)
+                message_type = data.get("type")
+
+                # Start a generation / cancel one, both return straight away so the socket keeps reading
+                if message_type == "generate":
+                    connection.start_generation(ChatGenerateMessage(**data))
+                elif message_type == "cancel":
+                    connection.cancel_generation(ChatCancelMessage(**data).request_id)
+                else:
+                    await connection.send(ChatSocketEvent(type="error", text=f"Unknown message type: {message_type}"))
+
+            except (ValueError, ValidationError, AttributeError) as exception:
+                await connection.send(ChatSocketEvent(type="error", request_id=_request_id(data), text=f"Invalid message: {exception}"))
+
+    except WebSocketDisconnect:
+        pass
+
+    finally:
+        connection.close()
+
+def _request_id(data) -> str | None:
+    return data.get("request_id") if isinstance(data, dict) else None
@@ -0,0 +1,126 @@
+import asyncio
+import time
+import uuid
+from contextlib import aclosing
+from typing import AsyncIterator, Dict, Optional
+
+from app.services.model.inference_queue import AdmissionRejected, DeadlineExceeded
+from app.services.model.model_service import (
+    svc_check_inference_capacity,
+    svc_is_model_ready,
+    svc_stream_local_inference,
+)
+from app.utils.constants import LOAD_MODEL_WARNING
+from app.utils.types.chat_types import CompareEvent, CompareModel, CompareModelsRequest, CompareResult, CompareSummary
+from app.utils.types.model_types import RunInferenceRequest
+
+# Events buffered per comparison, a slow client makes the workers wait once it's full
+COMPARE_EVENT_BUFFER = 64
+
+# Event types that end a model's generation
+_FINAL_EVENTS = ("done", "cancelled", "error", "rejected", "expired")
+
+class ModelNotResidentError(Exception):
+    """
+    Raised when a model to compare isn't loaded (see keep_loaded on /models/load).
+    """
+
+class InvalidComparisonError(ValueError):
+    """
+    Raised when a comparison names the same model more than once.
+    """
+
+async def svc_stream_model_comparison(request: CompareModelsRequest) -> AsyncIterator[str]:
+    # Validate before the response starts so errors are still regular HTTP errors
+    model_ids = [model.model_id for model in request.models]
+    if len(set(model_ids)) != len(model_ids):
+        raise InvalidComparisonError("Each model can only be compared once")
+
+    not_loaded = [model_id for model_id in model_ids if not svc_is_model_ready(model_id)]
+    if not_loaded:
+        raise ModelNotResidentError(f"{', '.join(not_loaded)}: {LOAD_MODEL_WARNING}")
+
+    # Raises AdmissionRejected when one of the queues is full
+    for model_id in model_ids:
+        svc_check_inference_capacity(model_id)
+
+    return _stream_comparison(request, uuid.uuid4().hex)
+
+async def _stream_comparison(request: CompareModelsRequest, comparison_id: str) -> AsyncIterator[str]:
+    started = time.perf_counter()
+    results: Dict[str, CompareResult] = {
+        model.model_id: CompareResult(model_id=model.model_id, status="queued") for model in request.models
+    }
+
+    # Every model's worker streams into one queue, None marks a model as finished
+    events: asyncio.Queue[Optional[CompareEvent]] = asyncio.Queue(maxsize=COMPARE_EVENT_BUFFER)
+    tasks = [asyncio.create_task(_run_model(request, model, comparison_id, events)) for model in request.models]
+
+    try:
+        running = len(tasks)
+        while running:
+            event = await events.get()
+            if event is None:
+                running -= 1
+                continue
+
+            _track_result(results[event.model_id], event, time.perf_counter() - started)
+            yield _sse(event.type, event.model_dump_json(exclude_none=True))
+
+        # Wall-clock time of the whole comparison next to each model's own time
+        summary = CompareSummary(wall_seconds=time.perf_counter() - started, results=list(results.values()))
+        yield _sse("summary", summary.model_dump_json(exclude_none=True))
+
+    finally:
+        # Client went away, stop the generations that are still running
+        for task in tasks:
+            task.cancel()
+
+async def _run_model(request: CompareModelsRequest, model: CompareModel, comparison_id: str,
+                     events: "asyncio.Queue[Optional[CompareEvent]]") -> None:
+    # Same pipeline as /models/infer/, the turn is stored under the model's own model_id
+    inference_request = RunInferenceRequest(
+        session_id=request.session_id,
+        model_id=model.model_id,
+        name=model.name,
+        prompt=request.prompt,
+        max_new_tokens=request.max_new_tokens,
+        mode=request.mode,
+        share_context=request.share_context,
+        request_id=f"{comparison_id}:{model.model_id}",
+        deadline_seconds=request.deadline_seconds,
+        context_mode=request.context_mode,
+    )
+
+    try:
+        stream = svc_stream_local_inference(inference_request, inference_request.request_id)
+        async with aclosing(stream):
+            async for event_type, data in stream:
+                if event_type == "queued":
+                    await events.put(CompareEvent(type=event_type, model_id=model.model_id, position=data))
+                else:
+                    await events.put(CompareEvent(type=event_type, model_id=model.model_id, text=data or None))
+
+    except AdmissionRejected as exception:
+        await events.put(CompareEvent(type="rejected", model_id=model.model_id, text=str(exception), retry_after=exception.retry_after))
+
+    except DeadlineExceeded as exception:
+        await events.put(CompareEvent(type="expired", model_id=model.model_id, text=str(exception), retry_after=exception.retry_after))
+
+    except Exception as exception:
+        await events.put(CompareEvent(type="error", model_id=model.model_id, text=f"Failed to run inference: {exception}"))
+
+    await events.put(None)
+
+def _track_result(result: CompareResult, event: CompareEvent, elapsed: float) -> None:
+    if event.type == "token" and result.first_token_seconds is None:
+        result.first_token_seconds = elapsed
+        result.status = "generating"
+
+    elif event.type in _FINAL_EVENTS:
+        result.elapsed_seconds = elapsed
+        result.status = event.type
+
+def _sse(event_type: str, data: str) -> str:
+    # Server-sent event with the event type as its name, like /models/events
+    return f"event: {event_type}\ndata: {data}\n\n"
@@ -0,0 +1,89 @@
+import asyncio
+import threading
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+# Max number of events buffered per subscriber before it is resynced from the latest state
+EVENT_QUEUE_SIZE = 256
+
+# (event type, key) -> latest payload, ex: ("download", "org/model") -> download status
+_StateKey = Tuple[str, str]
+Event = Tuple[str, Dict[str, Any]]
+
+class EventBus:
+    """
+    In-process pub/sub for status updates. Publishers may run on any thread.
+    Only the latest state per (type, key) is kept, unchanged states are not re-published
+    and new subscribers start from a snapshot of every current state.
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._subscribers: Set["asyncio.Queue[Event]"] = set()
+        self._latest: Dict[_StateKey, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def bind(self, loop: asyncio.AbstractEventLoop) -> None:
+        # Subscribers live on the API event loop, publishers from other threads hop onto it
+        self._loop = loop
+
+    def publish(self, event_type: str, key: str, payload: Dict[str, Any]) -> None:
+        with self._lock:
+            # Skip states that didn't change so idle clients receive nothing
+            if self._latest.get((event_type, key)) == payload:
+                return
+            self._latest[(event_type, key)] = payload
+
+        self._dispatch_threadsafe((event_type, payload))
+
+    def forget(self, event_type: str, key: str, payload: Dict[str, Any]) -> None:
+        # The entity is gone (ex: deleted model), tell subscribers once and drop its state
+        with self._lock:
+            self._latest.pop((event_type, key), None)
+
+        self._dispatch_threadsafe((event_type, payload))
+
+    def subscribe(self) -> "asyncio.Queue[Event]":
+        queue: "asyncio.Queue[Event]" = asyncio.Queue(maxsize=EVENT_QUEUE_SIZE)
+
+        # Start the subscriber off with every current state
+        for event in self._snapshot():
+            queue.put_nowait(event)
+
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: "asyncio.Queue[Event]") -> None:
+        self._subscribers.discard(queue)
+
+    def _snapshot(self) -> List[Event]:
+        with self._lock:
+            return [(event_type, payload) for (event_type, _), payload in self._latest.items()][-EVENT_QUEUE_SIZE:]
+
+    def _dispatch_threadsafe(self, event: Event) -> None:
+        if self._loop is None or self._loop.is_closed():
+            return
+
+        # Queues aren't thread-safe, deliver on the loop thread
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+
+        if running_loop is self._loop:
+            self._dispatch(event)
+        else:
+            self._loop.call_soon_threadsafe(self._dispatch, event)
+
+    def _dispatch(self, event: Event) -> None:
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Subscriber fell behind, replace its backlog with the latest states instead of growing forever
+                while not queue.empty():
+                    queue.get_nowait()
+                for snapshot_event in self._snapshot():
+                    queue.put_nowait(snapshot_event)
+
+# Shared by the whole API process
+event_bus = EventBus()
@@ -0,0 +1,69 @@
+import asyncio
+import json
+from typing import AsyncIterator, Tuple
+
+from app.db.model import get_download_status, get_download_task
+from app.services.events.event_bus import event_bus
+from app.utils.types.model_types import ModelDownloadStatus, ModelLoadStatus
+
+# Event types pushed to clients
+DOWNLOAD_EVENT = "download"
+LOAD_EVENT = "load"
+
+# Seconds between keep-alive comments on an idle stream so proxies + clients don't time it out
+EVENT_STREAM_KEEPALIVE = 15
+
+def download_status_from_row(row: Tuple) -> ModelDownloadStatus:
+    model_id, download_status, progress, local_path, bytes_downloaded, total_bytes, speed_bps, verified_at = row
+
+    return ModelDownloadStatus(
+        model_id=model_id,
+        status=download_status,
+        progress=progress,
+        local_path=local_path or None,
+        bytes_downloaded=bytes_downloaded,
+        total_bytes=total_bytes,
+        speed_bps=speed_bps,
+        verified_at=verified_at
+    )
+
+def publish_download_status(model_id: str) -> None:
+    # Read the task back so every transition publishes the same shape /models/status returns
+    row = get_download_task(model_id)
+
+    if row is None:
+        # Task removed (cancelled / model deleted)
+        event_bus.forget(DOWNLOAD_EVENT, model_id, {"model_id": model_id, "status": "deleted"})
+        return
+
+    event_bus.publish(DOWNLOAD_EVENT, model_id, download_status_from_row(row).model_dump())
+
+def publish_load_status(model_id: str, load_status: str) -> None:
+    event_bus.publish(LOAD_EVENT, model_id, ModelLoadStatus(id=model_id, status=load_status).model_dump())
+
+def start_status_events() -> None:
+    # Deliver events on the API event loop
+    event_bus.bind(asyncio.get_running_loop())
+
+    # Seed the current download states so the first subscribers get a full snapshot
+    for row in get_download_status():
+        event_bus.publish(DOWNLOAD_EVENT, row[0], download_status_from_row(row).model_dump())
+
+async def stream_status_events() -> AsyncIterator[str]:
+    queue = event_bus.subscribe()
+
+    try:
+        while True:
+            try:
+                event_type, payload = await asyncio.wait_for(queue.get(), timeout=EVENT_STREAM_KEEPALIVE)
+            except asyncio.TimeoutError:
+                # Comment lines are ignored by EventSource but keep the connection alive
+                yield ": keep-alive\n\n"
+                continue
+
+            # Server-sent event with the event type as its name
+            yield f"event: {event_type}\ndata: {json.dumps(payload)}\n\n"
+
+    finally:
+        # Client disconnected, stop delivering to it
+        event_bus.unsubscribe(queue)
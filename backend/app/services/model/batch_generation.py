@@ -0,0 +1,196 @@
+from multiprocessing.connection import Connection
+from typing import Any, Dict, List, Optional, Sequence, Set, Union
+
+import torch
+from transformers import StoppingCriteria, StoppingCriteriaList
+from transformers.generation.streamers import BaseStreamer
+
+from app.services.model.helper import _build_plain_prompt
+from app.utils.constants import (
+    CHAT,
+    MAX_NEW_TOKENS,
+    NUM_CHOICES,
+    PROMPTS,
+    STOP,
+    TEMPERATURE,
+    THINK,
+    TOKEN,
+    TOP_P,
+)
+
+# Finish reasons reported for every generated sequence (same values as the OpenAI API)
+FINISH_STOP = "stop"
+FINISH_LENGTH = "length"
+
+class _CompletionTracker(BaseStreamer):
+    """
+    Follows every row of a batched generate call as tokens come out of the model.
+    Decodes each row, cuts it at the first stop sequence and, when a connection is given,
+    sends the new text of each row to the API process as (TOKEN, (row, text)).
+    """
+
+    def __init__(self, tokenizer, rows: int, stop: Sequence[str], eos_token_ids: Set[int],
+                 connection: Optional[Connection] = None):
+        self.tokenizer = tokenizer
+        self.stop = [sequence for sequence in stop if sequence]
+        self.eos_token_ids = eos_token_ids
+        self.connection = connection
+
+        self.tokens: List[List[int]] = [[] for _ in range(rows)]
+        self.texts: List[str] = [""] * rows
+        self.sent: List[int] = [0] * rows
+        self.token_counts: List[int] = [0] * rows
+        self.finish_reasons: List[Optional[str]] = [None] * rows
+        self._prompt_received = False
+
+    def put(self, value) -> None:
+        # generate first passes in the prompt ids, every later call holds one new token per row
+        if not self._prompt_received:
+            self._prompt_received = True
+            return
+
+        for row, token_id in enumerate(value.tolist()):
+            # Finished rows keep receiving padding until the whole batch is done
+            if self.finish_reasons[row] is not None:
+                continue
+
+            self.token_counts[row] += 1
+
+            if token_id in self.eos_token_ids:
+                self._finish(row, FINISH_STOP)
+                continue
+
+            self.tokens[row].append(token_id)
+            self._update(row)
+
+    def end(self) -> None:
+        # Rows still running when generate returns hit max_new_tokens
+        for row, finish_reason in enumerate(self.finish_reasons):
+            if finish_reason is None:
+                self._finish(row, FINISH_LENGTH)
+
+    def _update(self, row: int) -> None:
+        text = self.tokenizer.decode(self.tokens[row], skip_special_tokens=True)
+
+        # The stop sequence itself is not part of the completion
+        stop_index = min((index for index in map(text.find, self.stop) if index != -1), default=-1)
+        if stop_index != -1:
+            self.texts[row] = text[:stop_index]
+            self._finish(row, FINISH_STOP)
+            return
+
+        self.texts[row] = text
+
+        # Hold back text that could still turn into a stop sequence or is a partially decoded character
+        safe_end = len(text) - self._partial_stop_length(text)
+        if text.endswith("\ufffd"):
+            safe_end = min(safe_end, len(text) - 1)
+
+        self._send(row, safe_end)
+
+    def _finish(self, row: int, finish_reason: str) -> None:
+        self.finish_reasons[row] = finish_reason
+        self._send(row, len(self.texts[row]))
+
+    def _send(self, row: int, end: int) -> None:
+        if self.connection is None or end <= self.sent[row]:
+            return
+
+        self.connection.send((TOKEN, (row, self.texts[row][self.sent[row]:end])))
+        self.sent[row] = end
+
+    def _partial_stop_length(self, text: str) -> int:
+        # Length of the longest stop sequence prefix the text ends with
+        return max(
+            (length for sequence in self.stop for length in range(1, len(sequence)) if text.endswith(sequence[:length])),
+            default=0,
+        )
+
+class _FinishedRowsCriteria(StoppingCriteria):
+    """
+    Stops the rows the tracker has finished (stop sequence found), the other rows keep generating.
+    """
+
+    def __init__(self, tracker: _CompletionTracker):
+        self.tracker = tracker
+
+    def __call__(self, input_ids, scores, **kwargs):
+        finished = [finish_reason is not None for finish_reason in self.tracker.finish_reasons]
+        return torch.tensor(finished, dtype=torch.bool, device=input_ids.device)
+
+def generate_completions(payload: Dict[str, Any], model, tokenizer, builtin_chat: bool,
+                         connection: Optional[Connection] = None,
+                         stopping_criteria: Sequence[StoppingCriteria] = ()) -> Dict[str, Any]:
+    # Every prompt is repeated n times so all prompts + choices are generated in a single batched call
+    choices_per_prompt: int = payload[NUM_CHOICES]
+    prompts = [_render_prompt(prompt, tokenizer, builtin_chat) for prompt in payload[PROMPTS]]
+    rows = [prompt for prompt in prompts for _ in range(choices_per_prompt)]
+
+    # Chat templates already contain the special tokens (BOS etc.)
+    add_special_tokens = not (payload[CHAT] and builtin_chat)
+
+    # Decoder-only models continue from the end of each row so shorter prompts are padded on the left
+    padding_side = tokenizer.padding_side
+    tokenizer.padding_side = "left"
+    if tokenizer.pad_token_id is None:
+        tokenizer.pad_token = tokenizer.eos_token
+
+    try:
+        encoded = tokenizer(rows, return_tensors="pt", padding=True, add_special_tokens=add_special_tokens)
+    finally:
+        tokenizer.padding_side = padding_side
+
+    encoded = encoded.to(model.device)
+
+    tracker = _CompletionTracker(tokenizer, len(rows), payload[STOP], _eos_token_ids(model, tokenizer), connection)
+
+    # Temperature 0 means greedy decoding, like the OpenAI API
+    temperature: float = payload[TEMPERATURE]
+    sampling = {"do_sample": True, "temperature": temperature, "top_p": payload[TOP_P]} if temperature > 0 else {"do_sample": False}
+
+    model.generate(
+        **encoded,
+        max_new_tokens=payload[MAX_NEW_TOKENS],
+        pad_token_id=tokenizer.pad_token_id,
+        streamer=tracker,
+        stopping_criteria=StoppingCriteriaList([_FinishedRowsCriteria(tracker), *stopping_criteria]),
+        **sampling,
+    )
+
+    # Prompt tokens count each prompt once, not once per choice
+    prompt_lengths: List[int] = encoded["attention_mask"].sum(dim=1).tolist()
+
+    return {
+        "prompt_tokens": sum(prompt_lengths[::choices_per_prompt]),
+        "choices": [
+            {
+                "text": tracker.texts[row],
+                "finish_reason": tracker.finish_reasons[row] or FINISH_LENGTH,
+                "completion_tokens": tracker.token_counts[row],
+            }
+            for row in range(len(rows))
+        ],
+    }
+
+def _render_prompt(prompt: Union[str, List[Dict[str, str]]], tokenizer, builtin_chat: bool) -> str:
+    # Completion prompts are used as is
+    if isinstance(prompt, str):
+        return prompt
+
+    # Chat messages go through the model's chat template, with thinking disabled like regular inference
+    if builtin_chat:
+        template_kwargs = {"enable_thinking": False} if THINK in tokenizer.chat_template else {}
+        return tokenizer.apply_chat_template(prompt, tokenize=False, add_generation_prompt=True, **template_kwargs)
+
+    return _build_plain_prompt(prompt)
+
+def _eos_token_ids(model, tokenizer) -> Set[int]:
+    # generation_config may list several end tokens (ex: <|eot_id|> + <|end_of_text|>)
+    eos_token_id = getattr(model.generation_config, "eos_token_id", None)
+    if eos_token_id is None:
+        eos_token_id = tokenizer.eos_token_id
+
+    if eos_token_id is None:
+        return set()
+
+    return set(eos_token_id) if isinstance(eos_token_id, (list, tuple)) else {eos_token_id}
@@ -0,0 +1,139 @@
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.db.blobs import get_blob_store_usage as get_blob_store_usage_row, release_model_files, replace_model_files
+from app.db.model import get_download_status
+from app.utils.constants import HUGGING_FACE_MODELS_FOLDER
+from app.utils.types.model_types import BlobStoreUsage
+
+# Every unique file is stored once in here by its SHA-256, model directories hardlink to these blobs
+BLOB_STORE_FOLDER = Path(HUGGING_FACE_MODELS_FOLDER) / ".blobs"
+
+# Number of files hashed at the same time (hashlib releases the GIL while hashing)
+BLOB_HASH_WORKERS = 4
+
+# Size of each block read while hashing a file
+BLOB_HASH_BLOCK_SIZE = 8 * 1024 * 1024
+
+# Files still being downloaded are never added to the store
+_PARTIAL_SUFFIXES = (".part", ".part.json")
+
+# Adding and releasing blobs must not interleave or a blob could be removed while being linked
+_blob_store_lock = threading.Lock()
+
+def blob_path(sha256: str) -> Path:
+    # Fan out over sub folders so a single folder doesn't hold every blob
+    return BLOB_STORE_FOLDER / sha256[:2] / sha256
+
+def link_from_blob_store(sha256: str, destination: Path) -> bool:
+    # Reuse a file another model already downloaded instead of fetching it again
+    with _blob_store_lock:
+        blob = blob_path(sha256)
+        if not blob.exists():
+            return False
+
+        try:
+            _link_into_place(blob, destination)
+            return True
+        except OSError:
+            # Hardlinks not supported here, download the file instead
+            return False
+
+def add_model_to_blob_store(model_id: str, model_dir: str, known_hashes: Optional[Dict[str, str]] = None) -> None:
+    known_hashes = known_hashes or {}
+    root = Path(model_dir)
+
+    files: List[Path] = [
+        path for path in root.rglob("*")
+        if path.is_file() and not path.name.endswith(_PARTIAL_SUFFIXES)
+    ]
+
+    # Hash files in parallel, files linked from the store already have a known hash
+    to_hash = [path for path in files if path.relative_to(root).as_posix() not in known_hashes]
+    with ThreadPoolExecutor(max_workers=BLOB_HASH_WORKERS, thread_name_prefix="blob-hash") as executor:
+        hashes: Dict[Path, str] = dict(zip(to_hash, executor.map(_sha256_file, to_hash)))
+
+    rows: List[Tuple[str, str, str, int]] = []
+    with _blob_store_lock:
+        for path in files:
+            relative_path = path.relative_to(root).as_posix()
+            sha256 = known_hashes.get(relative_path) or hashes[path]
+
+            # Share the file with every other model that has the same content
+            _store_file(path, sha256)
+            rows.append((model_id, relative_path, sha256, path.stat().st_size))
+
+        # Record which blobs the model references
+        replace_model_files(model_id, rows)
+
+def release_model_blobs(model_id: str) -> None:
+    with _blob_store_lock:
+        # Drop the model's references and remove blobs no other model uses
+        for sha256 in release_model_files(model_id):
+            blob_path(sha256).unlink(missing_ok=True)
+
+def deduplicate_downloaded_models() -> None:
+    # Add models downloaded before the blob store existed (or re-hash existing ones)
+    for model_id, download_status, _, local_path, *_ in get_download_status():
+        if download_status != "ready" or not local_path or not Path(local_path).is_dir():
+            continue
+
+        try:
+            add_model_to_blob_store(model_id, local_path)
+        except OSError as exception:
+            print(f"[Blob store error] {model_id}: {exception}")
+
+async def get_blob_store_usage() -> BlobStoreUsage:
+    # Logical size is what the models would take as separate copies, stored size is what's on disk
+    models, files, logical_bytes, blobs, stored_bytes = await run_in_threadpool(get_blob_store_usage_row)
+
+    return BlobStoreUsage(
+        models=models,
+        files=files,
+        blobs=blobs,
+        logical_bytes=logical_bytes,
+        stored_bytes=stored_bytes,
+        saved_bytes=logical_bytes - stored_bytes,
+    )
+
+def _store_file(path: Path, sha256: str) -> None:
+    blob = blob_path(sha256)
+
+    try:
+        # First copy of this content, the model file becomes the blob
+        if not blob.exists():
+            blob.parent.mkdir(parents=True, exist_ok=True)
+            os.link(path, blob)
+            return
+
+        # Same content already stored, replace the copy with a link to the blob
+        if not os.path.samefile(blob, path):
+            _link_into_place(blob, path)
+
+    except OSError as exception:
+        # Hardlinks not supported (ex: store on another filesystem), the model keeps its own copy
+        print(f"[Blob store error] {path}: {exception}")
+
+def _link_into_place(blob: Path, destination: Path) -> None:
+    destination.parent.mkdir(parents=True, exist_ok=True)
+
+    # Link next to the destination then rename so the destination is never missing or half written
+    temporary = destination.with_name(destination.name + ".link")
+    temporary.unlink(missing_ok=True)
+    os.link(blob, temporary)
+    os.replace(temporary, destination)
+
+def _sha256_file(path: Path) -> str:
+    digest = hashlib.sha256()
+
+    with open(path, "rb") as file:
+        while block := file.read(BLOB_HASH_BLOCK_SIZE):
+            digest.update(block)
+
+    return digest.hexdigest()
@@ -0,0 +1,226 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from huggingface_hub import ModelInfo
+
+from app.db.catalog import (
+    CATALOG_SORT_COLUMNS,
+    get_catalog_last_modified,
+    get_catalog_sync_state,
+    search_model_catalog,
+    set_catalog_sync_state,
+    update_catalog_model_counts,
+    upsert_catalog_models,
+)
+from app.services.model.helper import _is_quantizable, _is_uncensored, _model_weights_size
+from app.services.model.hub_api import huggingface_api
+from app.utils.types.model_types import CatalogSyncStatus, SearchModelsRequest, SearchModelsResults
+
+# How often the background job syncs the catalog with the Hub (seconds)
+CATALOG_SYNC_INTERVAL = 6 * 60 * 60
+
+# How long the background job waits before retrying a sync that failed or was skipped (seconds)
+CATALOG_SYNC_RETRY_DELAY = 5 * 60
+
+# Number of top models pulled for each sort order (downloads, likes, trending) on every sync
+CATALOG_SYNC_TOP_LIMIT = 500
+
+# Max number of recently modified models scanned per sync, the scan stops early at the previous watermark
+CATALOG_SYNC_MAX_MODIFIED = 2000
+
+# Max number of model info requests sent to the Hub at the same time during a sync
+CATALOG_INFO_CONCURRENCY = 8
+
+# Only one sync may run at a time
+_catalog_sync_lock = threading.Lock()
+
+async def search_catalog(request: SearchModelsRequest) -> Optional[List[SearchModelsResults]]:
+    # The catalog can't answer searches until it has been synced at least once
+    sync_state = await run_in_threadpool(get_catalog_sync_state)
+    if sync_state is None:
+        return None
+
+    # Get the top matching models from the local index
+    rows = await run_in_threadpool(
+        search_model_catalog,
+        _build_catalog_match_query(request.query, request.filters or []),
+        request.sortBy or "downloads",
+        request.limit
+    )
+
+    # Convert the rows into search results, sizes are precomputed at sync time
+    return [
+        SearchModelsResults(
+            id=model_id,
+            likes=likes,
+            downloads=downloads,
+            size=size_bytes / (1024 ** 3),  # Convert to GB
+            isQuantized=bool(is_quantized),
+            isUncensored=bool(is_uncensored),
+            trending_score=trending_score,
+        )
+        for model_id, likes, downloads, size_bytes, is_quantized, is_uncensored, trending_score in rows
+    ]
+
+async def get_catalog_status() -> CatalogSyncStatus:
+    # Get last sync time + number of models in the local catalog
+    sync_state = await run_in_threadpool(get_catalog_sync_state)
+
+    last_synced_at, _, model_count = sync_state if sync_state else (None, None, 0)
+
+    return CatalogSyncStatus(
+        last_synced_at=datetime.fromtimestamp(last_synced_at, timezone.utc).isoformat() if last_synced_at else None,
+        models=model_count,
+        syncing=_catalog_sync_lock.locked(),
+    )
+
+def sync_model_catalog() -> int:
+    # Skip if a sync is already in progress
+    if not _catalog_sync_lock.acquire(blocking=False):
+        return 0
+
+    try:
+        sync_state = get_catalog_sync_state()
+        watermark: Optional[str] = sync_state[1] if sync_state else None
+        synced_at = time.time()
+
+        # 1. Top models for every sort order the search supports so rankings stay fresh
+        listed: Dict[str, ModelInfo] = {}
+        for sort_by in CATALOG_SORT_COLUMNS:
+            for model in _list_hub_models(sort_by, CATALOG_SYNC_TOP_LIMIT):
+                listed[model.id] = model
+
+        # 2. Every model modified since the last sync (newest first, stop once we reach the watermark)
+        new_watermark = watermark
+        for model in _list_hub_models("lastModified", CATALOG_SYNC_MAX_MODIFIED):
+            last_modified = _last_modified(model)
+
+            if watermark and last_modified and last_modified <= watermark:
+                break
+
+            listed[model.id] = model
+
+            if last_modified and (new_watermark is None or last_modified > new_watermark):
+                new_watermark = last_modified
+
+        # 3. Only models that are new or whose files changed need their file metadata fetched again
+        known: Dict[str, Optional[str]] = get_catalog_last_modified()
+
+        changed: List[ModelInfo] = []
+        unchanged: List[ModelInfo] = []
+        for model in listed.values():
+            if model.id in known and known[model.id] == _last_modified(model):
+                unchanged.append(model)
+            else:
+                changed.append(model)
+
+        # Unchanged models only need their popularity counts refreshed
+        update_catalog_model_counts([
+            (model.likes or 0, model.downloads or 0, model.trending_score, synced_at, model.id)
+            for model in unchanged
+        ])
+
+        # Fetch weights size for changed models with bounded concurrency
+        with ThreadPoolExecutor(max_workers=CATALOG_INFO_CONCURRENCY, thread_name_prefix="catalog-sync") as executor:
+            sizes = list(executor.map(_fetch_weights_size, (model.id for model in changed)))
+
+        # Store changed models with their precomputed size / quantized / uncensored columns
+        upsert_catalog_models([
+            _to_catalog_row(model, size_bytes, synced_at)
+            for model, size_bytes in zip(changed, sizes)
+            if size_bytes is not None
+        ])
+
+        set_catalog_sync_state(synced_at, new_watermark)
+
+        print(f"[INFO]: Model catalog synced ({len(changed)} updated, {len(unchanged)} refreshed).")
+
+        return len(changed)
+
+    finally:
+        _catalog_sync_lock.release()
+
+async def run_catalog_sync_loop() -> None:
+    while True:
+        try:
+            sync_state = await run_in_threadpool(get_catalog_sync_state)
+            last_synced_at: float = sync_state[0] if sync_state else 0.0
+
+            # Sync if the catalog is stale, otherwise sleep until it will be
+            due_in = last_synced_at + CATALOG_SYNC_INTERVAL - time.time()
+            if due_in > 0:
+                await asyncio.sleep(due_in)
+                continue
+
+            await run_in_threadpool(sync_model_catalog)
+
+            # A sync skipped because a manual one holds the lock leaves the state untouched
+            sync_state = await run_in_threadpool(get_catalog_sync_state)
+            if not sync_state or sync_state[0] <= last_synced_at:
+                await asyncio.sleep(CATALOG_SYNC_RETRY_DELAY)
+
+        except Exception as exception:
+            # Most likely offline, the existing catalog keeps serving searches
+            print(f"[Catalog sync error]: {exception}")
+            await asyncio.sleep(CATALOG_SYNC_RETRY_DELAY)
+
+def _list_hub_models(sort_by: str, limit: int) -> Iterable[ModelInfo]:
+    # Same model filters as the live search
+    # Results are paged lazily so breaking out of the loop early skips the remaining pages
+    return huggingface_api.list_models(
+        pipeline_tag="text-generation",
+        library="transformers",
+        sort=sort_by,
+        limit=limit,
+        direction=-1,
+        cardData=True,
+        full=True,
+    )
+
+def _fetch_weights_size(model_id: str) -> Optional[int]:
+    try:
+        # Get the sum of model weights files (.bin or .safetensors) from info metadata
+        return _model_weights_size(huggingface_api.model_info(model_id, files_metadata=True))
+
+    except Exception as exception:
+        print(f"[Catalog sync error]: {model_id}: {exception}")
+        return None
+
+def _last_modified(model: ModelInfo) -> Optional[str]:
+    last_modified = getattr(model, "last_modified", None)
+
+    # ISO-8601 strings sort in time order so they can be compared directly
+    return last_modified.isoformat() if isinstance(last_modified, datetime) else last_modified
+
+def _to_catalog_row(model: ModelInfo, size_bytes: int, synced_at: float) -> Tuple:
+    return (
+        model.id,
+        model.likes or 0,
+        model.downloads or 0,
+        model.trending_score,
+        " ".join(model.tags or []),
+        size_bytes,
+        _is_quantizable(model),
+        _is_uncensored(model),
+        _last_modified(model),
+        synced_at,
+    )
+
+def _build_catalog_match_query(query: str, filters: List[str]) -> Optional[str]:
+    # Every word of the query must prefix-match a token of the model ID (ex: "llam" finds "meta-llama/...")
+    clauses = [f"model_id : {_quote_fts_term(term)}*" for term in query.split()]
+
+    # Every filter must be one of the model's tags
+    clauses += [f"tags : {_quote_fts_term(tag)}" for tag in filters if tag.strip()]
+
+    # None means match everything
+    return " AND ".join(clauses) or None
+
+def _quote_fts_term(term: str) -> str:
+    # Quote the term so FTS5 operators / punctuation typed by the user can't cause syntax errors
+    return '"' + term.replace('"', '""') + '"'
@@ -0,0 +1,55 @@
+import asyncio
+from typing import Set, Tuple
+
+from app.services.cache.compaction import SUMMARY_MAX_NEW_TOKENS, apply_compaction, plan_compaction
+from app.services.model.inference_queue import AdmissionRejected, DeadlineExceeded, inference_admission
+from app.services.model.model_worker import is_model_ready, summarize_conversation
+from app.utils.constants import COMPACT_CONTEXT, CONVERSATION
+from app.utils.types.model_types import RunInferenceRequest
+
+# How often a pending compaction checks whether the model is idle yet
+COMPACTION_IDLE_POLL_SECONDS = 1.0
+
+# (session_id, model_id) pairs with a compaction waiting or running, one at a time per conversation
+_pending: Set[Tuple[str, str]] = set()
+
+def schedule_compaction(request: RunInferenceRequest) -> None:
+    # Called after every stored turn, only compacted conversations that outgrew the threshold get summarized
+    if request.mode != CONVERSATION or request.context_mode != COMPACT_CONTEXT or request.share_context:
+        return
+
+    key = (request.session_id, request.model_id)
+    if key in _pending or plan_compaction(*key) is None:
+        return
+
+    _pending.add(key)
+    asyncio.get_running_loop().create_task(_compact(*key))
+
+async def _compact(session_id: str, model_id: str) -> None:
+    try:
+        # Summaries are made while nobody is waiting for the model, chat turns always go first
+        while not inference_admission.is_idle(model_id):
+            await asyncio.sleep(COMPACTION_IDLE_POLL_SECONDS)
+
+        # Unloaded meanwhile, the next turn after it's loaded again schedules the compaction again
+        if not is_model_ready(model_id):
+            return
+
+        # Planned again, turns may have been added (or the history cleared) while waiting
+        plan = plan_compaction(session_id, model_id)
+        if plan is None:
+            return
+
+        summary = await summarize_conversation(model_id, session_id, plan.messages, SUMMARY_MAX_NEW_TOKENS)
+        if summary.strip():
+            await apply_compaction(plan, summary.strip())
+
+    except (AdmissionRejected, DeadlineExceeded):
+        # Busy after all, retried after the conversation's next turn
+        pass
+
+    except Exception as exception:
+        print(f"[Compaction error] {session_id} / {model_id}: {exception}")
+
+    finally:
+        _pending.discard((session_id, model_id))
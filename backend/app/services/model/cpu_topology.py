@@ -0,0 +1,151 @@
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# Linux exposes the CPU + NUMA layout here, other platforms are treated as one node without SMT information
+_SYSFS_NODES = Path("/sys/devices/system/node")
+_SYSFS_CPUS = Path("/sys/devices/system/cpu")
+
+class InvalidWorkerPlacement(ValueError):
+    """
+    Raised when the requested cores / NUMA nodes / thread counts can't be used on this machine.
+    """
+
+class CpuTopology(NamedTuple):
+    # Cores this process may run on, per NUMA node
+    numa_nodes: Dict[int, List[int]]
+
+    # Core -> the first core of its physical core (hyperthread siblings share it)
+    physical_core: Dict[int, int]
+
+    @property
+    def cores(self) -> List[int]:
+        return sorted(core for node_cores in self.numa_nodes.values() for core in node_cores)
+
+    def physical_cores(self, cores: List[int]) -> List[int]:
+        # One core per physical core, extra hyperthreads add little to GEMM-heavy generation
+        return sorted({self.physical_core.get(core, core) for core in cores})
+
+class WorkerPlacement(NamedTuple):
+    # Cores the worker is pinned to (None = not pinned)
+    cpu_cores: Optional[List[int]] = None
+
+    # NUMA node the cores belong to, memory stays on it through first-touch allocation
+    numa_node: Optional[int] = None
+
+    # torch intra-op (GEMM / attention) + inter-op (independent graph ops) thread pools
+    intra_op_threads: Optional[int] = None
+    inter_op_threads: Optional[int] = None
+
+def available_cpu_cores() -> List[int]:
+    # Cores this process may run on (respects taskset / cgroup cpusets on Linux)
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+
+    return list(range(os.cpu_count() or 1))
+
+@lru_cache
+def detect_cpu_topology() -> CpuTopology:
+    allowed = set(available_cpu_cores())
+
+    numa_nodes: Dict[int, List[int]] = {}
+    for node_dir in sorted(_SYSFS_NODES.glob("node[0-9]*")):
+        node_cores = [core for core in _read_cpu_list(node_dir / "cpulist") if core in allowed]
+        if node_cores:
+            numa_nodes[int(node_dir.name[4:])] = node_cores
+
+    # Cores outside every node (or no sysfs at all) go on node 0
+    unassigned = sorted(allowed - {core for node_cores in numa_nodes.values() for core in node_cores})
+    if unassigned:
+        numa_nodes.setdefault(0, []).extend(unassigned)
+
+    physical_core: Dict[int, int] = {}
+    for core in allowed:
+        siblings = _read_cpu_list(_SYSFS_CPUS / f"cpu{core}" / "topology" / "thread_siblings_list")
+        physical_core[core] = min(siblings) if siblings else core
+
+    return CpuTopology(numa_nodes, physical_core)
+
+def plan_worker_placements(replicas: int, cpu_cores: Optional[List[List[int]]] = None,
+                           numa_nodes: Optional[List[int]] = None, threads_per_replica: Optional[int] = None,
+                           intra_op_threads: Optional[int] = None,
+                           inter_op_threads: Optional[int] = None) -> List[WorkerPlacement]:
+    topology = detect_cpu_topology()
+
+    # Explicit core sets, one per replica
+    if cpu_cores is not None:
+        if len(cpu_cores) != replicas or not all(cpu_cores):
+            raise InvalidWorkerPlacement(f"cpu_cores needs one non-empty core set per replica ({replicas})")
+
+        unavailable = sorted({core for core_set in cpu_cores for core in core_set} - set(topology.cores))
+        if unavailable:
+            raise InvalidWorkerPlacement(f"CPU cores {unavailable} aren't available, available cores: {topology.cores}")
+
+        core_sets = [(sorted(core_set), _node_of(topology, core_set)) for core_set in cpu_cores]
+
+    # Bound to the given NUMA nodes (round-robin), otherwise spread over every node when there's more than one replica
+    elif numa_nodes is not None or replicas > 1 or threads_per_replica is not None:
+        nodes = numa_nodes or sorted(topology.numa_nodes)
+
+        unavailable = sorted(set(nodes) - set(topology.numa_nodes))
+        if unavailable:
+            raise InvalidWorkerPlacement(f"NUMA nodes {unavailable} aren't available, available nodes: {sorted(topology.numa_nodes)}")
+
+        core_sets = _split_nodes(topology, [nodes[index % len(nodes)] for index in range(replicas)], threads_per_replica)
+
+    # A single replica keeps every core, only the thread pools are sized
+    else:
+        core_sets = [(None, None)]
+
+    placements: List[WorkerPlacement] = []
+    for core_set, node in core_sets:
+        cores = core_set if core_set is not None else topology.cores
+
+        placements.append(WorkerPlacement(
+            cpu_cores=core_set,
+            numa_node=node,
+            intra_op_threads=intra_op_threads or len(topology.physical_cores(cores)),
+            # Generation runs one op after the other, a big inter-op pool only adds idle threads
+            inter_op_threads=inter_op_threads or 1,
+        ))
+
+    return placements
+
+def _split_nodes(topology: CpuTopology, replica_nodes: List[int],
+                 threads_per_replica: Optional[int]) -> List[Tuple[List[int], int]]:
+    # Replicas on the same node share its cores evenly, each replica gets whole physical cores (+ their siblings)
+    core_sets = []
+    for index, node in enumerate(replica_nodes):
+        physical = topology.physical_cores(topology.numa_nodes[node])
+        sharing = replica_nodes.count(node)
+        rank = replica_nodes[:index].count(node)
+
+        per_replica = min(threads_per_replica or max(1, len(physical) // sharing), len(physical))
+
+        # Wraps around (replicas share cores) when the node has fewer cores than asked for
+        chosen = {physical[(rank * per_replica + offset) % len(physical)] for offset in range(per_replica)}
+        cores = [core for core in topology.numa_nodes[node] if topology.physical_core.get(core, core) in chosen]
+
+        core_sets.append((cores, node))
+
+    return core_sets
+
+def _node_of(topology: CpuTopology, cores: List[int]) -> Optional[int]:
+    # The NUMA node holding all of the cores, None when they span several nodes
+    nodes = {node for node, node_cores in topology.numa_nodes.items() if set(cores) & set(node_cores)}
+    return nodes.pop() if len(nodes) == 1 else None
+
+def _read_cpu_list(path: Path) -> List[int]:
+    # sysfs CPU lists look like "0-3,8-11"
+    try:
+        text = path.read_text().strip()
+    except OSError:
+        return []
+
+    cores: List[int] = []
+    for part in filter(None, text.split(",")):
+        start, _, end = part.partition("-")
+        cores.extend(range(int(start), int(end or start) + 1))
+
+    return cores
@@ -0,0 +1,405 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set
+
+from huggingface_hub import hf_hub_url
+from huggingface_hub.utils import build_hf_headers, get_session
+
+from app.services.model.blob_store import link_from_blob_store
+from app.services.model.download_planner import plan_download
+from app.services.model.hub_api import huggingface_api
+
+# Max number of ranged requests in flight at once across all files of a download
+DOWNLOAD_MAX_WORKERS = 8
+
+# Files are split into ranges of this size so large shards download in parallel + resume per range
+DOWNLOAD_CHUNK_SIZE = 64 * 1024 * 1024
+
+# Size of each block read from the response stream
+DOWNLOAD_STREAM_BLOCK_SIZE = 1024 * 1024
+
+# Min time (seconds) between two progress updates written to download_tasks
+DOWNLOAD_PROGRESS_INTERVAL = 0.5
+
+# Number of attempts for a single range before the whole download fails
+DOWNLOAD_CHUNK_RETRIES = 3
+
+# Timeout (seconds) for connecting / waiting on a stalled read
+DOWNLOAD_TIMEOUT = 30
+
+# Suffixes of the partial file + its record of completed ranges (used to resume)
+PART_SUFFIX = ".part"
+PART_STATE_SUFFIX = ".part.json"
+
+# progress callback: (bytes_downloaded, total_bytes, speed in bytes/s)
+ProgressCallback = Callable[[int, int, float], None]
+
+class DownloadStopped(Exception):
+    """
+    Raised when a download is stopped on purpose (paused / cancelled) instead of failing.
+    """
+
+@dataclass
+class DownloadedRepository:
+    """
+    A finished download: where the files are, the commit they came from + the SHA-256 the Hub lists for its LFS files.
+    """
+
+    local_dir: str
+    revision: str
+    lfs_hashes: Dict[str, str]
+
+class BandwidthLimiter:
+    """
+    Token bucket shared by every download so the total transfer rate stays under a cap.
+    A rate of None means unlimited.
+    """
+
+    def __init__(self, bytes_per_second: Optional[int] = None):
+        self._lock = threading.Lock()
+        self._rate: Optional[int] = None
+        self._tokens = 0.0
+        self._last_refill = time.monotonic()
+        self.set_rate(bytes_per_second)
+
+    @property
+    def rate(self) -> Optional[int]:
+        return self._rate
+
+    def set_rate(self, bytes_per_second: Optional[int]) -> None:
+        with self._lock:
+            self._rate = bytes_per_second if bytes_per_second and bytes_per_second > 0 else None
+            self._tokens = float(self._rate or 0)
+            self._last_refill = time.monotonic()
+
+    def consume(self, byte_count: int, stop_event: Optional[threading.Event] = None) -> bool:
+        while True:
+            with self._lock:
+                if self._rate is None:
+                    return True
+
+                # Refill tokens for the time passed, never holding more than one second worth
+                now = time.monotonic()
+                self._tokens = min(self._tokens + (now - self._last_refill) * self._rate, float(self._rate))
+                self._last_refill = now
+
+                # Take the tokens, going into debt is fine as later callers wait it off
+                if self._tokens > 0:
+                    self._tokens -= byte_count
+                    return True
+
+                wait = min(-self._tokens / self._rate + 0.01, 1.0)
+
+            # Wait for tokens, returns False right away if the download is stopped meanwhile
+            if stop_event is None:
+                time.sleep(wait)
+            elif stop_event.wait(wait):
+                return False
+
+# Shared by all downloads running in this process
+bandwidth_limiter = BandwidthLimiter()
+
+@dataclass
+class _RepoFile:
+    filename: str
+    size: Optional[int]
+    url: str
+    path: Path
+    sha256: Optional[str] = None  # Known for LFS files (weights), used to reuse files from the blob store
+    completed_chunks: Set[int] = field(default_factory=set)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    @property
+    def part_path(self) -> Path:
+        return self.path.with_name(self.path.name + PART_SUFFIX)
+
+    @property
+    def state_path(self) -> Path:
+        return self.path.with_name(self.path.name + PART_STATE_SUFFIX)
+
+    @property
+    def chunk_count(self) -> int:
+        # Files with an unknown size are fetched with one plain request
+        if not self.size:
+            return 1
+        return (self.size + DOWNLOAD_CHUNK_SIZE - 1) // DOWNLOAD_CHUNK_SIZE
+
+@dataclass
+class _Chunk:
+    file: _RepoFile
+    index: int
+    start: int
+    end: Optional[int]  # Inclusive, None means until the end of the file
+
+class _DownloadProgress:
+    """
+    Thread-safe byte counter, progress + throughput is reported from the thread running the download
+    at most every DOWNLOAD_PROGRESS_INTERVAL.
+    """
+
+    def __init__(self, total_bytes: int, callback: Optional[ProgressCallback]):
+        self.total_bytes = total_bytes
+        self.callback = callback
+        self.bytes_downloaded = 0
+        self.speed_bps = 0.0
+
+        self._lock = threading.Lock()
+        self._last_report_time = time.monotonic()
+        self._last_report_bytes = 0
+
+    def add(self, byte_count: int) -> None:
+        with self._lock:
+            self.bytes_downloaded += byte_count
+
+    def report(self, force: bool = False) -> None:
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._last_report_time
+
+            # Throttle updates so the database isn't written for every block
+            if not force and elapsed < DOWNLOAD_PROGRESS_INTERVAL:
+                return
+
+            if elapsed > 0:
+                self.speed_bps = max(self.bytes_downloaded - self._last_report_bytes, 0) / elapsed
+
+            self._last_report_time = now
+            self._last_report_bytes = self.bytes_downloaded
+            snapshot = (self.bytes_downloaded, self.total_bytes, self.speed_bps)
+
+        if self.callback is not None:
+            self.callback(*snapshot)
+
+def download_repository(
+    repo_id: str,
+    local_dir: str,
+    on_progress: Optional[ProgressCallback] = None,
+    max_workers: int = DOWNLOAD_MAX_WORKERS,
+    stop_event: Optional[threading.Event] = None,
+) -> DownloadedRepository:
+    # Get the file list + sizes pinned to one commit so every file comes from the same revision
+    info = huggingface_api.model_info(repo_id, files_metadata=True)
+    revision = info.sha
+
+    # Only fetch the files the model needs, skipping duplicate checkpoint formats (ex: .bin next to .safetensors)
+    plan = plan_download(info.siblings)
+
+    files: List[_RepoFile] = [
+        _RepoFile(
+            filename=sibling.rfilename,
+            size=sibling.size,
+            url=hf_hub_url(repo_id, sibling.rfilename, revision=revision, endpoint=huggingface_api.endpoint),
+            path=Path(local_dir) / sibling.rfilename,
+            sha256=sibling.lfs.sha256 if sibling.lfs else None,
+        )
+        for sibling in plan.files
+    ]
+
+    progress = _DownloadProgress(plan.total_bytes, on_progress)
+
+    # Work out what is left to fetch, skipping finished files + ranges finished by an earlier attempt
+    chunks: List[_Chunk] = []
+    for repo_file in files:
+        chunks.extend(_plan_file(repo_file, progress))
+
+    # Report the planned size before any range is fetched
+    progress.report(force=True)
+
+    # Stops the ranges of this download, set on the first failure or when the caller stops the download
+    chunk_stop_event = threading.Event()
+
+    # Fetch every remaining range in parallel, the first failure stops the rest and is raised
+    headers = build_hf_headers()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"download-{repo_id}") as executor:
+        futures = [executor.submit(_download_chunk, chunk, headers, progress, chunk_stop_event) for chunk in chunks]
+        pending = set(futures)
+
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=DOWNLOAD_PROGRESS_INTERVAL, return_when=FIRST_EXCEPTION)
+
+                for future in done:
+                    future.result()
+
+                # Pass a pause / cancel on to the ranges still running
+                if stop_event is not None and stop_event.is_set():
+                    chunk_stop_event.set()
+
+                # Progress is reported from this thread so the callback never runs on the worker threads
+                progress.report()
+
+        except BaseException:
+            # Ranges in flight stop at their next block instead of downloading for nothing
+            chunk_stop_event.set()
+
+            for future in futures:
+                future.cancel()
+            raise
+
+    # Move files whose ranges were all fetched in this run into place
+    for repo_file in files:
+        if repo_file.part_path.exists():
+            _finish_file(repo_file)
+
+    progress.report(force=True)
+
+    # The files are only added to the blob store once they pass verification, a corrupt file must never become a blob
+    return DownloadedRepository(
+        local_dir=str(local_dir),
+        revision=revision,
+        lfs_hashes={repo_file.filename: repo_file.sha256 for repo_file in files if repo_file.sha256},
+    )
+
+def _plan_file(repo_file: _RepoFile, progress: _DownloadProgress) -> List[_Chunk]:
+    repo_file.path.parent.mkdir(parents=True, exist_ok=True)
+
+    # Already downloaded with the expected size
+    if repo_file.path.exists() and (repo_file.size is None or repo_file.path.stat().st_size == repo_file.size):
+        progress.add(repo_file.size or 0)
+        return []
+
+    # Another model already has a file with the same content, link it instead of downloading
+    if repo_file.sha256 and link_from_blob_store(repo_file.sha256, repo_file.path):
+        progress.add(repo_file.size or 0)
+        return []
+
+    # Empty files don't need a request
+    if repo_file.size == 0:
+        repo_file.path.touch()
+        return []
+
+    # Pick up ranges completed by a previous (interrupted) download if the partial file is still intact
+    if repo_file.size and repo_file.part_path.exists() and repo_file.state_path.exists():
+        try:
+            state = json.loads(repo_file.state_path.read_text())
+            if state.get("size") == repo_file.size and repo_file.part_path.stat().st_size == repo_file.size:
+                repo_file.completed_chunks = set(state.get("completed", []))
+        except (OSError, ValueError):
+            repo_file.completed_chunks = set()
+
+    # Otherwise start a fresh partial file of the final size so ranges can be written at their offsets
+    if not repo_file.completed_chunks:
+        with open(repo_file.part_path, "wb") as part_file:
+            if repo_file.size:
+                part_file.truncate(repo_file.size)
+
+    chunks: List[_Chunk] = []
+    for index in range(repo_file.chunk_count):
+        start = index * DOWNLOAD_CHUNK_SIZE
+        end = min(start + DOWNLOAD_CHUNK_SIZE, repo_file.size) - 1 if repo_file.size else None
+
+        if index in repo_file.completed_chunks:
+            progress.add(end - start + 1)
+            continue
+
+        chunks.append(_Chunk(file=repo_file, index=index, start=start, end=end))
+
+    return chunks
+
+def _download_chunk(
+    chunk: _Chunk,
+    headers: Dict[str, str],
+    progress: _DownloadProgress,
+    stop_event: Optional[threading.Event]
+) -> None:
+    for attempt in range(1, DOWNLOAD_CHUNK_RETRIES + 1):
+        # Updated by _fetch_range as blocks land so a failed attempt knows what it already counted
+        written = [0]
+        completed = False
+
+        try:
+            _fetch_range(chunk, headers, progress, stop_event, written)
+
+            # Make sure the server sent the whole range
+            if chunk.end is not None and written[0] != chunk.end - chunk.start + 1:
+                raise IOError(f"Incomplete range for {chunk.file.filename}: got {written[0]} bytes")
+
+            _mark_chunk_complete(chunk)
+            completed = True
+            return
+
+        except DownloadStopped:
+            raise
+
+        except Exception:
+            if attempt == DOWNLOAD_CHUNK_RETRIES:
+                raise
+
+        finally:
+            # An unfinished range (failed / stopped) is fetched again from its start, don't count its bytes twice
+            if not completed:
+                progress.add(-written[0])
+
+        # Wait before retrying, the next attempt stops right away if the download is stopped meanwhile
+        if stop_event is None:
+            time.sleep(attempt)
+        else:
+            stop_event.wait(attempt)
+
+def _fetch_range(
+    chunk: _Chunk,
+    headers: Dict[str, str],
+    progress: _DownloadProgress,
+    stop_event: Optional[threading.Event],
+    written: List[int]
+) -> None:
+    # Don't start new ranges once the download has been paused / cancelled
+    if stop_event is not None and stop_event.is_set():
+        raise DownloadStopped(chunk.file.filename)
+
+    request_headers = dict(headers)
+    if chunk.end is not None:
+        request_headers["Range"] = f"bytes={chunk.start}-{chunk.end}"
+
+    with get_session().get(chunk.file.url, headers=request_headers, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+        response.raise_for_status()
+
+        # A 200 to a ranged request means the server sent the full file, only usable for the first range
+        if chunk.end is not None and response.status_code != 206 and chunk.start != 0:
+            raise IOError(f"Server ignored range request for {chunk.file.filename}")
+
+        with open(chunk.file.part_path, "r+b") as part_file:
+            part_file.seek(chunk.start)
+
+            for block in response.iter_content(chunk_size=DOWNLOAD_STREAM_BLOCK_SIZE):
+                # Partial ranges are thrown away, completed ranges are kept so the download can resume
+                if stop_event is not None and stop_event.is_set():
+                    raise DownloadStopped(chunk.file.filename)
+
+                # Stop at the end of the range even if the server sent more
+                if chunk.end is not None:
+                    block = block[:chunk.end - chunk.start + 1 - written[0]]
+                    if not block:
+                        break
+
+                # Wait for bandwidth if a transfer rate cap is set
+                if not bandwidth_limiter.consume(len(block), stop_event):
+                    raise DownloadStopped(chunk.file.filename)
+
+                part_file.write(block)
+                written[0] += len(block)
+                progress.add(len(block))
+
+def _mark_chunk_complete(chunk: _Chunk) -> None:
+    repo_file = chunk.file
+
+    with repo_file.lock:
+        repo_file.completed_chunks.add(chunk.index)
+
+        # Record completed ranges so an interrupted download resumes where it left off
+        repo_file.state_path.write_text(json.dumps({
+            "size": repo_file.size,
+            "completed": sorted(repo_file.completed_chunks),
+        }))
+
+def _finish_file(repo_file: _RepoFile) -> None:
+    # Rename the partial file to its final name and drop the resume state
+    os.replace(repo_file.part_path, repo_file.path)
+
+    if repo_file.state_path.exists():
+        repo_file.state_path.unlink()
@@ -0,0 +1,102 @@
+import re
+from dataclasses import dataclass, field
+from typing import Iterable, List
+
+from huggingface_hub.hf_api import RepoSibling
+
+# Weight formats transformers can load, most preferred first
+# safetensors loads faster (mmap, no pickle) so .bin is only kept when it's the only format available
+PREFERRED_WEIGHT_FORMATS = [
+    (".safetensors", "model.safetensors.index.json"),
+    (".bin", "pytorch_model.bin.index.json"),
+]
+
+# Shard indexes of the formats above, only the one of the chosen format is kept
+WEIGHT_INDEX_FILES = tuple(index_file for _, index_file in PREFERRED_WEIGHT_FORMATS)
+
+# Weights for other runtimes / frameworks, never used by the transformers pipeline
+OTHER_WEIGHT_SUFFIXES = (
+    ".gguf", ".ggml", ".onnx", ".onnx_data", ".h5", ".msgpack", ".ot",
+    ".tflite", ".mlmodel", ".pt", ".pth", ".ckpt", ".pdparams", ".nemo",
+)
+
+# Folders holding copies of the weights for other runtimes (ex: Llama repos ship the Meta checkpoint in original/)
+OTHER_WEIGHT_FOLDERS = ("original/", "onnx/", "openvino/", "coreml/", "gguf/", "tflite/", "mlx/")
+
+# Checkpoints for mistral-inference shipped next to the transformers shards
+_CONSOLIDATED_FILE = re.compile(r"(^|/)consolidated[^/]*\.(safetensors|pth|bin)$")
+
+@dataclass
+class DownloadPlan:
+    files: List[RepoSibling] = field(default_factory=list)
+    skipped: List[RepoSibling] = field(default_factory=list)
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(f.size or 0 for f in self.files)
+
+    @property
+    def weights_bytes(self) -> int:
+        return sum(f.size or 0 for f in self.files if _is_weight_file(f.rfilename))
+
+    @property
+    def transformers_weights_bytes(self) -> int:
+        # Only the .safetensors / .bin shards transformers loads, 0 for repos without any (ex: GGUF only)
+        return sum(
+            f.size or 0 for f in self.files
+            if any(_is_transformers_weight(f.rfilename, suffix) for suffix, _ in PREFERRED_WEIGHT_FORMATS)
+        )
+
+    @property
+    def skipped_bytes(self) -> int:
+        return sum(f.size or 0 for f in self.skipped)
+
+def plan_download(siblings: Iterable[RepoSibling]) -> DownloadPlan:
+    siblings = list(siblings)
+    filenames = {f.rfilename for f in siblings}
+
+    # Pick the first weight format the repo actually has weights for
+    weight_format = next(
+        (
+            (suffix, index_file) for suffix, index_file in PREFERRED_WEIGHT_FORMATS
+            if any(_is_transformers_weight(name, suffix) for name in filenames)
+        ),
+        None,
+    )
+
+    # Nothing transformers knows how to load, keep every file so the download behaves like before
+    if weight_format is None:
+        return DownloadPlan(files=siblings)
+
+    suffix, index_file = weight_format
+
+    plan = DownloadPlan()
+    for sibling in siblings:
+        if _is_needed(sibling.rfilename, suffix, index_file):
+            plan.files.append(sibling)
+        else:
+            plan.skipped.append(sibling)
+
+    return plan
+
+def _is_needed(filename: str, suffix: str, index_file: str) -> bool:
+    # Weights of the chosen format + its shard index
+    if _is_transformers_weight(filename, suffix) or filename.endswith(index_file):
+        return True
+
+    # Weights of any other format / runtime are redundant
+    if _is_weight_file(filename) or filename.endswith(WEIGHT_INDEX_FILES):
+        return False
+
+    # Everything else in the repo (config, tokenizer, generation config, custom code) is small and needed
+    return not filename.startswith(OTHER_WEIGHT_FOLDERS)
+
+def _is_transformers_weight(filename: str, suffix: str) -> bool:
+    return (
+        filename.endswith(suffix)
+        and not filename.startswith(OTHER_WEIGHT_FOLDERS)
+        and not _CONSOLIDATED_FILE.search(filename)
+    )
+
+def _is_weight_file(filename: str) -> bool:
+    return filename.endswith(tuple(suffix for suffix, _ in PREFERRED_WEIGHT_FORMATS) + OTHER_WEIGHT_SUFFIXES)
@@ -0,0 +1,350 @@
+import json
+import shutil
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.db.aio.model import (
+    delete_download_task as delete_download_task_async,
+    enqueue_download_task,
+    get_download_task_status,
+    get_verification_result,
+    update_download_task_status as update_download_task_status_async,
+)
+from app.db.init_database import close_thread_connection
+from app.db.model import (
+    delete_download_task,
+    get_pending_download_tasks,
+    insert_model,
+    requeue_interrupted_download_tasks,
+    update_download_progress,
+    update_download_task_status,
+    update_downloaded_task,
+    update_downloading_task,
+    update_failed_task,
+    update_ready_task,
+    update_verification_result,
+)
+from app.services.events.status_events import publish_download_status
+from app.services.model.blob_store import add_model_to_blob_store
+from app.services.model.download_engine import DownloadStopped, bandwidth_limiter, download_repository
+from app.services.model.inventory_service import scan_model_inventory
+from app.services.model.model_verifier import CORRUPT, READY, remove_corrupt_files, verify_model
+from app.utils.constants import HUGGING_FACE_MODELS_FOLDER
+from app.utils.types.model_types import DownloadModelRequest, DownloadQueueSettings, FileVerificationError
+
+# Default number of models downloaded at the same time, the rest wait in the queue
+DOWNLOAD_MAX_CONCURRENT = 2
+
+# Download task statuses managed by the scheduler
+PENDING = "pending"
+DOWNLOADING = "downloading"
+PAUSED = "paused"
+FAILED = "failed"
+
+# Statuses of downloads that haven't finished yet, only these can be paused / cancelled
+_UNFINISHED = (PENDING, DOWNLOADING, PAUSED, FAILED)
+
+# Statuses of downloads that are stopped, only these can be resumed
+_RESUMABLE = (PAUSED, FAILED, CORRUPT)
+
+# Why an active download was asked to stop
+_STOP_PAUSE = "pause"
+_STOP_CANCEL = "cancel"
+_STOP_SHUTDOWN = "shutdown"
+
+class DownloadTaskNotFoundError(Exception):
+    """
+    Raised when a model has no download task.
+    """
+
+class DownloadTaskStateError(Exception):
+    """
+    Raised when a download can't be queued / paused / resumed / cancelled in its current status (ex: ready models).
+    """
+
+@dataclass
+class _ActiveDownload:
+    thread: threading.Thread
+    stop_event: threading.Event
+    stop_reason: Optional[str] = None
+
+_settings = DownloadQueueSettings(max_concurrent=DOWNLOAD_MAX_CONCURRENT)
+_active_downloads: Dict[str, _ActiveDownload] = {}
+_scheduler_lock = threading.Lock()
+_accepting = True
+
+def model_download_dir(model_id: str) -> Path:
+    # Hugging Face models are stored in the hugging_face_models folder in backend root directory
+    return Path(HUGGING_FACE_MODELS_FOLDER) / model_id.replace("/", "_")
+
+async def enqueue_download(request: DownloadModelRequest) -> None:
+    # Corrupt files are removed first so downloading a corrupt model again fetches them
+    await _remove_corrupt_files(request.model_id)
+
+    # Store the request in download_tasks so it survives a restart, then start it if a slot is free
+    # Running / paused / downloaded models keep their task, resetting it would lose their files or start a second thread
+    if not await enqueue_download_task(request):
+        task_status = await get_download_task_status(request.model_id)
+        raise DownloadTaskStateError(f"{request.model_id} is {task_status} and can't be downloaded again")
+
+    await run_in_threadpool(publish_download_status, request.model_id)
+    await run_in_threadpool(dispatch_downloads)
+
+async def pause_download(model_id: str) -> None:
+    # Finished downloads are left alone, pausing them would make the model unloadable
+    await _ensure_status(model_id, _UNFINISHED, "paused")
+
+    # Active downloads stop after their current block, queued ones simply leave the queue
+    if not _stop_active_download(model_id, _STOP_PAUSE):
+        await update_download_task_status_async(model_id, PAUSED)
+        await run_in_threadpool(publish_download_status, model_id)
+
+async def resume_download(model_id: str) -> None:
+    # Only paused / failed / corrupt downloads can be put back in the queue
+    await _ensure_status(model_id, _RESUMABLE, "resumed")
+
+    # Corrupt files are removed first so the download fetches them again
+    await _remove_corrupt_files(model_id)
+
+    await update_download_task_status_async(model_id, PENDING)
+    await run_in_threadpool(publish_download_status, model_id)
+    await run_in_threadpool(dispatch_downloads)
+
+async def cancel_download(model_id: str) -> None:
+    # Downloaded models are removed with /models/delete, which also drops the model + its blob references
+    await _ensure_status(model_id, _UNFINISHED, "cancelled")
+
+    # Active downloads clean up after themselves once stopped
+    if _stop_active_download(model_id, _STOP_CANCEL):
+        return
+
+    # Queued / paused downloads are removed straight away along with any partial files
+    await delete_download_task_async(model_id)
+    await run_in_threadpool(publish_download_status, model_id)
+    await run_in_threadpool(shutil.rmtree, model_download_dir(model_id), ignore_errors=True)
+
+async def _remove_corrupt_files(model_id: str) -> None:
+    row = await get_verification_result(model_id)
+    if row is not None and row[0] == CORRUPT:
+        _, local_path, _, errors, _ = row
+        await run_in_threadpool(remove_corrupt_files, model_id, local_path, errors)
+
+async def _ensure_status(model_id: str, allowed: Tuple[str, ...], action: str) -> None:
+    task_status = await get_download_task_status(model_id)
+
+    if task_status is None:
+        raise DownloadTaskNotFoundError(f"{model_id} has no download task")
+
+    if task_status not in allowed:
+        raise DownloadTaskStateError(f"{model_id} is {task_status} and can't be {action}")
+
+def get_download_queue_settings() -> DownloadQueueSettings:
+    return _settings.model_copy(update={"bandwidth_limit_bps": bandwidth_limiter.rate})
+
+async def update_download_queue_settings(settings: DownloadQueueSettings) -> DownloadQueueSettings:
+    global _settings
+
+    _settings = settings
+    bandwidth_limiter.set_rate(settings.bandwidth_limit_bps)
+
+    # More slots may have opened up
+    await run_in_threadpool(dispatch_downloads)
+
+    return get_download_queue_settings()
+
+def resume_download_queue() -> None:
+    global _accepting
+    _accepting = True
+
+    # Downloads that were running when the server stopped go back in the queue and resume from their .part files
+    requeued = requeue_interrupted_download_tasks()
+    if requeued:
+        print(f"[INFO]: Resuming {requeued} interrupted download(s).")
+
+    dispatch_downloads()
+
+def stop_download_queue(timeout: float = 10) -> None:
+    global _accepting
+
+    # Stop starting new downloads and ask the running ones to stop, they stay queued for the next start
+    with _scheduler_lock:
+        _accepting = False
+        active = list(_active_downloads.values())
+
+        for download in active:
+            # A pause / cancel that is still in progress wins over the shutdown
+            download.stop_reason = download.stop_reason or _STOP_SHUTDOWN
+            download.stop_event.set()
+
+    # One deadline for every download so shutdown waits at most `timeout` seconds in total
+    deadline = time.monotonic() + timeout
+
+    for download in active:
+        download.thread.join(max(deadline - time.monotonic(), 0))
+
+def dispatch_downloads() -> None:
+    with _scheduler_lock:
+        if not _accepting:
+            return
+
+        free_slots = _settings.max_concurrent - len(_active_downloads)
+        if free_slots <= 0:
+            return
+
+        # Fetch enough rows to fill the free slots even if some are already running
+        rows = get_pending_download_tasks(free_slots + len(_active_downloads))
+
+        for model_id, model_name, is_quantized, is_uncensored in rows:
+            if free_slots <= 0:
+                break
+
+            if model_id in _active_downloads:
+                continue
+
+            request = DownloadModelRequest(
+                model_id=model_id,
+                model_name=model_name or model_id,
+                is_quantized=bool(is_quantized),
+                is_uncensored=bool(is_uncensored),
+            )
+
+            # Mark as downloading before releasing the lock so it isn't picked twice
+            update_downloading_task(model_id)
+            publish_download_status(model_id)
+
+            stop_event = threading.Event()
+            thread = threading.Thread(
+                target=_run_download,
+                args=(request, stop_event),
+                name=f"download-{model_id}",
+                daemon=True,
+            )
+
+            _active_downloads[model_id] = _ActiveDownload(thread=thread, stop_event=stop_event)
+            thread.start()
+            free_slots -= 1
+
+def _stop_active_download(model_id: str, reason: str) -> bool:
+    with _scheduler_lock:
+        download = _active_downloads.get(model_id)
+        if download is None:
+            return False
+
+        download.stop_reason = reason
+        download.stop_event.set()
+
+    return True
+
+def _run_download(request: DownloadModelRequest, stop_event: threading.Event) -> None:
+    try:
+        download_model(request, stop_event)
+
+    except DownloadStopped:
+        with _scheduler_lock:
+            reason = _active_downloads[request.model_id].stop_reason
+
+        if reason == _STOP_PAUSE:
+            update_download_task_status(request.model_id, PAUSED)
+
+        elif reason == _STOP_CANCEL:
+            delete_download_task(request.model_id)
+            shutil.rmtree(model_download_dir(request.model_id), ignore_errors=True)
+
+        else:
+            # Server is shutting down, leave it queued so it resumes on the next start
+            update_download_task_status(request.model_id, PENDING)
+
+    except Exception:
+        # download_model has already marked the task as failed
+        pass
+
+    finally:
+        with _scheduler_lock:
+            _active_downloads.pop(request.model_id, None)
+        
+        # Push the final state (ready / corrupt / failed / paused / pending / removed)
+        publish_download_status(request.model_id)
+
+        # A slot has freed up, start the next queued download
+        dispatch_downloads()
+
+        # This thread is done, release its database connection
+        close_thread_connection()
+
+def download_model(request: DownloadModelRequest, stop_event: Optional[threading.Event] = None):
+    try:
+        # Write byte-level progress + throughput into the download task as the files stream in
+        def on_progress(bytes_downloaded: int, total_bytes: int, speed_bps: float) -> None:
+            progress = int(bytes_downloaded * 100 / total_bytes) if total_bytes else 0
+
+            # 100 is reserved for the ready status once every file is in place
+            update_download_progress(request.model_id, min(progress, 99), bytes_downloaded, total_bytes, speed_bps)
+            publish_download_status(request.model_id)
+
+        # Download the model from Hugging Face Hub with parallel ranged requests
+        downloaded = download_repository(
+            repo_id=request.model_id,
+            local_dir=str(model_download_dir(request.model_id)),
+            on_progress=on_progress,
+            stop_event=stop_event,
+        )
+        local_dir = downloaded.local_dir
+
+        # Keep the files' location + revision, the task only becomes ready once they pass the check
+        update_downloaded_task(request.model_id, local_dir, downloaded.revision)
+
+        # Check every file against the downloaded revision, a mismatch marks the task corrupt so it can't be loaded
+        # Files linked from the blob store were checked when their blob was stored, they aren't hashed again
+        verification_error: Optional[str] = None
+        try:
+            verified = verify_model(request.model_id, local_dir, downloaded.revision, reuse_blob_hashes=True).status == READY
+            known_hashes = downloaded.lfs_hashes
+        except Exception as exception:
+            # The check couldn't run (ex: Hub unreachable), the download itself completed
+            print(f"[Verification error] {request.model_id}: {exception}")
+            verified = True
+            known_hashes = {}
+            verification_error = f"verification could not run: {exception}"
+
+        # Corrupt models stay out of the models table until a download passes the check
+        if not verified:
+            return
+
+        # Share identical files with other models, verified LFS files already match the Hub's hashes
+        # Unverified files are hashed by the store so a blob's name always matches its content
+        add_model_to_blob_store(request.model_id, local_dir, known_hashes)
+
+        # Once model is downloaded and verified, update the task status to ready
+        update_ready_task(request.model_id, local_dir)
+
+        # Keep why the check was skipped, verified_at stays empty until the model is verified again
+        if verification_error is not None:
+            update_verification_result(
+                request.model_id,
+                READY,
+                None,
+                json.dumps([FileVerificationError(path="", error=verification_error).model_dump()]),
+            )
+
+        # Once all tasks are complete, insert the model data into the database
+        insert_model(request)
+        
+        # Record parameter count / memory estimates now so loads can be checked without rescanning
+        try:
+            scan_model_inventory(request.model_id, local_dir)
+        except Exception as exception:
+            print(f"[Inventory error] {request.model_id}: {exception}")
+
+    except DownloadStopped:
+        raise
+
+    except Exception as e:
+        update_failed_task(request.model_id)
+
+        print(f"[Download error] {request.model_id}: {e}")
+        raise
@@ -1,24 +1,41 @@
 import re
-from typing import Any, Dict, List, Union
+import threading
+from functools import lru_cache
+from typing import List, NamedTuple, Optional, Union
 from huggingface_hub import ModelInfo
-from transformers import BitsAndBytesConfig
-import torch
 
 from app.services.cache.cache_service import add_entry_to_cache, get_context_messages
+from app.services.cache.compaction import get_compacted_context
+from app.services.cache.retrieval import get_retrieved_context
 from app.utils.types.model_types import RunInferenceRequest
 from app.utils.types.cache_types import ContextMessage
-from app.db.messages import persist_user_and_assistant_message
-from app.utils.constants import ASSISTANT, DEFAULT_SYSTEM_PROMPT, SYSTEM, USER
+from app.services.cache.message_writer import enqueue_user_and_assistant_message
+from app.services.model.download_planner import plan_download
+from app.utils.constants import ASSISTANT, COMPACT_CONTEXT, DEFAULT_SYSTEM_PROMPT, RETRIEVE_CONTEXT, SYSTEM, USER
 
-# Apple GPU usuage
-HAS_MPS  = getattr(torch.backends, "mps", None) and torch.backends.mps.is_available()
-
-# NVIDIA CUDA usage
-HAS_CUDA = torch.cuda.is_available()
-
-# AMD ROCM/HIP usage
-# Apparently NVIDIA CUDA & AMD ROC both qualify for cuda?
-IS_ROCM  = HAS_CUDA and (torch.version.hip is not None)
+class DeviceSupport(NamedTuple):
+    # Apple GPU usuage
+    has_mps: bool
+    
+    # NVIDIA CUDA usage
+    has_cuda: bool
+    
+    # AMD ROCM/HIP usage
+    # Apparently NVIDIA CUDA & AMD ROC both qualify for cuda?
+    is_rocm: bool
+
+@lru_cache(maxsize=None)
+def _device_support() -> DeviceSupport:
+    # Importing torch takes seconds + hundreds of MB, the API process only pays for it once something needs the devices
+    import torch
+    
+    has_cuda = torch.cuda.is_available()
+    
+    return DeviceSupport(
+        has_mps=bool(getattr(torch.backends, "mps", None) and torch.backends.mps.is_available()),
+        has_cuda=has_cuda,
+        is_rocm=has_cuda and torch.version.hip is not None,
+    )
 
 def _is_quantizable(model_info) -> bool:
     tags = [t.lower() for t in model_info.tags]
@@ -38,27 +55,9 @@ def _is_uncensored(model_info) -> bool:
     )
     
 def _model_weights_size(info: ModelInfo) -> int:
-    return sum(f.size or 0 for f in info.siblings
-        if f.rfilename.endswith((".bin", ".safetensors")))
+    # Size of the .safetensors / .bin weights that will actually be downloaded, duplicate formats aren't counted twice
+    return plan_download(info.siblings).transformers_weights_bytes
     
-def _get_quant_config(precision: str):
-    if precision == "4bit":
-        return BitsAndBytesConfig(
-            load_in_4bit=True,
-            bnb_4bit_compute_dtype=torch.float16,
-            bnb_4bit_use_double_quant=True,
-            bnb_4bit_quant_type="nf4",
-            llm_int8_enable_fp32_cpu_offload=True
-        )
-    if precision == "8bit":
-        return BitsAndBytesConfig(
-            load_in_8bit=True,
-            bnb_8bit_compute_dtype=torch.float16,
-            llm_int8_enable_fp32_cpu_offload=True
-        )
-        
-    return None
-
 def _build_plain_prompt(messages):
     # If messages is already a string, return it directly
     if isinstance(messages, str):
@@ -93,16 +92,31 @@ def _cleanup_plain_text_response(reply: str, mode: str) -> str:
 
 def _prepare_pipeline_input(request: RunInferenceRequest, mode: str) -> Union[List[ContextMessage], str]: # List of ContextMessage or str 
     if mode == "conversation":
-        # Get chat history and build conversation
-        chat_history = get_context_messages(
-            request.session_id, 
-            request.model_id, 
-            request.share_context
-        )
+        system_prompt = DEFAULT_SYSTEM_PROMPT
+        
+        # Compacted conversations send the summary of their oldest turns + the turns after it
+        if request.context_mode == COMPACT_CONTEXT and not request.share_context:
+            summary, chat_history = get_compacted_context(request.session_id, request.model_id)
+            
+            # Part of the system prompt, many chat templates only allow a system message at the start
+            if summary:
+                system_prompt = f"{DEFAULT_SYSTEM_PROMPT}\n\nSummary of the earlier conversation:\n{summary}"
+                
+        # Shared context across every model of the session, only the turns that matter for this prompt
+        elif request.context_mode == RETRIEVE_CONTEXT and request.share_context:
+            chat_history = get_retrieved_context(request.session_id, request.prompt)
+            
+        else:
+            # Get chat history and build conversation
+            chat_history = get_context_messages(
+                request.session_id, 
+                request.model_id, 
+                request.share_context
+            )
         
         # Add system prompt to the beginning of the chat history along with the user message
         pipeline_input = (
-            [ContextMessage(role=SYSTEM, content=DEFAULT_SYSTEM_PROMPT).to_dict()]
+            [ContextMessage(role=SYSTEM, content=system_prompt).to_dict()]
             + chat_history
             + [ContextMessage(role=USER, content=request.prompt).to_dict()]
         )
@@ -120,10 +134,10 @@ def _prepare_pipeline_input(request: RunInferenceRequest, mode: str) -> Union[Li
         # In generate mode, we just return the plain prompt string so model can complete it
         return request.prompt
     
-def _update_cache_and_database(request: RunInferenceRequest, inference_output: str) -> None:
+def _update_cache_and_database(request: RunInferenceRequest, inference_output: str) -> Optional[threading.Event]:
     # Cache & DB persistence is only neded in Conversation Mode
     if request.mode != "conversation":
-        return
+        return None
     
     # Cache the user message
     add_entry_to_cache(
@@ -143,40 +157,15 @@ def _update_cache_and_database(request: RunInferenceRequest, inference_output: s
         content=inference_output,
     )
     
-    # Add user + assistant messages in database
-    persist_user_and_assistant_message(request, inference_output)
-    
-def _get_device_config(precision: str) -> Dict[str, Any]:
-    # Check for MPS for Apple Silicon GPU
-    # Quantization not possible
-    if HAS_MPS:
-        return {
-            "device_map": {"": "mps"},
-            "torch_dtype": torch.float16,
-        }
+    # Queue user + assistant messages, the message writer commits them to the database in batches
+    # The returned event is set once they're committed
+    return enqueue_user_and_assistant_message(
+        request.session_id,
+        request.model_id,
+        request.prompt,
+        inference_output
+    )
     
-    # Radeon open compute config
-    # Quantization not possible
-    if IS_ROCM:
-        return {
-            "device_map": {"": "cuda:0"},
-            "torch_dtype": torch.float16,
-        }
-        
-    # Standard NVIDIA/CUDA config
-    # Include quantization based on precision 
-    if HAS_CUDA:    
-        return {
-            "device_map": "auto",
-            "quantization_config": _get_quant_config(precision),
-        }
-
-    # CPU-only config
-    return {
-        "device_map": {"": "cpu"},
-        "torch_dtype": torch.float32,
-    }
-
 def _remove_think_tags(inference_prompt: str) -> str:
     # This matches both <think> and </think>
     return re.sub(r"</?think>", "", inference_prompt)
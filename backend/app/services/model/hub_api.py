@@ -0,0 +1,6 @@
+from huggingface_hub import HfApi
+
+# Initialize the Hugging Face API client
+# This will be used to interact with the Hugging Face Hub for model operations like downloading models and searching for models
+# Set the HF_ENDPOINT env variable to point it at a local stand-in for the Hub API
+huggingface_api = HfApi()
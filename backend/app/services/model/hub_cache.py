@@ -0,0 +1,113 @@
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.db.hub_cache import delete_expired_hub_cache_entries, get_hub_cache_entry, set_hub_cache_entry
+from app.utils.types.model_types import HubCacheStats
+
+# How long a search results page from the Hub stays fresh (seconds)
+SEARCH_PAGE_TTL = 10 * 60
+
+# How long per-model file metadata (weights size) stays fresh (seconds)
+MODEL_INFO_TTL = 24 * 60 * 60
+
+class HubCache:
+    """
+    Two-level TTL cache for Hugging Face Hub responses.
+    Values are kept in an in-memory LRU and in the hub_cache SQLite table so they survive restarts.
+    Values must be JSON serializable.
+    """
+
+    def __init__(self, namespace: str, ttl_seconds: float, max_memory_entries: int):
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.max_memory_entries = max_memory_entries
+
+        # key -> (expires_at, value), ordered from least to most recently used
+        self._memory: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+
+        # 1. In-memory LRU
+        entry = self._memory.get(key)
+        if entry is not None:
+            expires_at, value = entry
+
+            if expires_at > now:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return value
+
+            # Expired, drop it and fall through to disk
+            del self._memory[key]
+
+        # 2. SQLite on disk, a failing disk cache should never fail the search so treat errors as a miss
+        try:
+            row = await run_in_threadpool(get_hub_cache_entry, self.namespace, key, now)
+        except sqlite3.Error as exception:
+            print(f"[Hub cache error] {self.namespace}: {exception}")
+            row = None
+
+        if row is not None:
+            raw_value, expires_at = row
+            value = json.loads(raw_value)
+
+            # Promote to memory so the next lookup skips the database
+            self._remember(key, expires_at, value)
+            self.disk_hits += 1
+            return value
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: Any) -> None:
+        expires_at = time.time() + self.ttl_seconds
+
+        self._remember(key, expires_at, value)
+
+        try:
+            await run_in_threadpool(set_hub_cache_entry, self.namespace, key, json.dumps(value), expires_at)
+        except sqlite3.Error as exception:
+            print(f"[Hub cache error] {self.namespace}: {exception}")
+
+    def stats(self) -> HubCacheStats:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+
+        return HubCacheStats(
+            namespace=self.namespace,
+            memory_hits=self.memory_hits,
+            disk_hits=self.disk_hits,
+            misses=self.misses,
+            hit_rate=(self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            memory_entries=len(self._memory),
+        )
+
+    def _remember(self, key: str, expires_at: float, value: Any) -> None:
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+
+        # Evict least recently used entries once over capacity
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+# Search results pages, keyed by the search arguments
+search_pages_cache = HubCache("search_page", SEARCH_PAGE_TTL, max_memory_entries=256)
+
+# Total size of the weight files a download would fetch per model, keyed by model ID
+model_weights_size_cache = HubCache("planned_weights_size", MODEL_INFO_TTL, max_memory_entries=4096)
+
+async def prune_expired_hub_cache() -> None:
+    # Remove expired rows so the on-disk cache doesn't grow forever
+    try:
+        await run_in_threadpool(delete_expired_hub_cache_entries, time.time())
+    except sqlite3.Error as exception:
+        print(f"[Hub cache error] Failed to prune expired entries: {exception}")
@@ -0,0 +1,352 @@
+import asyncio
+import bisect
+import itertools
+import math
+import time
+import uuid
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, List, Optional
+
+from app.utils.types.model_types import InferenceQueueStatus, QueuedInferenceRequest, SessionWaitStats
+
+# Max number of requests waiting for a model (the running request isn't counted)
+MAX_INFERENCE_QUEUE_DEPTH = 8
+
+# Seconds a request may wait in the queue when it doesn't set its own deadline
+DEFAULT_INFERENCE_DEADLINE = 120
+
+# Service time assumed for a model until requests have been timed
+INITIAL_SERVICE_SECONDS = 5.0
+
+# Weight of the latest request in the running average of service times
+SERVICE_TIME_SMOOTHING = 0.2
+
+# Priority classes, interactive chat turns are served ahead of batch / generate requests
+INTERACTIVE = "interactive"
+BATCH = "batch"
+
+# Share of the worker each class gets under contention, a batch request costs 4x an interactive one of the same length
+PRIORITY_WEIGHTS: Dict[str, float] = {
+    INTERACTIVE: 4.0,
+    BATCH: 1.0,
+}
+
+# max_new_tokens a turn may generate while other sessions are waiting for the worker
+CONTENDED_MAX_NEW_TOKENS = 256
+
+# Requests without a session (ex: OpenAI-compatible clients) share one flow
+ANONYMOUS_SESSION = "anonymous"
+
+# Sessions with wait time stats kept per model, the least recently served are dropped first
+MAX_TRACKED_SESSIONS = 256
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a model's inference queue is full, retry_after is the estimated seconds until a slot frees up.
+    """
+
+    def __init__(self, model_id: str, queued: int, retry_after: int):
+        super().__init__(f"{model_id} is busy, {queued} requests are already waiting")
+        self.retry_after = retry_after
+
+class DeadlineExceeded(Exception):
+    """
+    Raised when a request's deadline passes before the model worker got to it.
+    """
+
+    def __init__(self, request_id: str, retry_after: int):
+        super().__init__(f"Request {request_id} waited past its deadline and was dropped")
+        self.retry_after = retry_after
+
+class InferenceTicket:
+    """
+    A request's place in a model's queue. Position 0 means a worker replica is running it (or about to run it).
+    max_new_tokens is the token budget the request gets once it's its turn, lower than asked for under contention.
+    """
+
+    def __init__(self, queue: "_ModelQueue", request_id: str, session_id: str, priority: str,
+                 max_new_tokens: int, deadline: float):
+        self.queue = queue
+        self.request_id = request_id
+        self.session_id = session_id
+        self.priority = priority
+        self.max_new_tokens = max_new_tokens
+        self.deadline = deadline
+        self.enqueued_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.cancelled = False
+
+        # Virtual time the request would finish at under weighted fair queuing, lowest goes first
+        self.finish_tag = 0.0
+        self.sequence = 0
+
+        self._changed = asyncio.Event()
+
+    @property
+    def position(self) -> int:
+        return self.queue.position(self)
+
+    async def wait_for_turn(self) -> AsyncIterator[int]:
+        # Yields the queue position every time it changes, returns once it's this request's turn
+        try:
+            while True:
+                self._changed.clear()
+                position = self.position
+
+                if position == 0 or self.cancelled:
+                    break
+
+                yield position
+
+                remaining = self.deadline - time.monotonic()
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout=max(remaining, 0))
+                except asyncio.TimeoutError:
+                    raise DeadlineExceeded(self.request_id, self.queue.retry_after())
+
+            if self.cancelled:
+                return
+
+            # Dropped here at the latest so expired requests never reach the worker
+            if time.monotonic() > self.deadline:
+                raise DeadlineExceeded(self.request_id, self.queue.retry_after())
+
+            self.started_at = time.monotonic()
+
+        except BaseException:
+            # Expired / abandoned while waiting, give the place to the next request
+            self.release()
+            raise
+
+    def cancel(self) -> None:
+        # Leave the queue straight away so the place goes to the next request,
+        # the caller finds the ticket cancelled once wait_for_turn returns
+        self.cancelled = True
+        self.release()
+        self._changed.set()
+
+    def release(self) -> None:
+        self.queue.remove(self)
+
+    def notify(self) -> None:
+        self._changed.set()
+
+class _SessionStats:
+    def __init__(self):
+        self.requests = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.last_wait = 0.0
+        self.capped_requests = 0
+
+class _ModelQueue:
+    """
+    Weighted fair queue for one model: every session is a flow, a request's cost is its token budget
+    divided by the weight of its priority class. The request with the lowest virtual finish time runs next,
+    so a long generate request can't hold up other sessions for more than one turn.
+    Up to `slots` requests run at the same time, one per worker replica.
+    """
+
+    def __init__(self, model_id: str):
+        self.model_id = model_id
+        self.slots = 1
+        self.running: List[InferenceTicket] = []
+        self.waiting: List[InferenceTicket] = []
+        self.service_seconds = INITIAL_SERVICE_SECONDS
+
+        # Virtual clock (start tag of the last started request) + each session's last finish tag
+        self.virtual_time = 0.0
+        self.session_finish: Dict[str, float] = {}
+        self.sessions: "OrderedDict[str, _SessionStats]" = OrderedDict()
+        self._sequence = itertools.count()
+
+    def add(self, ticket: InferenceTicket) -> None:
+        # A session's next request starts after its previous one, an idle session starts at the current virtual time
+        start = max(self.virtual_time, self.session_finish.get(ticket.session_id, 0.0))
+        ticket.finish_tag = start + ticket.max_new_tokens / PRIORITY_WEIGHTS[ticket.priority]
+        ticket.sequence = next(self._sequence)
+        self.session_finish[ticket.session_id] = ticket.finish_tag
+
+        bisect.insort(self.waiting, ticket, key=lambda other: (other.finish_tag, other.sequence))
+
+        self._start_next()
+
+    def position(self, ticket: InferenceTicket) -> int:
+        if ticket in self.waiting:
+            return self.waiting.index(ticket) + 1
+        return 0
+
+    def remove(self, ticket: InferenceTicket) -> None:
+        if ticket in self.running:
+            self.running.remove(ticket)
+
+            # Keep a running average of how long a request holds the worker for Retry-After estimates
+            if ticket.started_at is not None:
+                elapsed = time.monotonic() - ticket.started_at
+                self.service_seconds += SERVICE_TIME_SMOOTHING * (elapsed - self.service_seconds)
+
+            self._start_next()
+
+        elif ticket in self.waiting:
+            self.waiting.remove(ticket)
+
+        else:
+            return
+
+        # Everyone behind the removed request moved up
+        for other in self.waiting:
+            other.notify()
+
+    def retry_after(self) -> int:
+        # Roughly when one of the running requests finishes and a place in the queue frees up
+        return max(1, math.ceil(self.service_seconds / self.slots))
+
+    def _start_next(self) -> None:
+        while self.waiting and len(self.running) < self.slots:
+            self._start(self.waiting.pop(0))
+
+    def _start(self, ticket: InferenceTicket) -> None:
+        self.running.append(ticket)
+        self.virtual_time = ticket.finish_tag - ticket.max_new_tokens / PRIORITY_WEIGHTS[ticket.priority]
+
+        # Sessions whose last request starts before the virtual clock are idle, their tag no longer matters
+        self.session_finish = {
+            session_id: finish_tag for session_id, finish_tag in self.session_finish.items() if finish_tag > self.virtual_time
+        }
+
+        # Cap long turns while other sessions are waiting so they get the worker sooner
+        capped = False
+        if ticket.max_new_tokens > CONTENDED_MAX_NEW_TOKENS and any(
+            other.session_id != ticket.session_id for other in self.waiting
+        ):
+            ticket.max_new_tokens = CONTENDED_MAX_NEW_TOKENS
+            capped = True
+
+        self._record_wait(ticket, time.monotonic() - ticket.enqueued_at, capped)
+        ticket.notify()
+
+    def _record_wait(self, ticket: InferenceTicket, waited: float, capped: bool) -> None:
+        stats = self.sessions.pop(ticket.session_id, None) or _SessionStats()
+        stats.requests += 1
+        stats.total_wait += waited
+        stats.max_wait = max(stats.max_wait, waited)
+        stats.last_wait = waited
+        stats.capped_requests += capped
+
+        # Most recently served session last, the oldest is dropped once too many are tracked
+        self.sessions[ticket.session_id] = stats
+        if len(self.sessions) > MAX_TRACKED_SESSIONS:
+            self.sessions.popitem(last=False)
+
+class InferenceAdmission:
+    """
+    Per-model admission control in front of the model worker: bounded fair queues,
+    fast rejection when a queue is full and deadlines for waiting requests.
+    """
+
+    def __init__(self, max_queue_depth: int = MAX_INFERENCE_QUEUE_DEPTH,
+                 default_deadline: float = DEFAULT_INFERENCE_DEADLINE):
+        self.max_queue_depth = max_queue_depth
+        self.default_deadline = default_deadline
+        self._queues: Dict[str, _ModelQueue] = {}
+
+    def admit(self, model_id: str, max_new_tokens: int, request_id: Optional[str] = None,
+              session_id: Optional[str] = None, priority: str = INTERACTIVE,
+              deadline_seconds: Optional[float] = None) -> InferenceTicket:
+        queue = self.check_capacity(model_id)
+
+        deadline = time.monotonic() + (deadline_seconds if deadline_seconds is not None else self.default_deadline)
+        ticket = InferenceTicket(
+            queue,
+            request_id or uuid.uuid4().hex,
+            session_id or ANONYMOUS_SESSION,
+            priority,
+            max_new_tokens,
+            deadline,
+        )
+        queue.add(ticket)
+
+        return ticket
+
+    def check_capacity(self, model_id: str) -> "_ModelQueue":
+        queue = self._queues.setdefault(model_id, _ModelQueue(model_id))
+
+        # Reject straight away instead of letting requests pile up, the running request doesn't count
+        if len(queue.waiting) >= self.max_queue_depth:
+            raise AdmissionRejected(model_id, len(queue.waiting), queue.retry_after())
+
+        return queue
+
+    def set_slots(self, model_id: str, slots: int) -> None:
+        # Requests that may run at the same time, one per worker replica of the model
+        queue = self._queues.setdefault(model_id, _ModelQueue(model_id))
+        queue.slots = slots
+        queue._start_next()
+
+        for ticket in queue.waiting:
+            ticket.notify()
+
+    def is_idle(self, model_id: str) -> bool:
+        # Nothing running or waiting for the model, background work can use it without holding anyone up
+        queue = self._queues.get(model_id)
+        return queue is None or not (queue.running or queue.waiting)
+
+    def cancel(self, request_id: str) -> bool:
+        # Cancel a request that is still waiting, returns False if it isn't queued (running or unknown)
+        for queue in self._queues.values():
+            for ticket in queue.waiting:
+                if ticket.request_id == request_id:
+                    ticket.cancel()
+                    return True
+
+        return False
+
+    def position(self, request_id: str) -> Optional[int]:
+        for queue in self._queues.values():
+            if any(ticket.request_id == request_id for ticket in queue.running):
+                return 0
+
+            for position, ticket in enumerate(queue.waiting, start=1):
+                if ticket.request_id == request_id:
+                    return position
+
+        return None
+
+    def status(self) -> List[InferenceQueueStatus]:
+        now = time.monotonic()
+
+        return [
+            InferenceQueueStatus(
+                model_id=model_id,
+                running=[ticket.request_id for ticket in queue.running],
+                max_queue_depth=self.max_queue_depth,
+                average_service_seconds=queue.service_seconds,
+                queued=[
+                    QueuedInferenceRequest(
+                        request_id=ticket.request_id,
+                        session_id=ticket.session_id,
+                        priority=ticket.priority,
+                        position=position,
+                        waited_seconds=now - ticket.enqueued_at,
+                        deadline_in_seconds=ticket.deadline - now,
+                        estimated_wait_seconds=math.ceil(position / queue.slots) * queue.service_seconds,
+                    )
+                    for position, ticket in enumerate(queue.waiting, start=1)
+                ],
+                sessions=[
+                    SessionWaitStats(
+                        session_id=session_id,
+                        requests=stats.requests,
+                        average_wait_seconds=stats.total_wait / stats.requests,
+                        max_wait_seconds=stats.max_wait,
+                        last_wait_seconds=stats.last_wait,
+                        capped_requests=stats.capped_requests,
+                    )
+                    for session_id, stats in queue.sessions.items()
+                ],
+            )
+            for model_id, queue in self._queues.items()
+        ]
+
+# Shared by every inference path (HTTP, WebSocket, OpenAI-compatible API)
+inference_admission = InferenceAdmission()
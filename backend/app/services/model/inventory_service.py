@@ -0,0 +1,289 @@
+import json
+import multiprocessing
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import psutil
+from fastapi.concurrency import run_in_threadpool
+
+from app.db.inventory import (
+    InventoryRow,
+    get_all_model_inventory,
+    get_model_inventory as get_model_inventory_row,
+    upsert_model_inventory,
+)
+from app.db.aio.model import get_all_models, get_model_directory_path
+from app.services.model.helper import DeviceSupport, _device_support
+from app.utils.types.model_types import LoadModelRequest, ModelFitCheck, ModelInventory
+
+# Bytes each parameter takes in memory for every precision a model can be loaded with
+BYTES_PER_PARAMETER: Dict[str, float] = {
+    "fp32": 4,
+    "fp16": 2,
+    "8bit": 1,
+    "4bit": 0.5,
+}
+
+# Extra memory on top of the weights (activations, KV cache for typical prompts, CUDA context, buffers)
+MEMORY_OVERHEAD = 1.2
+
+# Warn when a model would use more than this share of the available memory
+MEMORY_HEADROOM = 0.9
+
+# Devices are probed from a short-lived process, CUDA initialized in the API process would keep a context
+# (+ the VRAM it holds) on every GPU for as long as the server runs
+_probe_context = multiprocessing.get_context("spawn")
+
+# The devices of the machine don't change, only their free memory does (a CPU-only machine is probed once)
+_probed_devices: Optional[DeviceSupport] = None
+
+# Bytes per element of the safetensors dtypes, used when only .bin weights are available
+_DTYPE_SIZES: Dict[str, int] = {
+    "float64": 8, "float32": 4, "float16": 2, "bfloat16": 2, "int8": 1, "uint8": 1,
+}
+
+# safetensors header dtype -> torch dtype name
+_SAFETENSORS_DTYPES: Dict[str, str] = {
+    "F64": "float64", "F32": "float32", "F16": "float16", "BF16": "bfloat16",
+    "I64": "int64", "I32": "int32", "I16": "int16", "I8": "int8", "U8": "uint8", "BOOL": "bool",
+    "F8_E4M3": "float8_e4m3fn", "F8_E5M2": "float8_e5m2",
+}
+
+# Config keys different architectures use for the max context length
+_CONTEXT_LENGTH_KEYS = (
+    "max_position_embeddings", "n_positions", "max_sequence_length", "seq_length", "n_ctx", "max_seq_len",
+)
+
+# Refuse to parse absurdly large safetensors headers (corrupt / not a safetensors file)
+_MAX_SAFETENSORS_HEADER_SIZE = 100 * 1024 * 1024
+
+class InsufficientMemoryError(Exception):
+    """
+    Raised when a model is not expected to fit in the available RAM / VRAM.
+    """
+
+def scan_model_inventory(model_id: str, local_dir: str) -> ModelInventory:
+    root = Path(local_dir)
+    config = _read_config(root)
+
+    # Count parameters from the safetensors headers, tensors themselves are never read
+    parameter_count, dtype = _count_safetensors_parameters(root)
+
+    # .bin checkpoints can't be inspected without unpickling, estimate from the file size + config dtype instead
+    weights_bytes = sum(path.stat().st_size for path in root.rglob("*") if path.suffix in (".safetensors", ".bin"))
+    if parameter_count == 0 and weights_bytes:
+        dtype = config.get("torch_dtype") or "float32"
+        parameter_count = weights_bytes // _DTYPE_SIZES.get(dtype, 4)
+
+    inventory = ModelInventory(
+        model_id=model_id,
+        architecture=(config.get("architectures") or [config.get("model_type")])[0],
+        parameter_count=parameter_count,
+        dtype=dtype,
+        context_length=_context_length(config),
+        weights_bytes=weights_bytes,
+        memory_estimates={
+            precision: int(parameter_count * bytes_per_parameter * MEMORY_OVERHEAD)
+            for precision, bytes_per_parameter in BYTES_PER_PARAMETER.items()
+        },
+    )
+
+    # Store the result so the directory is only scanned once
+    upsert_model_inventory((
+        inventory.model_id,
+        inventory.architecture,
+        inventory.parameter_count,
+        inventory.dtype,
+        inventory.context_length,
+        inventory.weights_bytes,
+        *(inventory.memory_estimates[precision] for precision in BYTES_PER_PARAMETER),
+        time.time(),
+    ))
+
+    return inventory
+
+async def get_model_inventory(model_id: str) -> Optional[ModelInventory]:
+    # Use the stored scan if there is one
+    row = await run_in_threadpool(get_model_inventory_row, model_id)
+    if row is not None:
+        return _to_inventory(row)
+
+    # Scan models downloaded before the inventory existed
+    directory = await get_model_directory_path(model_id)
+    if directory is None or directory[0] is None or not Path(directory[0]).is_dir():
+        return None
+
+    return await run_in_threadpool(scan_model_inventory, model_id, directory[0])
+
+async def list_model_inventory() -> List[ModelInventory]:
+    scanned = {row[0]: _to_inventory(row) for row in await run_in_threadpool(get_all_model_inventory)}
+
+    inventory: List[ModelInventory] = []
+    for model_id, *_ in await get_all_models():
+        # Scan any downloaded model that hasn't been scanned yet
+        model_inventory = scanned.get(model_id) or await get_model_inventory(model_id)
+        if model_inventory is not None:
+            inventory.append(model_inventory)
+
+    return inventory
+
+async def check_model_fit(model_id: str, precision: str, replicas: int = 1,
+                          unloaded: Sequence[LoadModelRequest] = ()) -> Optional[ModelFitCheck]:
+    # Models that can't be scanned are loaded without a check, like before
+    inventory = await get_model_inventory(model_id)
+    if inventory is None or inventory.parameter_count == 0:
+        return None
+
+    # Work out the precision + device _get_device_config would actually load the model with
+    devices, free_vram = await _probe_devices()
+    device, load_precision = _load_target(devices, precision)
+
+    # Every worker replica holds its own copy of the weights
+    required_bytes = inventory.memory_estimates[load_precision] * replicas
+    device_bytes, available_bytes = _available_memory(device, free_vram)
+
+    # Models the load replaces / unloads first free their memory before the new workers start
+    freed_bytes = 0
+    for loaded in unloaded:
+        loaded_inventory = await get_model_inventory(loaded.model_id)
+        if loaded_inventory is not None:
+            freed_bytes += loaded_inventory.memory_estimates[_load_target(devices, loaded.precision)[1]] * loaded.replicas
+
+    device_bytes += freed_bytes
+    available_bytes += freed_bytes
+
+    warning: Optional[str] = None
+    if required_bytes > available_bytes:
+        warning = (
+            f"{model_id} needs about {_gigabytes(required_bytes)} GB at {load_precision}"
+            f"{f' for {replicas} replicas' if replicas > 1 else ''} "
+            f"but only {_gigabytes(available_bytes)} GB is available on {device}."
+        )
+    elif required_bytes > device_bytes:
+        warning = f"{model_id} doesn't fit in GPU memory, part of it will run from CPU RAM and be slower."
+    elif required_bytes > available_bytes * MEMORY_HEADROOM:
+        warning = f"{model_id} will use almost all available memory on {device}."
+
+    return ModelFitCheck(
+        model_id=model_id,
+        precision=load_precision,
+        device=device,
+        required_bytes=required_bytes,
+        available_bytes=available_bytes,
+        fits=required_bytes <= available_bytes,
+        warning=warning,
+    )
+
+async def _probe_devices() -> Tuple[DeviceSupport, List[int]]:
+    global _probed_devices
+
+    # Without a GPU only the RAM is measured, which doesn't need torch
+    if _probed_devices is not None and not _probed_devices.has_cuda:
+        return _probed_devices, []
+
+    # Starting the probe process + importing torch takes a few seconds, keep it off the event loop
+    _probed_devices, free_vram = await run_in_threadpool(_run_device_probe)
+    return _probed_devices, free_vram
+
+def _run_device_probe() -> Tuple[DeviceSupport, List[int]]:
+    with ProcessPoolExecutor(max_workers=1, mp_context=_probe_context) as probe:
+        return probe.submit(_device_probe).result()
+
+def _device_probe() -> Tuple[DeviceSupport, List[int]]:
+    # Runs in the probe process: the kinds of devices + free memory of every GPU
+    devices = _device_support()
+    if not devices.has_cuda:
+        return devices, []
+
+    import torch
+    return devices, [torch.cuda.mem_get_info(index)[0] for index in range(torch.cuda.device_count())]
+
+def _load_target(devices: DeviceSupport, precision: str) -> Tuple[str, str]:
+    # Mirrors _get_device_config, quantization only happens on CUDA
+    if devices.has_mps:
+        return "mps", "fp16"
+    if devices.is_rocm:
+        return "rocm", "fp16"
+    if devices.has_cuda:
+        return "cuda", precision if precision in ("4bit", "8bit") else "fp32"
+    return "cpu", "fp32"
+
+def _available_memory(device: str, free_vram: List[int]) -> Tuple[int, int]:
+    # Returns (free memory on the device, free memory the model can spill into)
+    ram_bytes = psutil.virtual_memory().available
+
+    # CPU + Apple unified memory
+    if device not in ("cuda", "rocm"):
+        return ram_bytes, ram_bytes
+
+    # ROCm loads everything on the first GPU
+    if device == "rocm":
+        return free_vram[0], free_vram[0]
+
+    # device_map="auto" spreads the model over every GPU then offloads the rest to CPU RAM
+    vram_bytes = sum(free_vram)
+    return vram_bytes, vram_bytes + ram_bytes
+
+def _read_config(root: Path) -> Dict[str, Any]:
+    try:
+        return json.loads((root / "config.json").read_text())
+    except (OSError, ValueError):
+        return {}
+
+def _count_safetensors_parameters(root: Path) -> Tuple[int, Optional[str]]:
+    parameter_count = 0
+    dtype_counts: Dict[str, int] = {}
+
+    for path in root.rglob("*.safetensors"):
+        for tensor in _read_safetensors_header(path).values():
+            elements = 1
+            for dimension in tensor["shape"]:
+                elements *= dimension
+
+            parameter_count += elements
+            dtype_counts[tensor["dtype"]] = dtype_counts.get(tensor["dtype"], 0) + elements
+
+    # The dtype holding most of the parameters is the model's dtype
+    dtype = max(dtype_counts, key=dtype_counts.get) if dtype_counts else None
+
+    return parameter_count, _SAFETENSORS_DTYPES.get(dtype, dtype.lower()) if dtype else None
+
+def _read_safetensors_header(path: Path) -> Dict[str, Dict[str, Any]]:
+    # A safetensors file starts with the header length (u64 little endian) followed by a JSON header
+    with open(path, "rb") as file:
+        (header_size,) = struct.unpack("<Q", file.read(8))
+        if header_size > _MAX_SAFETENSORS_HEADER_SIZE:
+            raise ValueError(f"Invalid safetensors header in {path}")
+
+        header = json.loads(file.read(header_size))
+
+    header.pop("__metadata__", None)
+    return header
+
+def _context_length(config: Dict[str, Any]) -> Optional[int]:
+    # Multimodal models keep the language model config under text_config
+    for candidate in (config, config.get("text_config") or {}):
+        for key in _CONTEXT_LENGTH_KEYS:
+            if isinstance(candidate.get(key), int):
+                return candidate[key]
+
+    return None
+
+def _to_inventory(row: InventoryRow) -> ModelInventory:
+    model_id, architecture, parameter_count, dtype, context_length, weights_bytes, *memory = row
+
+    return ModelInventory(
+        model_id=model_id,
+        architecture=architecture,
+        parameter_count=parameter_count,
+        dtype=dtype,
+        context_length=context_length,
+        weights_bytes=weights_bytes,
+        memory_estimates=dict(zip(BYTES_PER_PARAMETER, memory)),
+    )
+
+def _gigabytes(byte_count: int) -> str:
+    return f"{byte_count / (1024 ** 3):.1f}"
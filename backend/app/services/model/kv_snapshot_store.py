@@ -0,0 +1,153 @@
+import hashlib
+import os
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from app.utils.constants import HUGGING_FACE_MODELS_FOLDER
+
+# Prompt KV caches of conversation turns, shared by every model worker + kept across restarts
+KV_SNAPSHOT_FOLDER = Path(HUGGING_FACE_MODELS_FOLDER) / ".kv_snapshots"
+
+# Disk space all snapshots may use together, the least recently used are deleted first once it's exceeded
+KV_SNAPSHOT_DISK_BUDGET = 8 * 1024 ** 3
+
+# Shorter prompts prefill about as fast as a snapshot is read back, they aren't saved
+KV_SNAPSHOT_MIN_TOKENS = 128
+
+_SUFFIX = ".safetensors"
+_PARTIAL_SUFFIX = ".part"
+
+# Files the model's weights are loaded from
+_WEIGHT_SUFFIXES = (".safetensors", ".bin")
+
+class KvSnapshotStore:
+    """
+    Snapshots of a model's KV cache after a prompt, one file per token prefix named
+    <model key>-<tokens>-<prefix hash>.safetensors. The model key covers the model, its weight files + the precision,
+    the prefix hash the exact token ids, so a snapshot is only ever restored for a prompt it is a prefix of.
+    Only paths + bookkeeping live here, the worker process reads / writes the tensors.
+    """
+
+    def __init__(self, model_id: str, local_dir: str, precision: str, folder: Path = KV_SNAPSHOT_FOLDER,
+                 disk_budget: int = KV_SNAPSHOT_DISK_BUDGET):
+        self.folder = folder
+        self.disk_budget = disk_budget
+
+        # A re-downloaded / updated model gets a new key, its old snapshots are never restored + age out
+        weights = sorted(
+            (entry.name, entry.stat().st_size, entry.stat().st_mtime_ns)
+            for entry in os.scandir(local_dir) if entry.is_file() and entry.name.endswith(_WEIGHT_SUFFIXES)
+        )
+        self.model_key = hashlib.sha256(f"{model_id}\0{precision}\0{weights}".encode()).hexdigest()[:16]
+
+        # Latest snapshot of every session this worker served, replaced by the session's next turn
+        self._session_snapshots: Dict[str, Path] = {}
+
+    def path(self, token_ids: List[int]) -> Path:
+        prefix_hash = hashlib.sha256(self.model_key.encode() + array("q", token_ids).tobytes()).hexdigest()[:32]
+        return self.folder / f"{self.model_key}-{len(token_ids):08d}-{prefix_hash}{_SUFFIX}"
+
+    def find(self, token_ids: List[int]) -> Optional[Tuple[Path, int]]:
+        # Longest snapshot of a prefix of the prompt, at least one token is left to run through the model
+        try:
+            names = {entry.name for entry in os.scandir(self.folder) if entry.name.startswith(self.model_key)}
+        except FileNotFoundError:
+            return None
+
+        lengths = sorted({int(name.split("-")[1]) for name in names if name.endswith(_SUFFIX)}, reverse=True)
+        for length in lengths:
+            if length >= len(token_ids):
+                continue
+
+            path = self.path(token_ids[:length])
+            if path.name in names:
+                # Recently used snapshots are evicted last
+                try:
+                    os.utime(path)
+                except FileNotFoundError:
+                    continue  # Evicted by another worker in the meantime
+
+                return path, length
+
+        return None
+
+    def partial_path(self, path: Path) -> Path:
+        # Written here first + renamed once complete, so other workers never read half a snapshot
+        self.folder.mkdir(parents=True, exist_ok=True)
+        return path.with_name(f"{path.name}.{os.getpid()}{_PARTIAL_SUFFIX}")
+
+    def commit(self, session_id: str, partial: Path, path: Path) -> None:
+        os.replace(partial, path)
+
+        # The session's previous turn is a prefix of this one, only the latest is worth keeping
+        # Only snapshots this session wrote are removed, a restored one may be another session's (ex: shared system prompt)
+        previous = self._session_snapshots.get(session_id)
+        if previous is not None and previous != path:
+            previous.unlink(missing_ok=True)
+        self._session_snapshots[session_id] = path
+
+        self.evict()
+
+    def discard(self, path: Path) -> None:
+        # Unreadable / doesn't match the model anymore
+        path.unlink(missing_ok=True)
+
+    def evict(self) -> None:
+        # Least recently used first (mtime is bumped on every restore), across every model's snapshots
+        snapshots = _list_snapshots(self.folder)
+        used = sum(size for _, size, _ in snapshots)
+
+        for path, size, _ in sorted(snapshots, key=lambda snapshot: snapshot[2]):
+            if used <= self.disk_budget:
+                break
+
+            path.unlink(missing_ok=True)
+            used -= size
+
+class KvSnapshotStats:
+    """
+    Snapshot lookups of one model's conversation turns, reported by its workers after every turn.
+    """
+
+    def __init__(self):
+        self.lookups = 0
+        self.hits = 0
+        self.prompt_tokens = 0
+        self.reused_tokens = 0
+        self.restore_seconds = 0.0
+        self.saved = 0
+
+    def record(self, report: Dict) -> None:
+        self.lookups += 1
+        self.prompt_tokens += report["prompt_tokens"]
+        self.reused_tokens += report["reused_tokens"]
+        self.saved += report["saved"]
+
+        if report["reused_tokens"]:
+            self.hits += 1
+            self.restore_seconds += report["restore_seconds"]
+
+def kv_snapshot_usage(folder: Path = KV_SNAPSHOT_FOLDER) -> Tuple[int, int]:
+    # Number of snapshots + bytes they take on disk
+    snapshots = _list_snapshots(folder)
+    return len(snapshots), sum(size for _, size, _ in snapshots)
+
+def _list_snapshots(folder: Path) -> List[Tuple[Path, int, float]]:
+    snapshots = []
+    try:
+        for entry in os.scandir(folder):
+            if not entry.name.endswith(_SUFFIX):
+                continue
+
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue  # Deleted by another worker while listing
+
+            snapshots.append((Path(entry.path), stat.st_size, stat.st_mtime))
+
+    except FileNotFoundError:
+        pass
+
+    return snapshots
@@ -1,24 +1,43 @@
 import asyncio
+import json
 from pathlib import Path
 import shutil
-from typing import List, Tuple, Union
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
 
 from fastapi import BackgroundTasks
 from fastapi.concurrency import run_in_threadpool
-from huggingface_hub import (
-    HfApi, 
-    ModelInfo
-)
+from huggingface_hub import ModelInfo
 
-from app.db.model import (
-    delete_model,
-    get_all_models,
-    get_download_status,
-    insert_pending_task,
-    insert_model,
-    update_downloading_task,
-    update_failed_task,
-    update_ready_task,
+from app.db.aio.database import run_in_db_executor
+from app.db.aio.model import delete_model, get_all_models, get_download_status
+from app.services.cache.cache_service import svc_load_session_messages
+from app.services.events.status_events import (
+    download_status_from_row,
+    publish_download_status,
+    stream_status_events,
+)
+from app.services.model.blob_store import deduplicate_downloaded_models, get_blob_store_usage, release_model_blobs
+from app.services.model.catalog_service import get_catalog_status, search_catalog, sync_model_catalog
+from app.services.model.compaction_service import schedule_compaction
+from app.services.model.download_scheduler import (
+    cancel_download,
+    enqueue_download,
+    get_download_queue_settings,
+    pause_download,
+    resume_download,
+    update_download_queue_settings,
+)
+from app.services.model.download_planner import DownloadPlan, plan_download
+from app.services.model.hub_api import huggingface_api
+from app.services.model.model_verifier import verify_downloaded_model
+from app.services.model.inventory_service import (
+    InsufficientMemoryError,
+    check_model_fit,
+    list_model_inventory,
+)
+from app.services.model.hub_cache import (
+    model_weights_size_cache,
+    search_pages_cache,
 )
 from app.services.model.helper import(
     _model_weights_size,
@@ -27,100 +46,277 @@ from app.services.model.helper import(
     _update_cache_and_database    
 ) 
 from app.utils.types.model_types import (
+    BlobStoreUsage,
+    CatalogSyncStatus,
     DownloadModelRequest,
+    DownloadPlanResponse,
+    DownloadQueueSettings,
+    HubCacheStats,
+    InferenceQueueStatus,
+    KvSnapshotStatus,
     LoadModelRequest,
     ModelData,
+    ModelFitCheck,
+    ModelInventory,
     ModelDownloadStatus,
     ModelLoadStatus,
+    ModelVerificationResult,
     RunInferenceRequest,
     SearchModelsRequest,
     SearchModelsResults,
+    ModelReplicas,
 )
+from app.services.model.inference_queue import inference_admission
 from app.services.model.model_worker import( 
+    cancel_local_inference,
+    check_inference_capacity,
+    get_kv_snapshot_status,
     get_load_statuses, 
+    get_models_unloaded_by,
+    get_replica_statuses,
+    is_model_ready,
+    plan_load_placements,
     run_local_inference, 
-    start_load_model                                       
+    start_load_model,
+    stream_local_completion,
+    stream_local_inference,
+    unload_model,
 )
-from app.utils.constants import HUGGING_FACE_MODELS_FOLDER
+from app.utils.constants import CANCEL, DONE, HUGGING_FACE_MODELS_FOLDER, QUEUED, RETRIEVE_CONTEXT, TOKEN
+
+# Max number of model info requests sent to the Hub at the same time
+HUB_INFO_CONCURRENCY = 8
+_hub_info_semaphore = asyncio.Semaphore(HUB_INFO_CONCURRENCY)
 
-# Initialize the Hugging Face API client
-# This will be used to interact with the Hugging Face Hub for model operations like downloading models and searching for models
-huggingface_api = HfApi()
+# Max time (seconds) to wait for a streamed turn to be committed before skipping the acknowledgement
+MESSAGE_COMMIT_TIMEOUT = 5
 
 async def svc_run_local_inference(request: RunInferenceRequest) -> Union[str, dict]:
+    # The retrieval index is built from the session's messages, load them from the database if they aren't cached
+    if request.context_mode == RETRIEVE_CONTEXT:
+        await svc_load_session_messages(request.session_id)
+        
     # Run local inference using the provided request data
     inference_output = await run_local_inference(request)
-    
-    # Once all inference operation + cache update is done, update DB
-    # We are doing this in a background task to avoid blocking request thread since client does not need to wait for this
-    asyncio.create_task(
-        run_in_threadpool(
-            _update_cache_and_database,
-            request,
-            inference_output
-        )   
-    )
+
+    # Errors come back as a dict, they're returned as is without being added to the chat history
+    if not isinstance(inference_output, str):
+        return inference_output
+
+    # Once all inference operation is done, update the cache and queue the messages for the DB
+    # This doesn't block, the message writer commits the messages in the background
+    _update_cache_and_database(request, inference_output)
+
+    # Summarize the oldest turns once the model is idle if the conversation is compacted + got long
+    schedule_compaction(request)
     
     # Return output from running inference AI model
     return inference_output
+
+async def svc_stream_local_inference(request: RunInferenceRequest, request_id: str) -> AsyncIterator[Tuple[str, str]]:
+    # Yields ("queued", position) while waiting for the model, ("token", text) while generating,
+    # then ("done" | "cancelled" | "error", response) and finally ("committed", "") once a finished turn is stored in the database
+    
+    # The retrieval index is built from the session's messages, load them from the database if they aren't cached
+    if request.context_mode == RETRIEVE_CONTEXT:
+        await svc_load_session_messages(request.session_id)
+        
+    async for tag, text in stream_local_inference(request, request_id):
+        if tag == QUEUED:
+            yield "queued", text
+            
+        elif tag == TOKEN:
+            yield "token", text
+            
+        elif tag == CANCEL:
+            # Cancelled turns are partial so they aren't kept in the chat history
+            yield "cancelled", text
+            
+        elif tag == DONE:
+            # Same persistence as a regular inference, the message writer commits it in the background
+            committed = _update_cache_and_database(request, text)
+            schedule_compaction(request)
+            yield "done", text
+            
+            if committed is not None and await run_in_threadpool(committed.wait, MESSAGE_COMMIT_TIMEOUT):
+                yield "committed", ""
+                
+        else:
+            yield "error", text
+
+def svc_cancel_local_inference(request_id: str) -> None:
+    # Stop a streaming generation, it finishes with the text generated so far
+    cancel_local_inference(request_id)
+    
+def svc_stream_local_completion(model_id: str, payload: Dict[str, Any], request_id: str, session_id: Optional[str],
+                                priority: str) -> AsyncIterator[Tuple[str, Any]]:
+    # Every prompt + choice of a completion request generated in one batched call on the model worker
+    return stream_local_completion(model_id, payload, request_id, session_id, priority)
+
+def svc_check_inference_capacity(model_id: str) -> None:
+    # Raises AdmissionRejected when the model's queue is full
+    check_inference_capacity(model_id)
+    
+def svc_get_inference_queues() -> List[InferenceQueueStatus]:
+    # Running + waiting requests for every model
+    return inference_admission.status()
+
+def svc_get_inference_position(request_id: str) -> Optional[int]:
+    # 0 while running, None once finished (or unknown)
+    return inference_admission.position(request_id)
+    
+def svc_is_model_ready(model_id: str) -> bool:
+    # Loaded in the model worker + ready for inference
+    return is_model_ready(model_id)
     
 async def svc_get_available_models(request: SearchModelsRequest) -> List[SearchModelsResults]:
-    # Fetch models and their metadata from the Hugging Face Hub
-    hugging_face_models, infos = await get_hf_models_and_infos(request)
+    # Answer from the local model catalog when it has been synced, works offline
+    catalog_models: Optional[List[SearchModelsResults]] = await search_catalog(request)
+    
+    if catalog_models:
+        return catalog_models
+    
+    try:
+        # Catalog is empty or has no match, search the Hugging Face Hub directly
+        return await svc_search_hub_models(request)
+    except Exception:
+        # If the catalog is synced but the Hub is unreachable, an empty result beats an error
+        if catalog_models is not None:
+            return []
+        raise
+    
+async def svc_search_hub_models(request: SearchModelsRequest) -> List[SearchModelsResults]:
+    # Fetch the page of models matching the search (cached)
+    hugging_face_models: List[dict] = await get_hf_models(request)
+    
+    # Fetch the weights size of every model with bounded concurrency (cached)
+    sizes: List[Union[int, Exception]] = await asyncio.gather(
+        *(get_hf_model_weights_size(model["id"]) for model in hugging_face_models),
+        return_exceptions=True
+    )
     
     # Declare a list to hold safe model data
     safe_models: List[SearchModelsResults] = []
     
-    # Iterate through the models and its metadata info
-    for model, info in zip(hugging_face_models, infos):
-        if isinstance(info, Exception):
+    # Iterate through the models and their weights size
+    for model, total_bytes in zip(hugging_face_models, sizes):
+        if isinstance(total_bytes, Exception):
+            print(f"[Model size error]: {model['id']}: {total_bytes}")
             continue  # Skip models that failed to fetch metadata
         
-        try:
-            # Get the sum of model weights files (.bin or .safetensors) from info metadata
-            total_bytes: int = _model_weights_size(info)
-        
-            # If no weight files found (.bin or .safetensors), skip the model
-            if total_bytes == 0:
-                continue
-            
-        except Exception as exception:
-            print(f"[Model size error]: {model.modelId}: {exception}")
+        # If no weight files found (.bin or .safetensors), skip the model
+        if total_bytes == 0:
             continue
         
         # Add specific model data to the safe_models list
         safe_models.append(
             SearchModelsResults(
-                id=model.modelId,
-                likes=model.likes,
-                downloads=model.downloads,
+                id=model["id"],
+                likes=model["likes"],
+                downloads=model["downloads"],
                 size=total_bytes / (1024 ** 3),  # Convert to GB
-                isQuantized=_is_quantizable(model),
-                isUncensored=_is_uncensored(model),
-                trending_score=model.trending_score,
+                isQuantized=model["is_quantized"],
+                isUncensored=model["is_uncensored"],
+                trending_score=model["trending_score"],
             )
         )
         
     # Return the safe models from querying the Hugging Face Hub
     return safe_models
 
-def svc_schedule_model_load(request: LoadModelRequest, background_task: BackgroundTasks) -> None:
+async def svc_get_catalog_status() -> CatalogSyncStatus:
+    # Get the sync status of the local model catalog
+    return await get_catalog_status()
+
+def svc_schedule_catalog_sync(background_task: BackgroundTasks) -> None:
+    # Schedule an incremental sync of the local model catalog in a background task
+    background_task.add_task(
+        sync_model_catalog
+    )
+
+def svc_get_hub_cache_stats() -> List[HubCacheStats]:
+    # Report hit rates of the search page + model metadata caches
+    return [search_pages_cache.stats(), model_weights_size_cache.stats()]
+
+async def svc_schedule_model_load(request: LoadModelRequest, background_task: BackgroundTasks) -> Optional[str]:
+    # Make sure the model is expected to fit in memory before spawning a worker to load it
+    # The memory of the models the load unloads first counts as available
+    fit_check: Optional[ModelFitCheck] = await check_model_fit(
+        request.model_id, request.precision, request.replicas, get_models_unloaded_by(request)
+    )
+    
+    if fit_check is not None and not fit_check.fits and not request.force:
+        raise InsufficientMemoryError(fit_check.warning)
+    
+    # Work out the CPU cores / NUMA nodes / thread counts of the workers, refused if they don't exist on this machine
+    placements = plan_load_placements(request)
+    
     # Schedule loading of target model in a background task
     background_task.add_task(
         start_load_model, 
-        request
+        request,
+        placements,
     )
     
-def svc_schedule_model_download(request: DownloadModelRequest, background_task: BackgroundTasks) -> None:
-    # Schedule downloading of target model in a background task
-    background_task.add_task(
-        download_model,
-        request
+    # Return the warning (if any) so the user knows the load may be slow / tight on memory
+    return fit_check.warning if fit_check else None
+
+async def svc_check_model_fit(request: LoadModelRequest) -> Optional[ModelFitCheck]:
+    # Compare the model's estimated memory at the requested precision with the free RAM / VRAM
+    return await check_model_fit(
+        request.model_id, request.precision, request.replicas, get_models_unloaded_by(request)
+    )
+
+async def svc_get_model_inventory() -> List[ModelInventory]:
+    # Get parameter count, dtype, context length + memory estimates of every downloaded model
+    return await list_model_inventory()
+    
+async def svc_schedule_model_download(request: DownloadModelRequest) -> None:
+    # Add the model to the persistent download queue, it starts once a download slot is free
+    await enqueue_download(request)
+    
+async def svc_get_download_plan(model_id: str) -> DownloadPlanResponse:
+    # Get the repo file list + sizes without downloading anything
+    async with _hub_info_semaphore:
+        info: ModelInfo = await run_in_threadpool(
+            lambda: huggingface_api.model_info(model_id, files_metadata=True)
+        )
+    
+    # Pick the minimal set of files the download would fetch
+    plan: DownloadPlan = plan_download(info.siblings)
+    
+    return DownloadPlanResponse(
+        model_id=model_id,
+        total_bytes=plan.total_bytes,
+        weights_bytes=plan.weights_bytes,
+        skipped_bytes=plan.skipped_bytes,
+        files=[f.rfilename for f in plan.files],
+        skipped_files=[f.rfilename for f in plan.skipped],
     )
 
-def svc_get_all_models() -> List[ModelData]:
+async def svc_pause_model_download(model_id: str) -> None:
+    # Stop the download but keep finished ranges so it can resume later
+    await pause_download(model_id)
+    
+async def svc_resume_model_download(model_id: str) -> None:
+    # Put a paused / failed download back in the queue
+    await resume_download(model_id)
+    
+async def svc_cancel_model_download(model_id: str) -> None:
+    # Stop the download and remove its files + task
+    await cancel_download(model_id)
+    
+def svc_get_download_queue_settings() -> DownloadQueueSettings:
+    # Get max concurrent downloads + bandwidth cap
+    return get_download_queue_settings()
+
+async def svc_update_download_queue_settings(settings: DownloadQueueSettings) -> DownloadQueueSettings:
+    # Change max concurrent downloads + bandwidth cap
+    return await update_download_queue_settings(settings)
+
+async def svc_get_all_models() -> List[ModelData]:
     # Get all models from the database
-    rows = get_all_models()
+    rows = await get_all_models()
     
     # Convert the rows into a list of ModelData objects and return
     return [
@@ -133,43 +329,77 @@ def svc_get_all_models() -> List[ModelData]:
         for model_id, model_name, is_quantized, is_uncensored in rows
     ]
     
-def svc_delete_model(model_id: str) -> None:
+async def svc_delete_model(model_id: str) -> None:
     # Delete model data from the database
-    delete_model(model_id)
+    await delete_model(model_id)
 
     # Locate the model directory location
     local_dir: Path = Path(HUGGING_FACE_MODELS_FOLDER) / model_id.replace("/", "_")
     
     # If the model directory exists, delete the entire directory
+    # Removing a large model directory is slow so keep it off the event loop
     if local_dir.exists():
-        shutil.rmtree(local_dir)
+        await run_in_threadpool(shutil.rmtree, local_dir)
+    
+    # Drop the model's references to shared blobs, blobs still used by other models are kept
+    await run_in_db_executor(release_model_blobs, model_id)
+    
+    # Let status subscribers know the model is gone
+    await run_in_db_executor(publish_download_status, model_id)
+    
+async def svc_verify_model(model_id: str) -> ModelVerificationResult:
+    # Check sizes, hashes + safetensors headers of the downloaded files against the Hub metadata
+    return await verify_downloaded_model(model_id)
+
+async def svc_get_storage_usage() -> BlobStoreUsage:
+    # Get disk usage of downloaded models + how much the shared blobs save
+    return await get_blob_store_usage()
+
+def svc_schedule_model_deduplication(background_task: BackgroundTasks) -> None:
+    # Hash every downloaded model + link identical files to shared blobs in a background task
+    background_task.add_task(deduplicate_downloaded_models)
         
-def svc_get_download_statuses() -> List[ModelDownloadStatus]:
+async def svc_get_download_statuses() -> List[ModelDownloadStatus]:
     # Get download status of all models from the database
-    rows = get_download_status()
+    rows = await get_download_status()
 
     # Convert the rows into a list of ModelDownloadStatus objects & return
-    return [
-        ModelDownloadStatus(
-            model_id=model_id,
-            status=download_status,
-            progress=progress,
-            local_path=local_path or None
-        )
-        for model_id, download_status, progress, local_path in rows
-    ]
+    return [download_status_from_row(row) for row in rows]
     
+def svc_stream_status_events() -> AsyncIterator[str]:
+    # Download + load status changes as server-sent events, starting with the current states
+    return stream_status_events()
+
 def svc_get_load_statuses() -> List[ModelLoadStatus]:
     # Get the load statuses of all models
     return get_load_statuses()
 
-async def get_hf_models_and_infos(
-   request: SearchModelsRequest
-) -> Tuple[List[ModelInfo], List[Union[ModelInfo, Exception]]]:
+def svc_get_worker_replicas() -> List[ModelReplicas]:
+    # Replicas of every resident model with their CPU cores, load + utilization
+    return get_replica_statuses()
+
+def svc_get_kv_snapshot_status() -> KvSnapshotStatus:
+    # Disk usage of the KV cache snapshots + their hit rate per model
+    return get_kv_snapshot_status()
+
+def svc_unload_model(model_id: str) -> bool:
+    # Stop a resident model's workers and free its memory
+    return unload_model(model_id)
+
+async def get_hf_models(request: SearchModelsRequest) -> List[dict]:
+    # Search arguments make up the cache key, filters are sorted so their order doesn't matter
+    cache_key = json.dumps(
+        [request.query, request.limit, request.sortBy, sorted(request.filters or [])]
+    )
+    
+    # Return the cached page if we've run this search recently
+    cached_page: Optional[List[dict]] = await search_pages_cache.get(cache_key)
+    if cached_page is not None:
+        return cached_page
     
     # Run blocking code in a separate thread pool to avoid blocking the event loop
     # Call the Hugging Face Hub API to list models and pass in search parameters
-    hugging_face_models = await run_in_threadpool(
+    hugging_face_models: List[ModelInfo] = await run_in_threadpool(
         lambda: list(huggingface_api.list_models(
         pipeline_tag="text-generation",
         library="transformers",
@@ -183,45 +413,40 @@ async def get_hf_models_and_infos(
         ))
     )
     
-     # For each model, schedule a blocking call to get model info on a thread pool
-    info_tasks = [
-        run_in_threadpool(
-            lambda model=model: huggingface_api.model_info(model.modelId, files_metadata=True)
-        )
-        
+    # Only keep the fields the search results need so the page can be cached as JSON
+    page: List[dict] = [
+        {
+            "id": model.modelId,
+            "likes": model.likes,
+            "downloads": model.downloads,
+            "trending_score": model.trending_score,
+            "is_quantized": _is_quantizable(model),
+            "is_uncensored": _is_uncensored(model),
+        }
         for model in hugging_face_models
     ]
     
-    # Gather results from all info tasks once they are done
-    infos = await asyncio.gather(*info_tasks, return_exceptions=True)
+    await search_pages_cache.set(cache_key, page)
     
-    # Return the list of models and a list of their metadata info
-    return hugging_face_models, infos
+    # Return the page of models
+    return page
 
-def download_model(request: DownloadModelRequest):
-    try:
-        # Insert/Mark pending download task into the database
-        insert_pending_task(request.model_id)
-
-        # Insert/Mark download task into the database
-        update_downloading_task(request.model_id)
-
-        # Download the model from Hugging Face Hub
-        # Hugging Face models are stored in the hugging_face_models folder in backend root directory
-        local_dir = huggingface_api.snapshot_download(
-            repo_id=request.model_id,
-            resume_download=True,
-            local_dir=str(Path(HUGGING_FACE_MODELS_FOLDER)/request.model_id.replace("/", "_")), 
+async def get_hf_model_weights_size(model_id: str) -> int:
+    # Return the cached size if we've looked this model up recently
+    cached_size: Optional[int] = await model_weights_size_cache.get(model_id)
+    if cached_size is not None:
+        return cached_size
+    
+    # Limit how many model info requests hit the Hub at once
+    async with _hub_info_semaphore:
+        # Get the model file metadata in the thread pool since it's a blocking call
+        info: ModelInfo = await run_in_threadpool(
+            lambda: huggingface_api.model_info(model_id, files_metadata=True)
         )
-        
-        # Once model is downloaded, update the task status to ready
-        update_ready_task(request.model_id, local_dir)
-        
-        # Once all tasks are complete, insert the model data into the database
-        insert_model(request)
-            
-    except Exception as e:
-        update_failed_task(request.model_id)
-
-        print(f"[Download error] {request.model_id}: {e}")
-        raise
\ No newline at end of file
+    
+    # Get the size of the weights a download would fetch (safetensors preferred over .bin) from info metadata
+    total_bytes: int = _model_weights_size(info)
+    
+    await model_weights_size_cache.set(model_id, total_bytes)
+    
+    return total_bytes
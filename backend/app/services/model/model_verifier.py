@@ -0,0 +1,182 @@
+import hashlib
+import json
+import os
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from huggingface_hub.hf_api import RepoSibling
+
+from app.db.blobs import get_model_file_hash
+from app.db.aio.model import get_verification_result
+from app.db.model import update_verification_result
+from app.services.events.status_events import publish_download_status
+from app.services.model.blob_store import blob_path
+from app.services.model.download_planner import plan_download
+from app.services.model.hub_api import huggingface_api
+from app.services.model.inventory_service import _read_safetensors_header
+from app.utils.types.model_types import FileVerificationError, ModelVerificationResult
+
+# Files checked at the same time, hashlib releases the GIL so hashing runs on several cores
+VERIFY_WORKERS = os.cpu_count() or 4
+
+# Size of each block read while hashing a file
+VERIFY_BLOCK_SIZE = 8 * 1024 * 1024
+
+# Download task statuses set by the verification
+READY = "ready"
+CORRUPT = "corrupt"
+
+# Bytes per element of each safetensors dtype
+_SAFETENSORS_DTYPE_SIZES: Dict[str, int] = {
+    "F64": 8, "F32": 4, "F16": 2, "BF16": 2, "F8_E4M3": 1, "F8_E5M2": 1,
+    "I64": 8, "I32": 4, "I16": 2, "I8": 1, "U64": 8, "U32": 4, "U16": 2, "U8": 1, "BOOL": 1,
+}
+
+def verify_model(model_id: str, local_dir: str, revision: Optional[str] = None,
+                 reuse_blob_hashes: bool = False) -> ModelVerificationResult:
+    started = time.perf_counter()
+    root = Path(local_dir)
+
+    # Expected sizes + hashes of the files the download planner picks, at the commit they were downloaded from
+    # Downloads made before the revision was stored are checked against the Hub's current revision
+    info = huggingface_api.model_info(model_id, revision=revision, files_metadata=True)
+    files: List[RepoSibling] = plan_download(info.siblings).files
+
+    # Check the largest files first so the workers finish around the same time
+    files.sort(key=lambda sibling: sibling.size or 0, reverse=True)
+
+    with ThreadPoolExecutor(max_workers=VERIFY_WORKERS, thread_name_prefix=f"verify-{model_id}") as executor:
+        results = list(executor.map(lambda sibling: _verify_file(root, sibling, reuse_blob_hashes), files))
+
+    errors = [error for error in results if error is not None]
+    verification_status = CORRUPT if errors else READY
+
+    # Store the result in the download task, corrupt models can't be loaded until they are downloaded again
+    update_verification_result(
+        model_id,
+        verification_status,
+        time.time(),
+        json.dumps([error.model_dump() for error in errors]) if errors else None,
+    )
+    publish_download_status(model_id)
+
+    return ModelVerificationResult(
+        model_id=model_id,
+        status=verification_status,
+        files_checked=len(files),
+        bytes_checked=sum(sibling.size or 0 for sibling in files),
+        elapsed_seconds=time.perf_counter() - started,
+        errors=errors,
+    )
+
+async def verify_downloaded_model(model_id: str) -> ModelVerificationResult:
+    row = await get_verification_result(model_id)
+    if row is None or row[1] is None:
+        raise ValueError(f"{model_id} has not been downloaded")
+
+    # Hashing every file is slow, keep it off the event loop
+    return await run_in_threadpool(verify_model, model_id, row[1], row[4])
+
+def remove_corrupt_files(model_id: str, local_dir: str, errors: Optional[str]) -> None:
+    # Remove files that failed the check so the next download fetches them again
+    for error in json.loads(errors or "[]"):
+        path = Path(local_dir) / error["path"]
+
+        # A corrupt file hardlinked to the blob store means the blob itself is bad, drop it too
+        sha256 = get_model_file_hash(model_id, error["path"])
+        if sha256:
+            blob = blob_path(sha256)
+            if blob.exists() and path.exists() and os.path.samefile(blob, path):
+                blob.unlink()
+
+        path.unlink(missing_ok=True)
+
+def _verify_file(root: Path, sibling: RepoSibling, reuse_blob_hashes: bool = False) -> Optional[FileVerificationError]:
+    path = root / sibling.rfilename
+    expected_sha256 = sibling.lfs.sha256 if sibling.lfs else None
+
+    def failed(message: str) -> FileVerificationError:
+        return FileVerificationError(path=sibling.rfilename, error=message)
+
+    if not path.is_file():
+        return failed("missing")
+
+    # Size is cheap to check and catches truncated downloads
+    size = path.stat().st_size
+    if sibling.size is not None and size != sibling.size:
+        return failed(f"size {size} bytes, expected {sibling.size}")
+
+    # Header sanity before hashing, a broken header is reported even when the Hub has no hash
+    if sibling.rfilename.endswith(".safetensors"):
+        header_error = _check_safetensors(path, size)
+        if header_error:
+            return failed(header_error)
+
+    # Files linked from the blob store were checked when their blob was stored, the blob is named after its SHA-256
+    if reuse_blob_hashes and expected_sha256 and _is_blob(path, expected_sha256):
+        return None
+
+    # LFS files (weights) are checked against their SHA-256, small files against their git blob id
+    if expected_sha256:
+        if _hash_file(path, hashlib.sha256()) != expected_sha256:
+            return failed("sha256 mismatch")
+    elif sibling.blob_id:
+        if _hash_file(path, hashlib.sha1(f"blob {size}\0".encode())) != sibling.blob_id:
+            return failed("git blob id mismatch")
+
+    return None
+
+def _is_blob(path: Path, sha256: str) -> bool:
+    blob = blob_path(sha256)
+
+    try:
+        return blob.exists() and os.path.samefile(blob, path)
+    except OSError:
+        return False
+
+def _check_safetensors(path: Path, size: int) -> Optional[str]:
+    try:
+        header = _read_safetensors_header(path)
+    except (OSError, ValueError, struct.error) as exception:
+        return f"invalid safetensors header: {exception}"
+
+    with open(path, "rb") as file:
+        header_size = int.from_bytes(file.read(8), "little")
+
+    data_size = size - 8 - header_size
+    end = 0
+
+    for name, tensor in header.items():
+        try:
+            start, stop = tensor["data_offsets"]
+            shape, dtype = tensor["shape"], tensor["dtype"]
+        except (KeyError, TypeError, ValueError):
+            return f"invalid safetensors header entry for tensor {name}"
+
+        # Every tensor's byte range must match its shape + dtype
+        elements = 1
+        for dimension in shape:
+            elements *= dimension
+
+        dtype_size = _SAFETENSORS_DTYPE_SIZES.get(dtype)
+        if dtype_size is not None and stop - start != elements * dtype_size:
+            return f"tensor {name} has {stop - start} bytes, expected {elements * dtype_size}"
+
+        end = max(end, stop)
+
+    # The tensors must account for the whole data section
+    if end != data_size:
+        return f"tensor data ends at {end} bytes but the file has {data_size}"
+
+    return None
+
+def _hash_file(path: Path, digest) -> str:
+    with open(path, "rb") as file:
+        while block := file.read(VERIFY_BLOCK_SIZE):
+            digest.update(block)
+
+    return digest.hexdigest()
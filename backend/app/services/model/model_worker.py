@@ -1,277 +1,460 @@
 import asyncio
+import multiprocessing
+import os
+import uuid
+from contextlib import aclosing
 from multiprocessing.connection import Connection
-from multiprocessing import Process, Pipe
-from typing import Dict, List, Optional, Tuple, Union
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple, Union
 
 from fastapi.concurrency import run_in_threadpool
 
-from app.utils.types.model_types import LoadModelRequest, ModelLoadStatus, RunInferenceRequest
-from app.db.model import get_model_directory_path
-
-from app.services.model.helper import (
-    _build_plain_prompt,
-    _cleanup_plain_text_response,
-    _get_device_config,
-    _prepare_pipeline_input,
-    _remove_think_tags,
+from app.utils.types.model_types import (
+    KvSnapshotModelStats,
+    KvSnapshotStatus,
+    LoadModelRequest,
+    ModelLoadStatus,
+    ModelReplicas,
+    RunInferenceRequest,
+)
+from app.db.aio.model import get_model_directory_path
+from app.services.events.status_events import publish_load_status
+from app.services.model.cpu_topology import WorkerPlacement, plan_worker_placements
+from app.services.model.helper import _prepare_pipeline_input
+from app.services.model.inference_queue import (
+    BATCH,
+    INTERACTIVE,
+    AdmissionRejected,
+    DeadlineExceeded,
+    InferenceTicket,
+    inference_admission,
 )
-from transformers import (
-    AutoConfig,
-    AutoTokenizer,
-    AutoModelForCausalLM,
-    TextGenerationPipeline
+from app.services.model.kv_snapshot_store import (
+    KV_SNAPSHOT_DISK_BUDGET,
+    KV_SNAPSHOT_FOLDER,
+    KvSnapshotStats,
+    kv_snapshot_usage,
 )
+from app.services.model.replica_router import ReplicaRouter, WorkerReplica
 from app.utils.constants import (
-    CONVERSATION,
+    CANCEL,
+    COMPLETION,
+    DONE,
+    ERROR,
     EXIT, 
-    GENERATE, 
+    GENERATE,
+    KV_SNAPSHOT,
     LOAD_MODEL_WARNING, 
     MAX_NEW_TOKENS, MODE, 
     PIPELINE_INPUT, 
     PROMPT, 
-    QA, 
+    QA,
+    QUEUED,
     READY, 
-    THINK
+    REQUEST_ID,
+    SESSION_ID,
+    STREAM,
+    TOKEN
 ) 
 
-_parent_conn: Optional[Connection] = None
-_current_model: Optional[str] = None
-_model_proc: Optional[Process] = None
+# Worker processes start from a fresh interpreter instead of a fork of the API process:
+# the API process never imports torch / initializes CUDA, and forking a process with running threads isn't safe
+_worker_context = multiprocessing.get_context("spawn")
+
+# Seconds a worker gets to exit after the exit command before it's terminated
+WORKER_EXIT_TIMEOUT = 10
+
 _load_statuses: Dict[str, str] = {}
 
+# Worker replicas of every resident (loaded) model
+_routers: Dict[str, ReplicaRouter] = {}
+
+# Load request (precision, replicas, ...) of every resident model
+_load_requests: Dict[str, LoadModelRequest] = {}
+
+# Running requests asked to stop, removed once the request finishes
+_cancelled_requests: Set[str] = set()
+
+# KV cache snapshot hits / misses reported by the workers, per model
+_kv_snapshot_stats: Dict[str, KvSnapshotStats] = {}
+
 async def run_local_inference(request: RunInferenceRequest) -> Union[str, dict]:
-    # If requested model is not loaded in memory or parent connection is None, return error
-    if request.model_id != _current_model or _parent_conn is None:
+    # If requested model is not loaded in memory, return error
+    if request.model_id not in _routers:
         return LOAD_MODEL_WARNING
         
     try:
-        # Prepare the pipeline input based on the request mode
-        pipeline_input = _prepare_pipeline_input(request, request.mode)
-        
         # Create the payload to send to the model worker process
-        payload = {
-            PIPELINE_INPUT: pipeline_input,
-            MAX_NEW_TOKENS: request.max_new_tokens,
-            MODE: request.mode,
-        }
-        
-        # Send the payload to the model worker process via the parent connection
-        _parent_conn.send((PROMPT, payload))
+        payload = _build_inference_payload(request)
+        request_id = request.request_id or uuid.uuid4().hex
+        response: Union[str, dict] = LOAD_MODEL_WARNING
         
-        # Wait for the model worker process to send back the output response
+        # Waits for its turn in the model's queue, then for the worker's response
+        events = _stream_worker_request(request.model_id, PROMPT, payload, request_id, request.session_id,
+                                        _request_priority(request), request.deadline_seconds)
+        async with aclosing(events):
+            async for tag, data in events:
+                if tag != QUEUED:
+                    response = data
+                    
         # Return the output response from the model worker process
-        return await run_in_threadpool(lambda: _parent_conn.recv())
+        return response
+    
+    except (AdmissionRejected, DeadlineExceeded):
+        # Over capacity / too late, the caller tells the client to retry later
+        raise
 
     except Exception as e:
         print(f"[Inference error] {request.model_id}: {e}")
         return {"model_id": request.model_id, "error":f"Failed to run inference: {e}"}
     
-
-def _handle_inference_requests(child_conn: Connection, gen_pipe: TextGenerationPipeline, 
-                              tokenizer, builtin_chat: bool) -> None:
-    # This function handles incoming inference requests from the parent connection
-    # It runs in a separate process and listens for inference requests
-    while True:
-        try:
-            # Wait for a message from the parent connection
-            msg = child_conn.recv()
-        except (EOFError, BrokenPipeError):
-            break
-
-        # If the message is None or an exit command, break the loop
-        if not msg or msg[0] == EXIT:
-            break
-            
-        # Get the tag and payload from the message
-        tag, payload = msg
+async def stream_local_inference(request: RunInferenceRequest, request_id: str) -> AsyncIterator[Tuple[str, Any]]:
+    # Yields (QUEUED, position) while waiting, (TOKEN, text) as the model generates,
+    # then (DONE | CANCEL | ERROR, full response)
+    payload = _build_inference_payload(request)
+    payload[STREAM] = True
+    
+    events = _stream_worker_request(request.model_id, PROMPT, payload, request_id, request.session_id,
+                                    _request_priority(request), request.deadline_seconds)
+    async with aclosing(events):
+        async for event in events:
+            yield event
         
-        # Make sure the tag is "PROMPT" to process inference requests
-        if tag != PROMPT:
-            continue
-
-        try:
-            # Process the inference request with the provided payload
-            response = _process_inference_request(payload, gen_pipe, tokenizer, builtin_chat)
+async def stream_local_completion(model_id: str, payload: Dict[str, Any], request_id: str, session_id: Optional[str] = None,
+                                  priority: str = BATCH) -> AsyncIterator[Tuple[str, Any]]:
+    # Batched completions, yields (QUEUED, position) while waiting, (TOKEN, (row, text)) when payload[STREAM] is set,
+    # then (DONE | CANCEL, {"prompt_tokens", "choices"}) or (ERROR, message)
+    async with aclosing(_stream_worker_request(model_id, COMPLETION, payload, request_id, session_id, priority)) as events:
+        async for event in events:
+            yield event
+    
+def cancel_local_inference(request_id: str) -> None:
+    # Still waiting in the queue, it leaves the queue without reaching the worker
+    if inference_admission.cancel(request_id):
+        return
+    
+    # Unknown / finished requests have nothing to stop
+    if inference_admission.position(request_id) != 0:
+        return
+    
+    _cancelled_requests.add(request_id)
+    
+    # Ask the worker replica running it to stop generating, it replies with the text generated so far
+    for router in _routers.values():
+        replica = router.find_streaming(request_id)
+        if replica is not None:
+            replica.connection.send((CANCEL, request_id))
+        
+async def summarize_conversation(model_id: str, session_id: str, messages: List[dict], max_new_tokens: int) -> str:
+    # One-off instruction prompt (no chat history, no KV cache snapshot), queued as batch work behind chat turns
+    payload = {
+        PIPELINE_INPUT: messages,
+        MAX_NEW_TOKENS: max_new_tokens,
+        MODE: QA,
+    }
+    
+    events = _stream_worker_request(model_id, PROMPT, payload, f"compaction:{uuid.uuid4().hex}", session_id, BATCH)
+    async with aclosing(events):
+        async for tag, data in events:
+            if tag == DONE:
+                return data
             
-            # Send inference response back to main process
-            child_conn.send(response)
-        except Exception as e:
-            child_conn.send(f"Error: {str(e)}")       
-
+            if tag != QUEUED:
+                raise RuntimeError(data or "Summarization was cancelled")
             
-def _process_inference_request(payload: dict, gen_pipe: TextGenerationPipeline, 
-                              tokenizer, builtin_chat: bool) -> str:
-    # Process inference inputs from the payload
-    inputs = payload[PIPELINE_INPUT]
-    max_new_tokens = payload[MAX_NEW_TOKENS]
-    mode = payload.get(MODE, CONVERSATION)
-
-    # Check for thinking template
-    template = tokenizer.chat_template if builtin_chat else None
-    disable_thinking = bool(template and THINK in template)
+    raise RuntimeError(LOAD_MODEL_WARNING)
+    
+def is_model_ready(model_id: str) -> bool:
+    # Loaded + accepting inference requests
+    return model_id in _routers and _load_statuses.get(model_id) == "ready"
 
-    # Route based on model capabilities and mode
-    if builtin_chat and mode in (CONVERSATION, QA):
-        # Handle chat models with built-in chat template
-        if disable_thinking:
-            # If chat template has thinking text, generate prompt text with thinking disabled
-            prompt_text = tokenizer.apply_chat_template(
-                inputs, tokenize=False, enable_thinking=False
-            )
-            
-            # Generate response using the chat template without thinking text
-            response = gen_pipe(
-                prompt_text,
-                max_new_tokens=max_new_tokens,
-                do_sample=False,
-                continue_final_message=False,
-            )
-        else:
-            # Pass in inputs directly to the pipeline to generate response
-            response = gen_pipe(
-                inputs,
-                max_new_tokens=max_new_tokens,
-                do_sample=False,
-                continue_final_message=False,
-            )
-    else:
-        # Handle non-chat models or generate mode
-        # If input is a list, build a long prompt string or return as is
-        prompt_str = _build_plain_prompt(inputs) if isinstance(inputs, list) else inputs
-        
-        # If the mode is "generate", use sampling to add a level of randomness
-        # Text-Generation feature should be unaffected by not having a chat template
-        if mode == GENERATE:
-            response = gen_pipe(
-                prompt_str,
-                max_new_tokens=max_new_tokens,
-                do_sample=True,
-                continue_final_message=True,
-            )
+def check_inference_capacity(model_id: str) -> None:
+    # Raises AdmissionRejected when the model's queue is full, lets streaming APIs reject before the response starts
+    inference_admission.check_capacity(model_id)
+    
+async def _stream_worker_request(model_id: str, tag: str, payload: Dict[str, Any], request_id: str,
+                                 session_id: Optional[str] = None, priority: str = INTERACTIVE,
+                                 deadline_seconds: Optional[float] = None) -> AsyncIterator[Tuple[str, Any]]:
+    if model_id not in _routers:
+        yield ERROR, LOAD_MODEL_WARNING
+        return
+    
+    payload[REQUEST_ID] = request_id
+    
+    # Take a place in the model's fair queue, raises AdmissionRejected straight away when it's full
+    ticket: InferenceTicket = inference_admission.admit(
+        model_id, payload[MAX_NEW_TOKENS], request_id, session_id, priority, deadline_seconds,
+    )
+    
+    # Report the queue position while waiting, raises DeadlineExceeded if the deadline passes first
+    async with aclosing(ticket.wait_for_turn()) as positions:
+        async for position in positions:
+            yield QUEUED, position
             
-        # For Q&A or conversation mode with no built-in chat template use plain / non random generation (do_sample=False)
-        # This is a very ticky tacky as these models don't have a built-in chat template. Some may respond better to the prompt_str
-        else:
-            response = gen_pipe(
-                prompt_str,
-                max_new_tokens=max_new_tokens,
-                do_sample=False,
-                continue_final_message=False,
-            )
-
-    # Extract and clean response
-    final_response = response[0]["generated_text"].strip()
-    
-    # If no built-in chat template is used, clean up the plain text response
-    if not builtin_chat:
-        final_response = _cleanup_plain_text_response(final_response, mode)
-      
-    # Remove any potential <think> tags  
-    final_response = _remove_think_tags(final_response).strip()
-
-    # Return the final cleaned up model response
-    return final_response
-
-def _model_worker(local_dir: str, model_id: str, precision: str, child_conn):
+    # Cancelled while waiting, answered right away instead of after the replica's current generation
+    if ticket.cancelled or request_id in _cancelled_requests:
+        ticket.release()
+        _cancelled_requests.discard(request_id)
+        yield CANCEL, ""
+        return
+    
+    # Lower when other sessions were waiting as the request started
+    payload[MAX_NEW_TOKENS] = ticket.max_new_tokens
+    
+    # The model was unloaded while the request was waiting
+    router = _routers.get(model_id)
+    if router is None:
+        ticket.release()
+        _cancelled_requests.discard(request_id)
+        yield ERROR, LOAD_MODEL_WARNING
+        return
+    
+    # The session's replica if it's free, otherwise the least loaded one
+    replica = router.route(ticket.session_id)
+    
+    # Held until the worker sent its final message, not just until this generator stops
+    try:
+        await replica.lock.acquire()
+    except BaseException:
+        replica.in_flight -= 1
+        ticket.release()
+        _cancelled_requests.discard(request_id)
+        raise
+    
+    connection = replica.connection
+    pending_recv: Optional[asyncio.Future] = None
+    finished = False
+    
     try:
-        # Get model configuration based on the model ID
-        config = AutoConfig.from_pretrained(model_id)
+        # Cancelled while waiting for the replica to finish another request
+        if request_id in _cancelled_requests:
+            finished = True
+            yield CANCEL, ""
+            return
         
-        # Load the model
-        model = AutoModelForCausalLM.from_pretrained(
-            local_dir,
-            config=config,
-            **_get_device_config(precision)
-        )
-
-        # Load the tokenizer
-        tokenizer = AutoTokenizer.from_pretrained(
-            local_dir,
-            use_fast=True,
-        )
+        # The model was unloaded / reloaded while the request was waiting for the replica
+        if router is not _routers.get(model_id):
+            finished = True
+            yield ERROR, LOAD_MODEL_WARNING
+            return
         
-        # Check if the tokenizer has a built-in chat template
-        # This is used to determine if the model is a chat model with a built-in template
-        builtin_chat = getattr(tokenizer, "chat_template", None) is not None
-
-        # Create the Hugging Face Text-Generation Pipeline
-        gen_pipe = TextGenerationPipeline(
-            model=model,
-            tokenizer=tokenizer,
-            return_full_text=False,
-        )
-
-        # Send a message to the parent connection indicating the model is ready
-        child_conn.send((READY,))
+        replica.begin(request_id)
+        connection.send((tag, payload))
         
-        # Handle incoming inference requests in a service loop
-        _handle_inference_requests(child_conn, gen_pipe, tokenizer, builtin_chat)
-    
-    except Exception as exception:
-        try:
-            child_conn.send(("ERROR", str(exception)))
+        # Forward tokens as the worker sends them, a slow consumer makes the worker wait on the pipe
+        while True:
+            # Shielded so a cancelled consumer doesn't lose a message the read thread already took off the pipe
+            pending_recv = asyncio.ensure_future(run_in_threadpool(connection.recv))
+            message_tag, data = await asyncio.shield(pending_recv)
+            pending_recv = None
             
-        except:
-            pass  # If sending fails, we take the L
+            if message_tag == TOKEN:
+                yield TOKEN, data
+                continue
+            
+            # Sent before the final message when the turn was looked up in the KV cache snapshots
+            if message_tag == KV_SNAPSHOT:
+                _kv_snapshot_stats.setdefault(model_id, KvSnapshotStats()).record(data)
+                continue
+            
+            finished = True
+            yield (CANCEL if message_tag == DONE and request_id in _cancelled_requests else message_tag), data
+            break
+        
+    except (EOFError, OSError) as exception:
+        # Worker exited (ex: another model was loaded) mid-generation
+        finished = True
+        yield ERROR, f"Failed to run inference: {exception}"
         
     finally:
-        # Cleanup connection and close the model
-        child_conn.close()
+        if finished:
+            _finish_worker_request(replica, request_id, ticket)
+        else:
+            # Consumer went away mid-generation (ex: HTTP client disconnected), stop the worker and
+            # read the rest of its reply in the background so the pipe is in sync for the next request
+            asyncio.get_running_loop().create_task(_drain_worker_request(replica, request_id, ticket, pending_recv))
+            
+async def _drain_worker_request(replica: WorkerReplica, request_id: str, ticket: InferenceTicket,
+                                pending_recv: Optional[asyncio.Future]) -> None:
+    try:
+        cancel_local_inference(request_id)
+        
+        while True:
+            message_tag, _ = await (pending_recv or run_in_threadpool(replica.connection.recv))
+            pending_recv = None
+            
+            if message_tag not in (TOKEN, KV_SNAPSHOT):
+                break
+            
+    except (EOFError, OSError):
+        pass
+    
+    finally:
+        _finish_worker_request(replica, request_id, ticket)
+        
+def _finish_worker_request(replica: WorkerReplica, request_id: str, ticket: InferenceTicket) -> None:
+    replica.finish()
+    _cancelled_requests.discard(request_id)
+    replica.lock.release()
+    
+    # Let the next queued request go
+    ticket.release()
     
-async def start_load_model(request: LoadModelRequest) -> None:
-     # Makes sure we reference the global variables defined at top of this file 
-    global _parent_conn, _current_model, _model_proc, _load_statuses
+def _build_inference_payload(request: RunInferenceRequest) -> Dict[str, Any]:
+    # Prepare the pipeline input based on the request mode
+    pipeline_input = _prepare_pipeline_input(request, request.mode)
     
-    # Cleanup any old model that may be loaded in memory
-    _cleanup_old_model()
+    return {
+        PIPELINE_INPUT: pipeline_input,
+        MAX_NEW_TOKENS: request.max_new_tokens,
+        MODE: request.mode,
+        # The worker restores the session's KV cache snapshot from its previous turn
+        SESSION_ID: request.session_id,
+    }
+    
+def _request_priority(request: RunInferenceRequest) -> str:
+    # Chat turns are interactive, generate mode is long-form batch work
+    return BATCH if request.mode == GENERATE else INTERACTIVE
+    
+def _model_worker(local_dir: str, model_id: str, precision: str, child_conn: Connection,
+                  placement: WorkerPlacement = WorkerPlacement(), kv_snapshots: bool = True) -> None:
+    # Runs in the worker process, OpenMP / MKL read their thread counts once, before torch is imported
+    if placement.intra_op_threads is not None:
+        for variable in ("OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+            os.environ[variable] = str(placement.intra_op_threads)
+    
+    # torch + transformers are only ever imported in the worker process
+    from app.services.model.worker_process import run_model_worker
+    
+    run_model_worker(local_dir, model_id, precision, child_conn, placement, kv_snapshots)
+    
+async def start_load_model(request: LoadModelRequest, placements: Optional[List[WorkerPlacement]] = None) -> None:
+    # Reloading a model replaces its workers
+    if request.model_id in _routers:
+        await run_in_threadpool(_unload_model, request.model_id)
+        
+    # Unload the other models in memory unless they should stay resident
+    if not request.keep_loaded:
+        for model_id in list(_routers):
+            await run_in_threadpool(unload_model, model_id)
 
     # Mark loading model in status dictionary
-    _load_statuses[request.model_id] = "loading"
+    _set_load_status(request.model_id, "loading")
 
     # Lookup location of the model from database using model_id
-    row: Tuple[str] | None = get_model_directory_path(request.model_id)
+    row: Tuple[str] | None = await get_model_directory_path(request.model_id)
    
     if row is None or row[0] is None:
-        _load_statuses[request.model_id] = "error"
+        _set_load_status(request.model_id, "error")
         return
     
     # Get local directory from row
     local_dir: str = row[0]
-
-    # Using pipe, create a connection pipe for the model worker process
-    parent_conn, child_conn = Pipe()
-    
-    # Create a new process to load model into memory (needs full resources)
-    p = Process(
-        target=_model_worker,
-        args=(local_dir, request.model_id, request.precision, child_conn),
-        daemon=True,
-    )
     
-    # Start the model worker process
-    p.start()
+    replicas: List[WorkerReplica] = []
+    
+    # One worker process per replica, each pinned to its own CPU cores / NUMA node (a single replica uses them all)
+    for index, placement in enumerate(placements or plan_load_placements(request)):
+        # Using pipe, create a connection pipe for the model worker process
+        parent_conn, child_conn = _worker_context.Pipe()
+        
+        # Create a new process to load model into memory (needs full resources)
+        p = _worker_context.Process(
+            target=_model_worker,
+            args=(local_dir, request.model_id, request.precision, child_conn, placement, request.kv_snapshots),
+            daemon=True,
+        )
+        
+        # Start the model worker process
+        p.start()
+        replicas.append(WorkerReplica(index, parent_conn, p, placement))
 
-    # Save references to parent connection and current model so inference calls can use them
-    _parent_conn   = parent_conn
-    _current_model = request.model_id
-    _model_proc    = p
+    # Save references to the model's replicas so inference calls can use them
+    _routers[request.model_id] = ReplicaRouter(replicas)
+    _load_requests[request.model_id] = request
+    
+    # As many requests run at the same time as there are replicas
+    inference_admission.set_slots(request.model_id, len(replicas))
     
-    async def wait_for_model_ready(model_id: str, connection: Connection) -> None:
+    async def wait_for_replica_ready(replica: WorkerReplica) -> bool:
         try:
             # Wait for a message to the parent connection from the model worker process
-            msg = await run_in_threadpool(lambda: connection.recv())
-            
-            # If the message is "READY", update the load status or set to "error"
-            _load_statuses[model_id] = "ready" if msg == (READY,) else "error"
+            msg = await run_in_threadpool(lambda: replica.connection.recv())
+            replica.ready = msg == (READY,)
         except Exception:
-            _load_statuses[model_id] = "error"
+            replica.ready = False
+            
+        return replica.ready
+    
+    async def wait_for_model_ready(model_id: str) -> None:
+        # The model is ready once every replica loaded it, "error" if any of them failed
+        ready = await asyncio.gather(*(wait_for_replica_ready(replica) for replica in replicas))
+        _set_load_status(model_id, "ready" if all(ready) else "error")
     
     # Schedule an async task to wait for model to be ready
     # This will update the load status once the model is ready or if an error occurs
     asyncio.create_task(
-        wait_for_model_ready(request.model_id, parent_conn)
+        wait_for_model_ready(request.model_id)
     )
     
+def get_models_unloaded_by(request: LoadModelRequest) -> List[LoadModelRequest]:
+    # Resident models start_load_model stops before loading the requested one (itself when it's reloaded)
+    return [
+        loaded for model_id, loaded in _load_requests.items()
+        if model_id in _routers and (model_id == request.model_id or not request.keep_loaded)
+    ]
+    
+def plan_load_placements(request: LoadModelRequest) -> List[WorkerPlacement]:
+    # Raises InvalidWorkerPlacement when the requested cores / nodes don't exist on this machine
+    return plan_worker_placements(
+        request.replicas,
+        cpu_cores=request.cpu_cores,
+        numa_nodes=request.numa_nodes,
+        threads_per_replica=request.threads_per_replica,
+        intra_op_threads=request.intra_op_threads,
+        inter_op_threads=request.inter_op_threads,
+    )
+    
+def get_replica_statuses() -> List[ModelReplicas]:
+    # Per-replica load + utilization of every resident model
+    return [ModelReplicas(model_id=model_id, replicas=router.status()) for model_id, router in _routers.items()]
+
+def get_kv_snapshot_status() -> KvSnapshotStatus:
+    # Disk usage of the snapshots (every model) + how often conversation turns could start from one
+    files, used_bytes = kv_snapshot_usage()
+    
+    return KvSnapshotStatus(
+        folder=str(KV_SNAPSHOT_FOLDER),
+        snapshots=files,
+        used_bytes=used_bytes,
+        disk_budget_bytes=KV_SNAPSHOT_DISK_BUDGET,
+        models=[
+            KvSnapshotModelStats(
+                model_id=model_id,
+                lookups=stats.lookups,
+                hits=stats.hits,
+                hit_rate=stats.hits / stats.lookups if stats.lookups else 0.0,
+                prompt_tokens=stats.prompt_tokens,
+                reused_tokens=stats.reused_tokens,
+                reused_token_rate=stats.reused_tokens / stats.prompt_tokens if stats.prompt_tokens else 0.0,
+                average_restore_seconds=stats.restore_seconds / stats.hits if stats.hits else 0.0,
+                saved=stats.saved,
+            )
+            for model_id, stats in _kv_snapshot_stats.items()
+        ],
+    )
+
+def get_resident_models() -> List[str]:
+    return list(_routers)
+
+def unload_model(model_id: str) -> bool:
+    # Stop the model's workers, returns False if it isn't loaded
+    if model_id not in _routers:
+        return False
+    
+    _unload_model(model_id)
+    _set_load_status(model_id, "unloaded")
+    return True
+    
 def get_load_statuses() -> List[ModelLoadStatus]:
     # Return a list of the current load statuses for models
     return [
@@ -280,24 +463,44 @@ def get_load_statuses() -> List[ModelLoadStatus]:
         for model_id, model_status in _load_statuses.items()
     ]
     
-def _cleanup_old_model() -> None:
-    global _parent_conn, _current_model, _model_proc
+def _set_load_status(model_id: str, load_status: str) -> None:
+    # Track the status for /models/load/status + push the change to event subscribers
+    _load_statuses[model_id] = load_status
+    publish_load_status(model_id, load_status)
+    
+def _unload_model(model_id: str) -> None:
+    # Blocks until the workers exit, run it off the event loop
+    # Remove the model first so inference fails until it's loaded again
+    router = _routers.pop(model_id)
+    _load_requests.pop(model_id, None)
+
+    for replica in router.replicas:
+        _stop_replica(model_id, replica)
 
-    # If there is a existing model process running, try to send an exit command
-    if _model_proc is not None and _model_proc.is_alive():
+def _stop_replica(model_id: str, replica: WorkerReplica) -> None:
+    # If the model process is running, try to send it an exit command
+    if replica.process is not None and replica.process.is_alive():
         try:
             # Send an exit command to the child / model worker process
-            if _parent_conn is not None:
-                _parent_conn.send((EXIT, None))
+            replica.connection.send((EXIT, None))
 
         except Exception:
             pass
-        
-        # Wait for the model worker process to finish
-        _model_proc.join()
 
-    # Clear out old references so inference fails until a new model is loaded
-    _parent_conn = None
-    _current_model = None
-    _model_proc = None
+    # Close our end of the pipe: a worker blocked sending into it (nobody reading) fails instead of hanging
+    # The exit command stays readable on the worker's end
+    try:
+        replica.connection.close()
+    except Exception:
+        pass
+
+    if replica.process is None:
+        return
+
+    # Wait for the model worker process to finish, stop it if it doesn't exit in time
+    replica.process.join(WORKER_EXIT_TIMEOUT)
 
+    if replica.process.is_alive():
+        print(f"[Model unload error]: {model_id} worker {replica.index} didn't exit in {WORKER_EXIT_TIMEOUT}s, terminating it")
+        replica.process.terminate()
+        replica.process.join(WORKER_EXIT_TIMEOUT)
@@ -0,0 +1,116 @@
+import asyncio
+import time
+from collections import OrderedDict
+from multiprocessing.connection import Connection
+from multiprocessing.process import BaseProcess
+from typing import List, Optional
+
+from app.services.model.cpu_topology import WorkerPlacement
+from app.services.model.inference_queue import ANONYMOUS_SESSION
+from app.utils.types.model_types import WorkerReplicaStatus
+
+# Sessions remembered per model for affinity, the least recently routed are forgotten first
+MAX_AFFINITY_SESSIONS = 1024
+
+class WorkerReplica:
+    """
+    One model worker process + the pipe to it. A replica handles one request at a time,
+    the lock keeps requests from interleaving on its pipe.
+    """
+
+    def __init__(self, index: int, connection: Connection, process: Optional[BaseProcess],
+                 placement: WorkerPlacement = WorkerPlacement()):
+        self.index = index
+        self.connection = connection
+        self.process = process
+        self.placement = placement
+        self.lock = asyncio.Lock()
+        self.ready = False
+
+        # Request streaming from the worker right now
+        self.streaming_request_id: Optional[str] = None
+
+        # Requests routed here that haven't finished (running + waiting for the lock)
+        self.in_flight = 0
+
+        # Utilization counters
+        self.requests = 0
+        self.busy_seconds = 0.0
+        self.created_at = time.monotonic()
+        self._busy_since: Optional[float] = None
+
+    def begin(self, request_id: str) -> None:
+        self.streaming_request_id = request_id
+        self._busy_since = time.monotonic()
+
+    def finish(self) -> None:
+        if self._busy_since is not None:
+            self.busy_seconds += time.monotonic() - self._busy_since
+            self.requests += 1
+
+        self._busy_since = None
+        self.streaming_request_id = None
+        self.in_flight -= 1
+
+    def utilization(self) -> float:
+        # Share of the replica's lifetime spent generating
+        busy = self.busy_seconds + (time.monotonic() - self._busy_since if self._busy_since is not None else 0.0)
+        return busy / max(time.monotonic() - self.created_at, 1e-9)
+
+class ReplicaRouter:
+    """
+    Routes requests to the replicas of the loaded model. A session sticks to the replica that served it last
+    (the one with its warm KV cache) and moves to the least loaded replica when that one is busy and another isn't.
+    """
+
+    def __init__(self, replicas: List[WorkerReplica]):
+        self.replicas = replicas
+        self._affinity: "OrderedDict[str, int]" = OrderedDict()
+
+    def route(self, session_id: str) -> WorkerReplica:
+        least_loaded = min(self.replicas, key=lambda replica: (replica.in_flight, replica.requests))
+
+        # Requests without a session have nothing warm anywhere
+        if session_id == ANONYMOUS_SESSION:
+            replica = least_loaded
+        else:
+            bound = self._affinity.pop(session_id, None)
+            replica = self.replicas[bound] if bound is not None else least_loaded
+
+            # Give up the warm cache only when it would mean waiting behind other requests
+            if replica.in_flight > least_loaded.in_flight:
+                replica = least_loaded
+
+            # Most recently routed session last, the oldest is forgotten once too many are remembered
+            self._affinity[session_id] = replica.index
+            if len(self._affinity) > MAX_AFFINITY_SESSIONS:
+                self._affinity.popitem(last=False)
+
+        replica.in_flight += 1
+        return replica
+
+    def find_streaming(self, request_id: str) -> Optional[WorkerReplica]:
+        return next((replica for replica in self.replicas if replica.streaming_request_id == request_id), None)
+
+    def status(self) -> List[WorkerReplicaStatus]:
+        sessions = list(self._affinity.values())
+
+        return [
+            WorkerReplicaStatus(
+                index=replica.index,
+                pid=replica.process.pid if replica.process is not None else None,
+                cpu_cores=replica.placement.cpu_cores,
+                numa_node=replica.placement.numa_node,
+                intra_op_threads=replica.placement.intra_op_threads,
+                inter_op_threads=replica.placement.inter_op_threads,
+                ready=replica.ready,
+                busy=replica.streaming_request_id is not None,
+                active_request=replica.streaming_request_id,
+                in_flight=replica.in_flight,
+                requests=replica.requests,
+                busy_seconds=replica.busy_seconds,
+                utilization=replica.utilization(),
+                sessions=sessions.count(replica.index),
+            )
+            for replica in self.replicas
+        ]
@@ -0,0 +1,465 @@
+"""
+Code that runs inside the model worker process. torch + transformers are imported here
+(and in batch_generation) only, so the API process never loads them.
+"""
+import os
+import time
+from functools import partial
+from multiprocessing.connection import Connection
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import torch
+from safetensors import safe_open
+from safetensors.torch import save_file
+from transformers import (
+    AutoConfig,
+    AutoTokenizer,
+    AutoModelForCausalLM,
+    BitsAndBytesConfig,
+    DynamicCache,
+    StoppingCriteria,
+    StoppingCriteriaList,
+    TextGenerationPipeline,
+    TextStreamer
+)
+
+from app.services.model.batch_generation import generate_completions
+from app.services.model.cpu_topology import WorkerPlacement
+from app.services.model.helper import (
+    _build_plain_prompt,
+    _cleanup_plain_text_response,
+    _device_support,
+    _remove_think_tags,
+)
+from app.services.model.kv_snapshot_store import KV_SNAPSHOT_MIN_TOKENS, KvSnapshotStore
+from app.utils.constants import (
+    CANCEL,
+    COMPLETION,
+    CONVERSATION,
+    DONE,
+    ERROR,
+    EXIT, 
+    GENERATE, 
+    KV_SNAPSHOT,
+    MAX_NEW_TOKENS, MODE, 
+    PIPELINE_INPUT, 
+    PROMPT, 
+    QA, 
+    READY, 
+    REQUEST_ID,
+    SESSION_ID,
+    STREAM,
+    THINK,
+    TOKEN
+) 
+
+class _PipeStreamer(TextStreamer):
+    """
+    Sends generated text to the API process as soon as it is decoded.
+    """
+    
+    def __init__(self, tokenizer, connection: Connection):
+        super().__init__(tokenizer, skip_prompt=True, skip_special_tokens=True)
+        self.connection = connection
+        
+    def on_finalized_text(self, text: str, stream_end: bool = False) -> None:
+        if text:
+            self.connection.send((TOKEN, text))
+            
+class _CancelCriteria(StoppingCriteria):
+    """
+    Stops generation once the API process sends a cancel (or exit) message for the running request.
+    """
+    
+    def __init__(self, connection: Connection, request_id: str):
+        self.connection = connection
+        self.request_id = request_id
+        self.cancelled = False
+        self.exit_requested = False
+        
+    def __call__(self, input_ids, scores, **kwargs):
+        # Only cancel / exit messages can arrive while a request is running
+        # A cancel for an earlier request that arrived late is ignored
+        while not self.cancelled and self.connection.poll():
+            tag, target = self.connection.recv()
+            self.exit_requested = tag == EXIT
+            self.cancelled = self.exit_requested or (tag == CANCEL and target == self.request_id)
+            
+        return torch.full((input_ids.shape[0],), self.cancelled, dtype=torch.bool, device=input_ids.device)
+    
+
+def _handle_inference_requests(child_conn: Connection, gen_pipe: TextGenerationPipeline, 
+                              tokenizer, builtin_chat: bool, snapshots: Optional[KvSnapshotStore] = None) -> None:
+    # This function handles incoming inference requests from the parent connection
+    # It runs in a separate process and listens for inference requests
+    while True:
+        try:
+            # Wait for a message from the parent connection
+            msg = child_conn.recv()
+        except (EOFError, BrokenPipeError):
+            break
+
+        # If the message is None or an exit command, break the loop
+        if not msg or msg[0] == EXIT:
+            break
+            
+        # Get the tag and payload from the message
+        tag, payload = msg
+        
+        # Batched completions (OpenAI-compatible API), always cancellable
+        if tag == COMPLETION:
+            if _handle_completion_request(child_conn, payload, gen_pipe, tokenizer, builtin_chat):
+                break
+            continue
+        
+        # Make sure the tag is "PROMPT" to process inference requests
+        if tag != PROMPT:
+            continue
+        
+        # Streamed requests send tokens as they're generated + can be cancelled
+        if payload.get(STREAM):
+            if _handle_streaming_request(child_conn, payload, gen_pipe, tokenizer, builtin_chat, snapshots):
+                break
+            continue
+
+        try:
+            # Process the inference request with the provided payload
+            response = _process_inference_request(payload, gen_pipe, tokenizer, builtin_chat, child_conn, snapshots)
+            
+            # Send inference response back to main process
+            child_conn.send((DONE, response))
+        except Exception as e:
+            child_conn.send((ERROR, f"Error: {str(e)}"))       
+
+def _handle_streaming_request(child_conn: Connection, payload: dict, gen_pipe: TextGenerationPipeline,
+                              tokenizer, builtin_chat: bool, snapshots: Optional[KvSnapshotStore] = None) -> bool:
+    cancel_criteria = _CancelCriteria(child_conn, payload[REQUEST_ID])
+    
+    try:
+        # Same generation as a regular request, tokens are pushed to the pipe by the streamer
+        response = _process_inference_request(
+            payload, gen_pipe, tokenizer, builtin_chat, child_conn, snapshots,
+            streamer=_PipeStreamer(tokenizer, child_conn),
+            stopping_criteria=StoppingCriteriaList([cancel_criteria]),
+        )
+        child_conn.send((DONE, response))
+        
+    except Exception as e:
+        child_conn.send((ERROR, f"Error: {str(e)}"))
+        
+    # Tell the caller whether the API process asked the worker to exit mid-generation
+    return cancel_criteria.exit_requested
+
+
+def _handle_completion_request(child_conn: Connection, payload: dict, gen_pipe: TextGenerationPipeline,
+                               tokenizer, builtin_chat: bool) -> bool:
+    cancel_criteria = _CancelCriteria(child_conn, payload[REQUEST_ID])
+    
+    try:
+        # Every prompt + choice of the request in one generate call, text is streamed only when asked for
+        result = generate_completions(
+            payload, gen_pipe.model, tokenizer, builtin_chat,
+            connection=child_conn if payload.get(STREAM) else None,
+            stopping_criteria=[cancel_criteria],
+        )
+        child_conn.send((DONE, result))
+        
+    except Exception as e:
+        child_conn.send((ERROR, f"Error: {str(e)}"))
+        
+    # Tell the caller whether the API process asked the worker to exit mid-generation
+    return cancel_criteria.exit_requested
+            
+def _process_inference_request(payload: dict, gen_pipe: TextGenerationPipeline, 
+                              tokenizer, builtin_chat: bool, child_conn: Optional[Connection] = None,
+                              snapshots: Optional[KvSnapshotStore] = None, **generate_kwargs) -> str:
+    # Process inference inputs from the payload
+    inputs = payload[PIPELINE_INPUT]
+    max_new_tokens = payload[MAX_NEW_TOKENS]
+    mode = payload.get(MODE, CONVERSATION)
+    
+    # Conversation turns start from the KV cache of the session's previous turn when it's on disk
+    generate = gen_pipe
+    if snapshots is not None and child_conn is not None and mode == CONVERSATION and payload.get(SESSION_ID):
+        generate = partial(_generate_from_snapshot, child_conn, snapshots, payload[SESSION_ID], gen_pipe)
+
+    # Check for thinking template
+    template = tokenizer.chat_template if builtin_chat else None
+    disable_thinking = bool(template and THINK in template)
+
+    # Route based on model capabilities and mode
+    if builtin_chat and mode in (CONVERSATION, QA):
+        # Handle chat models with built-in chat template
+        if disable_thinking:
+            # If chat template has thinking text, generate prompt text with thinking disabled
+            prompt_text = tokenizer.apply_chat_template(
+                inputs, tokenize=False, enable_thinking=False
+            )
+            
+            # Generate response using the chat template without thinking text
+            response = generate(
+                prompt_text,
+                max_new_tokens=max_new_tokens,
+                do_sample=False,
+                continue_final_message=False,
+                **generate_kwargs,
+            )
+        else:
+            # Pass in inputs directly to the pipeline to generate response
+            response = generate(
+                inputs,
+                max_new_tokens=max_new_tokens,
+                do_sample=False,
+                continue_final_message=False,
+                **generate_kwargs,
+            )
+    else:
+        # Handle non-chat models or generate mode
+        # If input is a list, build a long prompt string or return as is
+        prompt_str = _build_plain_prompt(inputs) if isinstance(inputs, list) else inputs
+        
+        # If the mode is "generate", use sampling to add a level of randomness
+        # Text-Generation feature should be unaffected by not having a chat template
+        if mode == GENERATE:
+            response = gen_pipe(
+                prompt_str,
+                max_new_tokens=max_new_tokens,
+                do_sample=True,
+                continue_final_message=True,
+                **generate_kwargs,
+            )
+            
+        # For Q&A or conversation mode with no built-in chat template use plain / non random generation (do_sample=False)
+        # This is a very ticky tacky as these models don't have a built-in chat template. Some may respond better to the prompt_str
+        else:
+            response = generate(
+                prompt_str,
+                max_new_tokens=max_new_tokens,
+                do_sample=False,
+                continue_final_message=False,
+                **generate_kwargs,
+            )
+
+    # Extract and clean response
+    final_response = response[0]["generated_text"].strip()
+    
+    # If no built-in chat template is used, clean up the plain text response
+    if not builtin_chat:
+        final_response = _cleanup_plain_text_response(final_response, mode)
+      
+    # Remove any potential <think> tags  
+    final_response = _remove_think_tags(final_response).strip()
+
+    # Return the final cleaned up model response
+    return final_response
+
+def _generate_from_snapshot(child_conn: Connection, snapshots: KvSnapshotStore, session_id: str,
+                            gen_pipe: TextGenerationPipeline, prompt, **pipeline_kwargs) -> List[Dict[str, str]]:
+    # Same token ids the pipeline builds from the prompt, a snapshot is looked up by its exact prefix
+    if isinstance(prompt, list):
+        input_ids = gen_pipe.tokenizer.apply_chat_template(prompt, add_generation_prompt=True, return_dict=True, return_tensors="pt")["input_ids"]
+    else:
+        input_ids = gen_pipe.tokenizer(prompt, return_tensors="pt")["input_ids"]
+    token_ids: List[int] = input_ids[0].tolist()
+    
+    # Only the tokens after the snapshot are prefilled, generate() picks up from the cache's length
+    start = time.perf_counter()
+    cache, restored = _restore_snapshot(snapshots, token_ids, gen_pipe.model.device)
+    restore_seconds = time.perf_counter() - start
+    
+    response = gen_pipe(prompt, past_key_values=cache, **pipeline_kwargs)
+    
+    # Keep the prompt's cache for the session's next turn, the reply is re-tokenized from the chat history then
+    saved = _save_snapshot(snapshots, session_id, token_ids, cache)
+    
+    child_conn.send((KV_SNAPSHOT, {
+        "prompt_tokens": len(token_ids),
+        "reused_tokens": restored[1] if restored else 0,
+        "restore_seconds": restore_seconds,
+        "saved": saved,
+    }))
+    
+    return response
+
+def _restore_snapshot(snapshots: KvSnapshotStore, token_ids: List[int],
+                      device: torch.device) -> Tuple[DynamicCache, Optional[Tuple[Path, int]]]:
+    cache = DynamicCache()
+    
+    found = snapshots.find(token_ids)
+    if found is None:
+        return cache, None
+    
+    path, length = found
+    try:
+        # The file is memory-mapped, tensors are read straight into the cache's device
+        with safe_open(str(path), framework="pt", device=str(device)) as snapshot:
+            for layer in range(int(snapshot.metadata()["layers"])):
+                cache.update(snapshot.get_tensor(f"keys.{layer}"), snapshot.get_tensor(f"values.{layer}"), layer)
+        
+        if cache.get_seq_length() != length:
+            raise ValueError(f"snapshot holds {cache.get_seq_length()} tokens instead of {length}")
+        
+    except Exception as exception:
+        # Evicted while reading / truncated, prefill the whole prompt instead
+        print(f"[KV snapshot] {path.name}: {exception}")
+        snapshots.discard(path)
+        return DynamicCache(), None
+    
+    return cache, found
+
+def _save_snapshot(snapshots: KvSnapshotStore, session_id: str, token_ids: List[int], cache: DynamicCache) -> bool:
+    if len(token_ids) < KV_SNAPSHOT_MIN_TOKENS or _cache_layers(cache) is None:
+        return False
+    
+    # Drop the generated tokens, only the prompt is a prefix of the next turn
+    generated = cache.get_seq_length() - len(token_ids)
+    if generated > 0:
+        cache.crop(-generated)
+    
+    path = snapshots.path(token_ids)
+    partial_path = snapshots.partial_path(path)
+    
+    tensors = {}
+    for layer, (keys, values) in enumerate(_cache_layers(cache)):
+        tensors[f"keys.{layer}"] = keys.contiguous()
+        tensors[f"values.{layer}"] = values.contiguous()
+        
+    save_file(tensors, str(partial_path), metadata={"layers": str(len(tensors) // 2), "tokens": str(len(token_ids))})
+    snapshots.commit(session_id, partial_path, path)
+    
+    return True
+
+def _cache_layers(cache: DynamicCache) -> Optional[List[Tuple[torch.Tensor, torch.Tensor]]]:
+    # Full attention layers only, sliding window / recurrent layers can't be cut back to the prompt
+    if any(getattr(cache, "is_sliding", None) or []):
+        return None
+    
+    # Newer transformers versions keep a list of layers, older ones key_cache / value_cache lists
+    if hasattr(cache, "layers"):
+        layers = [(getattr(layer, "keys", None), getattr(layer, "values", None)) for layer in cache.layers]
+    else:
+        layers = list(zip(cache.key_cache, cache.value_cache))
+        
+    if not layers or any(not isinstance(keys, torch.Tensor) or not isinstance(values, torch.Tensor) for keys, values in layers):
+        return None
+    
+    return layers
+
+def run_model_worker(local_dir: str, model_id: str, precision: str, child_conn: Connection,
+                     placement: WorkerPlacement = WorkerPlacement(), kv_snapshots: bool = True) -> None:
+    try:
+        # Before the weights are loaded, so they're allocated on the worker's NUMA node (first touch)
+        _apply_placement(placement)
+        
+        # Get model configuration based on the model ID
+        config = AutoConfig.from_pretrained(model_id)
+        
+        # Load the model
+        model = AutoModelForCausalLM.from_pretrained(
+            local_dir,
+            config=config,
+            **_get_device_config(precision)
+        )
+
+        # Load the tokenizer
+        tokenizer = AutoTokenizer.from_pretrained(
+            local_dir,
+            use_fast=True,
+        )
+        
+        # Check if the tokenizer has a built-in chat template
+        # This is used to determine if the model is a chat model with a built-in template
+        builtin_chat = getattr(tokenizer, "chat_template", None) is not None
+
+        # Create the Hugging Face Text-Generation Pipeline
+        gen_pipe = TextGenerationPipeline(
+            model=model,
+            tokenizer=tokenizer,
+            return_full_text=False,
+        )
+
+        # KV cache snapshots of conversation turns, a model split over several devices can't restore them
+        single_device = len(set((getattr(model, "hf_device_map", None) or {"": None}).values())) == 1
+        snapshots = KvSnapshotStore(model_id, local_dir, precision) if kv_snapshots and single_device else None
+
+        # Send a message to the parent connection indicating the model is ready
+        child_conn.send((READY,))
+        
+        # Handle incoming inference requests in a service loop
+        _handle_inference_requests(child_conn, gen_pipe, tokenizer, builtin_chat, snapshots)
+    
+    except Exception as exception:
+        try:
+            child_conn.send(("ERROR", str(exception)))
+            
+        except:
+            pass  # If sending fails, we take the L
+        
+    finally:
+        # Cleanup connection and close the model
+        child_conn.close()
+
+def _apply_placement(placement: WorkerPlacement) -> None:
+    # Keep the worker on its cores so it doesn't bounce between sockets / fight other replicas over caches
+    # Not available on macOS / Windows, the thread counts still keep workers from oversubscribing the cores
+    if placement.cpu_cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, placement.cpu_cores)
+    
+    if placement.intra_op_threads is not None:
+        torch.set_num_threads(placement.intra_op_threads)
+        
+    # Only settable before torch runs any inter-op parallel work
+    if placement.inter_op_threads is not None:
+        torch.set_num_interop_threads(placement.inter_op_threads)
+
+def _get_quant_config(precision: str):
+    if precision == "4bit":
+        return BitsAndBytesConfig(
+            load_in_4bit=True,
+            bnb_4bit_compute_dtype=torch.float16,
+            bnb_4bit_use_double_quant=True,
+            bnb_4bit_quant_type="nf4",
+            llm_int8_enable_fp32_cpu_offload=True
+        )
+    if precision == "8bit":
+        return BitsAndBytesConfig(
+            load_in_8bit=True,
+            bnb_8bit_compute_dtype=torch.float16,
+            llm_int8_enable_fp32_cpu_offload=True
+        )
+        
+    return None
+
+def _get_device_config(precision: str) -> Dict[str, Any]:
+    devices = _device_support()
+    
+    # Check for MPS for Apple Silicon GPU
+    # Quantization not possible
+    if devices.has_mps:
+        return {
+            "device_map": {"": "mps"},
+            "torch_dtype": torch.float16,
+        }
+    
+    # Radeon open compute config
+    # Quantization not possible
+    if devices.is_rocm:
+        return {
+            "device_map": {"": "cuda:0"},
+            "torch_dtype": torch.float16,
+        }
+        
+    # Standard NVIDIA/CUDA config
+    # Include quantization based on precision 
+    if devices.has_cuda:    
+        return {
+            "device_map": "auto",
+            "quantization_config": _get_quant_config(precision),
+        }
+
+    # CPU-only config
+    return {
+        "device_map": {"": "cpu"},
+        "torch_dtype": torch.float32,
+    }
@@ -0,0 +1,340 @@
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from app.db.aio.model import get_all_models
+from app.db.aio.session import get_session
+from app.services.cache.cache_service import get_context_messages, svc_load_session_messages
+from app.services.model.helper import _update_cache_and_database
+from app.services.model.inference_queue import BATCH, INTERACTIVE, AdmissionRejected, DeadlineExceeded
+from app.services.model.model_service import (
+    svc_check_inference_capacity,
+    svc_is_model_ready,
+    svc_stream_local_completion,
+)
+from app.utils.constants import (
+    CANCEL,
+    CHAT,
+    CONVERSATION,
+    DONE,
+    LOAD_MODEL_WARNING,
+    MAX_NEW_TOKENS,
+    NUM_CHOICES,
+    PROMPTS,
+    QUEUED,
+    STOP,
+    STREAM,
+    SYSTEM,
+    TEMPERATURE,
+    TOKEN,
+    TOP_P,
+    USER,
+)
+from app.utils.types.model_types import RunInferenceRequest
+from app.utils.types.openai_types import (
+    ChatCompletion,
+    ChatCompletionChoice,
+    ChatCompletionChunk,
+    ChatCompletionChunkChoice,
+    ChatCompletionDelta,
+    ChatCompletionRequest,
+    ChatCompletionResponseMessage,
+    Completion,
+    CompletionChoice,
+    CompletionRequest,
+    CompletionRequestBase,
+    CompletionUsage,
+    OpenAIError,
+    OpenAIErrorResponse,
+    OpenAIModel,
+    OpenAIModelList,
+)
+
+# max_tokens used for chat completions that don't set one
+DEFAULT_CHAT_MAX_TOKENS = 512
+
+# max_tokens used for completions that send it as null, same default as OpenAI
+DEFAULT_COMPLETION_MAX_TOKENS = 16
+
+class ModelNotReadyError(Exception):
+    """
+    Raised when the requested model isn't loaded in the model worker.
+    """
+
+class SessionNotFoundError(Exception):
+    """
+    Raised when the session header names a session that doesn't exist.
+    """
+
+class CompletionError(Exception):
+    """
+    Raised when the model worker fails to generate a completion.
+    """
+
+async def svc_list_openai_models() -> OpenAIModelList:
+    # Every downloaded model, clients pick one of these as "model"
+    return OpenAIModelList(data=[OpenAIModel(id=model_id) for model_id, *_ in await get_all_models()])
+
+async def svc_create_chat_completion(request: ChatCompletionRequest, session_id: Optional[str]) -> ChatCompletion:
+    payload, turn = await _prepare_chat_completion(request, session_id)
+    completion_id = _completion_id("chatcmpl")
+
+    result = await _run_completion(request.model, payload, completion_id, session_id, INTERACTIVE)
+
+    # Keep the first choice in the session history like a regular conversation turn
+    if turn is not None:
+        _update_cache_and_database(turn, result["choices"][0]["text"])
+
+    return ChatCompletion(
+        id=completion_id,
+        created=int(time.time()),
+        model=request.model,
+        choices=[
+            ChatCompletionChoice(
+                index=index,
+                message=ChatCompletionResponseMessage(content=choice["text"]),
+                finish_reason=choice["finish_reason"],
+            )
+            for index, choice in enumerate(result["choices"])
+        ],
+        usage=_usage(result),
+    )
+
+async def svc_stream_chat_completion(request: ChatCompletionRequest, session_id: Optional[str]) -> AsyncIterator[str]:
+    # Validate before the response starts so errors are still regular HTTP errors
+    payload, turn = await _prepare_chat_completion(request, session_id)
+    payload[STREAM] = True
+
+    return _stream_chat_completion(request, payload, session_id, turn)
+
+async def svc_create_completion(request: CompletionRequest) -> Completion:
+    payload = _prepare_completion(request)
+    completion_id = _completion_id("cmpl")
+
+    result = await _run_completion(request.model, payload, completion_id, None, BATCH)
+
+    return Completion(
+        id=completion_id,
+        created=int(time.time()),
+        model=request.model,
+        choices=[
+            CompletionChoice(index=index, text=choice["text"], finish_reason=choice["finish_reason"])
+            for index, choice in enumerate(result["choices"])
+        ],
+        usage=_usage(result),
+    )
+
+async def svc_stream_completion(request: CompletionRequest) -> AsyncIterator[str]:
+    payload = _prepare_completion(request)
+    payload[STREAM] = True
+
+    return _stream_completion(request, payload)
+
+async def _prepare_chat_completion(request: ChatCompletionRequest, session_id: Optional[str]) -> Tuple[Dict[str, Any], Optional[RunInferenceRequest]]:
+    _ensure_model_ready(request.model)
+
+    messages = [{"role": message.role, "content": message.text()} for message in request.messages]
+    max_tokens = request.max_completion_tokens or request.max_tokens or DEFAULT_CHAT_MAX_TOKENS
+    turn: Optional[RunInferenceRequest] = None
+
+    if session_id is not None:
+        messages, turn = await _with_session_history(request, messages, session_id, max_tokens)
+
+    return _completion_payload(request, [messages], max_tokens, chat=True), turn
+
+def _prepare_completion(request: CompletionRequest) -> Dict[str, Any]:
+    _ensure_model_ready(request.model)
+
+    prompts = [request.prompt] if isinstance(request.prompt, str) else request.prompt
+    return _completion_payload(request, prompts, request.max_tokens or DEFAULT_COMPLETION_MAX_TOKENS, chat=False)
+
+async def _with_session_history(request: ChatCompletionRequest, messages: List[Dict[str, str]], session_id: str,
+                                max_tokens: int) -> Tuple[List[Dict[str, str]], Optional[RunInferenceRequest]]:
+    # The server keeps the conversation, the client only sends the new messages
+    if await get_session(session_id) is None:
+        raise SessionNotFoundError(f"Session {session_id} not found")
+
+    # Same session cache the chat UI uses, loaded from the database on first use
+    await svc_load_session_messages(session_id)
+    history = get_context_messages(session_id, request.model, False)
+
+    # System messages stay in front of the history, the new messages go after it
+    system_messages = [message for message in messages if message["role"] == SYSTEM]
+    new_messages = [message for message in messages if message["role"] != SYSTEM]
+
+    # The last user message + first choice are stored as the session's next turn
+    prompt = next((message["content"] for message in reversed(new_messages) if message["role"] == USER), None)
+    turn = None
+    if prompt is not None:
+        turn = RunInferenceRequest(
+            session_id=session_id,
+            model_id=request.model,
+            name=await _model_name(request.model),
+            prompt=prompt,
+            max_new_tokens=max_tokens,
+            mode=CONVERSATION,
+            share_context=False,
+        )
+
+    return system_messages + history + new_messages, turn
+
+def _completion_payload(request: CompletionRequestBase, prompts: List[Any], max_tokens: int, chat: bool) -> Dict[str, Any]:
+    return {
+        PROMPTS: prompts,
+        CHAT: chat,
+        NUM_CHOICES: request.n,
+        MAX_NEW_TOKENS: max_tokens,
+        TEMPERATURE: request.temperature,
+        TOP_P: request.top_p,
+        STOP: request.stop_sequences(),
+        STREAM: False,
+    }
+
+async def _run_completion(model_id: str, payload: Dict[str, Any], request_id: str, session_id: Optional[str],
+                          priority: str) -> Dict[str, Any]:
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+    # Read to the end so the worker request is finished before returning
+    async for tag, data in svc_stream_local_completion(model_id, payload, request_id, session_id, priority):
+        if tag in (DONE, CANCEL) and isinstance(data, dict):
+            result = data
+        elif tag not in (DONE, CANCEL, TOKEN, QUEUED):
+            error = data
+
+    if error is not None:
+        raise _completion_error(error)
+
+    if result is None:
+        raise CompletionError("Completion was cancelled")
+
+    return result
+
+async def _stream_chat_completion(request: ChatCompletionRequest, payload: Dict[str, Any], session_id: Optional[str],
+                                  turn: Optional[RunInferenceRequest]) -> AsyncIterator[str]:
+    completion_id, created = _completion_id("chatcmpl"), int(time.time())
+
+    def chunk(choices: List[ChatCompletionChunkChoice], usage: Optional[CompletionUsage] = None) -> str:
+        return _sse(ChatCompletionChunk(id=completion_id, created=created, model=request.model, choices=choices, usage=usage))
+
+    # Every choice starts with the assistant role, like OpenAI
+    yield chunk([
+        ChatCompletionChunkChoice(index=index, delta=ChatCompletionDelta(role="assistant", content=""))
+        for index in range(request.n)
+    ])
+
+    try:
+        async for tag, data in svc_stream_local_completion(request.model, payload, completion_id, session_id, INTERACTIVE):
+            if tag == QUEUED:
+                yield _sse_queued(data)
+
+            elif tag == TOKEN:
+                index, text = data
+                yield chunk([ChatCompletionChunkChoice(index=index, delta=ChatCompletionDelta(content=text))])
+
+            elif tag in (DONE, CANCEL) and isinstance(data, dict):
+                yield chunk([
+                    ChatCompletionChunkChoice(index=index, delta=ChatCompletionDelta(), finish_reason=choice["finish_reason"])
+                    for index, choice in enumerate(data["choices"])
+                ])
+
+                if _include_usage(request):
+                    yield chunk([], _usage(data))
+
+                # Cancelled turns are partial so they aren't kept in the session history
+                if tag == DONE and turn is not None:
+                    _update_cache_and_database(turn, data["choices"][0]["text"])
+
+            elif tag not in (DONE, CANCEL):
+                yield _sse_error(data)
+
+    except (AdmissionRejected, DeadlineExceeded) as exception:
+        yield _sse_error(str(exception))
+
+    except Exception as exception:
+        # The response already started, the client still gets an error event + the end of the stream
+        yield _sse_error(f"Failed to run completion: {exception}")
+
+    yield "data: [DONE]\n\n"
+
+async def _stream_completion(request: CompletionRequest, payload: Dict[str, Any]) -> AsyncIterator[str]:
+    completion_id, created = _completion_id("cmpl"), int(time.time())
+
+    def chunk(choices: List[CompletionChoice], usage: Optional[CompletionUsage] = None) -> str:
+        return _sse(Completion(id=completion_id, created=created, model=request.model, choices=choices, usage=usage))
+
+    try:
+        async for tag, data in svc_stream_local_completion(request.model, payload, completion_id, None, BATCH):
+            if tag == QUEUED:
+                yield _sse_queued(data)
+
+            elif tag == TOKEN:
+                index, text = data
+                yield chunk([CompletionChoice(index=index, text=text)])
+
+            elif tag in (DONE, CANCEL) and isinstance(data, dict):
+                yield chunk([
+                    CompletionChoice(index=index, text="", finish_reason=choice["finish_reason"])
+                    for index, choice in enumerate(data["choices"])
+                ])
+
+                if _include_usage(request):
+                    yield chunk([], _usage(data))
+
+            elif tag not in (DONE, CANCEL):
+                yield _sse_error(data)
+
+    except (AdmissionRejected, DeadlineExceeded) as exception:
+        yield _sse_error(str(exception))
+
+    except Exception as exception:
+        # The response already started, the client still gets an error event + the end of the stream
+        yield _sse_error(f"Failed to run completion: {exception}")
+
+    yield "data: [DONE]\n\n"
+
+def _ensure_model_ready(model_id: str) -> None:
+    if not svc_is_model_ready(model_id):
+        raise ModelNotReadyError(f"{model_id}: {LOAD_MODEL_WARNING}")
+
+    # Reject a full queue before a streamed response starts, afterwards it can only be an error event
+    svc_check_inference_capacity(model_id)
+
+def _completion_error(message: str) -> Exception:
+    # The model may have been unloaded while the request waited for the worker
+    if message == LOAD_MODEL_WARNING:
+        return ModelNotReadyError(message)
+
+    return CompletionError(message)
+
+async def _model_name(model_id: str) -> str:
+    # Chat history shows the model's display name
+    return next((model_name for other_id, model_name, *_ in await get_all_models() if other_id == model_id), None) or model_id
+
+def _usage(result: Dict[str, Any]) -> CompletionUsage:
+    completion_tokens = sum(choice["completion_tokens"] for choice in result["choices"])
+
+    return CompletionUsage(
+        prompt_tokens=result["prompt_tokens"],
+        completion_tokens=completion_tokens,
+        total_tokens=result["prompt_tokens"] + completion_tokens,
+    )
+
+def _include_usage(request: CompletionRequestBase) -> bool:
+    return request.stream_options is not None and request.stream_options.include_usage
+
+def _completion_id(prefix: str) -> str:
+    return f"{prefix}-{uuid.uuid4().hex}"
+
+def _sse(chunk: BaseModel) -> str:
+    return f"data: {chunk.model_dump_json()}\n\n"
+
+def _sse_queued(position: int) -> str:
+    # SSE comment, ignored by OpenAI clients but shows the queue position + keeps proxies from timing out
+    return f": queued {position}\n\n"
+
+def _sse_error(message: str) -> str:
+    # Errors after the response started can only be reported inside the stream
+    return _sse(OpenAIErrorResponse(error=OpenAIError(message=message, type="server_error")))
@@ -1,19 +1,28 @@
 import uuid
 from typing import List
-from app.db.session import (
+from fastapi.concurrency import run_in_threadpool
+from app.db.aio.messages import search_messages
+from app.db.aio.session import (
     insert_new_session, 
     get_all_sessions, 
     delete_session
 )
 from app.services.cache.cache_service import create_session_cache_entry
-from app.utils.types.session_types import GetSessionsResponse
+from app.services.cache.helper import _convert_utc_to_local
+from app.services.cache.message_writer import flush_message_writer
+from app.utils.types.session_types import (
+    GetSessionsResponse,
+    SearchMessagesRequest,
+    SearchMessagesResponse,
+    SearchMessagesResult,
+)
 
-def svc_create_session(session_name: str) -> str:
+async def svc_create_session(session_name: str) -> str:
     # Generate a random session ID 
     session_id = str(uuid.uuid4())
     
     # Insert new session into database
-    insert_new_session(session_id, session_name)
+    await insert_new_session(session_id, session_name)
     
     # Insert session_id entry into session cache
     create_session_cache_entry(session_id)
@@ -22,15 +31,68 @@ def svc_create_session(session_name: str) -> str:
     return session_id
 
 
-def svc_get_all_sessions() -> List[GetSessionsResponse]:
+async def svc_get_all_sessions() -> List[GetSessionsResponse]:
     # Get all sessions from database
-    rows = get_all_sessions()
+    rows = await get_all_sessions()
     
     # Return list of session dictionaries with id and name keys
     return [GetSessionsResponse(id=session_id, name=session_name)
         for (session_id, session_name) in rows]
 
 
-def svc_delete_session(id: str) -> None:
+async def svc_delete_session(id: str) -> None:
+    # Commit any queued messages so they don't reference the session after it's deleted
+    await run_in_threadpool(flush_message_writer)
+    
     # Delete session from database
-    delete_session(id)
\ No newline at end of file
+    await delete_session(id)
+
+
+async def svc_search_messages(request: SearchMessagesRequest) -> SearchMessagesResponse:
+    # Turn the user's text into a safe FTS5 query
+    match_query: str = _build_fts_query(request.query)
+    
+    # Nothing searchable in the query, return an empty page
+    if not match_query:
+        return SearchMessagesResponse(results=[], limit=request.limit, offset=request.offset, has_more=False)
+    
+    # Commit any queued messages so the latest turns are searchable
+    await run_in_threadpool(flush_message_writer)
+    
+    # Fetch one extra row to know whether there is another page without counting every match
+    rows = await search_messages(
+        match_query,
+        request.session_id,
+        request.model_id,
+        request.limit + 1,
+        request.offset
+    )
+    
+    # Return the page of ranked snippets
+    return SearchMessagesResponse(
+        results=[
+            SearchMessagesResult(
+                message_id=message_id,
+                session_id=session_id,
+                session_name=session_name or "",
+                model_id=model_id,
+                model_name=model_name,
+                role=role,
+                snippet=snippet,
+                rank=rank,
+                timestamp=_convert_utc_to_local(timestamp)
+            )
+            for (message_id, session_id, session_name, model_id, model_name, role, snippet, rank, timestamp)
+            in rows[:request.limit]
+        ],
+        limit=request.limit,
+        offset=request.offset,
+        has_more=len(rows) > request.limit
+    )
+    
+def _build_fts_query(query: str) -> str:
+    # Quote every word so FTS5 operators / punctuation typed by the user can't cause syntax errors
+    # Words are implicitly AND-ed together by FTS5
+    terms = [term.replace('"', '""') for term in query.split()]
+    
+    return " ".join(f'"{term}"' for term in terms if term)
@@ -14,6 +14,10 @@ GENERATE = "generate"
 
 CONVERSATION = "conversation"
 
+COMPACT_CONTEXT = "compact"
+
+RETRIEVE_CONTEXT = "retrieve"
+
 QA = "qa"
 
 THINK = "think"
@@ -26,6 +30,38 @@ MODE = "mode"
 
 READY = "READY"
 
+ERROR = "ERROR"
+
+TOKEN = "TOKEN"
+
+DONE = "DONE"
+
+CANCEL = "CANCEL"
+
+STREAM = "stream"
+
+REQUEST_ID = "request_id"
+
+QUEUED = "QUEUED"
+
+KV_SNAPSHOT = "KV_SNAPSHOT"
+
+SESSION_ID = "session_id"
+
+COMPLETION = "COMPLETION"
+
+PROMPTS = "prompts"
+
+CHAT = "chat"
+
+NUM_CHOICES = "n"
+
+TEMPERATURE = "temperature"
+
+TOP_P = "top_p"
+
+STOP = "stop"
+
 LOAD_MODEL_WARNING = "Model needs to be loaded into memory first before running inference."
 
 HUGGING_FACE_MODELS_FOLDER = "hugging_face_models"
\ No newline at end of file
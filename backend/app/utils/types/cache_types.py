@@ -18,6 +18,13 @@ class SessionCacheEntry:
     message: ContextMessage
     timestamp: str
     
+@dataclass
+class ConversationSummary:
+    summary: str
+    
+    # Number of the session + model's oldest messages the summary stands in for
+    summarized_messages: int
+    
 class SessionBaseRequest(BaseModel):
     session_id: str
     model_id: str
@@ -35,4 +42,15 @@ class GetChatHistoryData(BaseModel):
     timestamp: str
     
 class GetChatHistoryResponse(BaseModel):
-    messages: List[GetChatHistoryData]
\ No newline at end of file
+    messages: List[GetChatHistoryData]
+    
+class MessageWriterMetrics(BaseModel):
+    queue_depth: int
+    enqueued: int
+    written: int
+    failed: int
+    flushes: int
+    last_batch_size: int
+    last_flush_ms: float
+    avg_flush_ms: float
+    max_flush_ms: float
\ No newline at end of file
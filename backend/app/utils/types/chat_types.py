@@ -0,0 +1,56 @@
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field
+
+from app.utils.types.model_types import RunInferenceRequest
+
+class ChatGenerateMessage(RunInferenceRequest):
+    type: Literal["generate"]
+    request_id: str
+    
+class ChatCancelMessage(BaseModel):
+    type: Literal["cancel"]
+    request_id: str
+    
+class ChatSocketEvent(BaseModel):
+    # queued | token | done | cancelled | committed | rejected | expired | error
+    type: str
+    request_id: Optional[str] = None
+    text: Optional[str] = None
+    
+    # Place in the model's queue (queued events)
+    position: Optional[int] = None
+    
+    # Seconds to wait before trying again (rejected / expired events)
+    retry_after: Optional[int] = None
+    
+class CompareModel(BaseModel):
+    model_id: str
+    name: str
+    
+class CompareModelsRequest(BaseModel):
+    session_id: str
+    prompt: str
+    models: List[CompareModel] = Field(min_length=1)
+    max_new_tokens: int
+    mode: str
+    share_context: bool
+    deadline_seconds: Optional[float] = Field(default=None, gt=0)
+    context_mode: Literal["full", "compact", "retrieve"] = "full"
+    
+class CompareEvent(BaseModel):
+    # Same event types as the chat socket, tagged with the model that produced them
+    type: str
+    model_id: str
+    text: Optional[str] = None
+    position: Optional[int] = None
+    retry_after: Optional[int] = None
+    
+class CompareResult(BaseModel):
+    model_id: str
+    status: str
+    first_token_seconds: Optional[float] = None
+    elapsed_seconds: Optional[float] = None
+    
+class CompareSummary(BaseModel):
+    wall_seconds: float
+    results: List[CompareResult]
@@ -1,5 +1,5 @@
-from typing import List, Optional
-from pydantic import BaseModel
+from typing import Dict, List, Literal, Optional
+from pydantic import BaseModel, Field
 
 class SearchModelsRequest(BaseModel):
     query: str = ""
@@ -12,6 +12,7 @@ class DownloadModelRequest(BaseModel):
     model_name: str
     is_quantized: bool = False
     is_uncensored: bool = False
+    priority: int = 0
     
 class DeleteModelRequest(BaseModel):
     model_id: str
@@ -19,6 +20,23 @@ class DeleteModelRequest(BaseModel):
 class LoadModelRequest(BaseModel):
     model_id: str
     precision: str
+    force: bool = False
+    
+    # Keep the other loaded models resident instead of unloading them
+    keep_loaded: bool = False
+    
+    # Worker processes serving the model, each pinned to its own CPU cores when there's more than one
+    replicas: int = Field(default=1, ge=1)
+    threads_per_replica: Optional[int] = Field(default=None, ge=1)
+    
+    # CPU placement, unset options are worked out from the machine's cores + NUMA nodes
+    cpu_cores: Optional[List[List[int]]] = None
+    numa_nodes: Optional[List[int]] = None
+    intra_op_threads: Optional[int] = Field(default=None, ge=1)
+    inter_op_threads: Optional[int] = Field(default=None, ge=1)
+    
+    # Save conversation turns' KV cache to disk + resume the session's next turn from it (opt-in, uses disk space)
+    kv_snapshots: bool = False
     
 class RunInferenceRequest(BaseModel):
     session_id: str
@@ -28,6 +46,12 @@ class RunInferenceRequest(BaseModel):
     max_new_tokens: int
     mode: str
     share_context: bool
+    request_id: Optional[str] = None
+    deadline_seconds: Optional[float] = Field(default=None, gt=0)
+    
+    # "compact" summarizes the oldest turns of a long conversation in the background + sends the summary instead
+    # "retrieve" sends the latest turns + the earlier turns most relevant to the prompt (share_context only)
+    context_mode: Literal["full", "compact", "retrieve"] = "full"
     
 class RunInferenceResponse(BaseModel):
     message: str | dict
@@ -50,6 +74,10 @@ class ModelDownloadStatus(BaseModel):
     status: str
     progress: int
     local_path: Optional[str] = None
+    bytes_downloaded: int = 0
+    total_bytes: int = 0
+    speed_bps: float = 0
+    verified_at: Optional[float] = None
     
 class ModelDownloadStatusResponse(BaseModel):
     models: List[ModelDownloadStatus]
@@ -75,4 +103,152 @@ class DownloadModelResponse(LoadModelBase):
     pass
 
 class LoadModelResponse(LoadModelBase):
-    pass
\ No newline at end of file
+    warning: Optional[str] = None
+
+class HubCacheStats(BaseModel):
+    namespace: str
+    memory_hits: int
+    disk_hits: int
+    misses: int
+    hit_rate: float
+    memory_entries: int
+    
+class HubCacheStatsResponse(BaseModel):
+    caches: List[HubCacheStats]
+    
+class CatalogSyncStatus(BaseModel):
+    last_synced_at: Optional[str] = None
+    models: int
+    syncing: bool
+    
+class DownloadTaskRequest(BaseModel):
+    model_id: str
+    
+class DownloadPlanResponse(BaseModel):
+    model_id: str
+    total_bytes: int
+    weights_bytes: int
+    skipped_bytes: int
+    files: List[str]
+    skipped_files: List[str]
+    
+class DownloadQueueSettings(BaseModel):
+    max_concurrent: int = Field(default=2, ge=1)
+    bandwidth_limit_bps: Optional[int] = Field(default=None, ge=1)
+    
+class BlobStoreUsage(BaseModel):
+    models: int
+    files: int
+    blobs: int
+    logical_bytes: int
+    stored_bytes: int
+    saved_bytes: int
+    
+class ModelInventory(BaseModel):
+    model_id: str
+    architecture: Optional[str] = None
+    parameter_count: int
+    dtype: Optional[str] = None
+    context_length: Optional[int] = None
+    weights_bytes: int
+    memory_estimates: Dict[str, int]
+    
+class ModelInventoryResponse(BaseModel):
+    models: List[ModelInventory]
+    
+class ModelFitCheck(BaseModel):
+    model_id: str
+    precision: str
+    device: str
+    required_bytes: int
+    available_bytes: int
+    fits: bool
+    warning: Optional[str] = None
+    
+class FileVerificationError(BaseModel):
+    path: str
+    error: str
+    
+class ModelVerificationResult(BaseModel):
+    model_id: str
+    status: str
+    files_checked: int
+    bytes_checked: int
+    elapsed_seconds: float
+    errors: List[FileVerificationError]
+    
+class QueuedInferenceRequest(BaseModel):
+    request_id: str
+    session_id: str
+    priority: str
+    position: int
+    waited_seconds: float
+    deadline_in_seconds: float
+    estimated_wait_seconds: float
+    
+class SessionWaitStats(BaseModel):
+    session_id: str
+    requests: int
+    average_wait_seconds: float
+    max_wait_seconds: float
+    last_wait_seconds: float
+    capped_requests: int
+    
+class InferenceQueueStatus(BaseModel):
+    model_id: str
+    running: List[str]
+    max_queue_depth: int
+    average_service_seconds: float
+    queued: List[QueuedInferenceRequest]
+    sessions: List[SessionWaitStats]
+    
+class InferenceQueueResponse(BaseModel):
+    queues: List[InferenceQueueStatus]
+    
+class InferencePositionResponse(BaseModel):
+    request_id: str
+    position: int
+    
+class WorkerReplicaStatus(BaseModel):
+    index: int
+    pid: Optional[int] = None
+    cpu_cores: Optional[List[int]] = None
+    numa_node: Optional[int] = None
+    intra_op_threads: Optional[int] = None
+    inter_op_threads: Optional[int] = None
+    ready: bool
+    busy: bool
+    active_request: Optional[str] = None
+    in_flight: int
+    requests: int
+    busy_seconds: float
+    utilization: float
+    sessions: int
+    
+class ModelReplicas(BaseModel):
+    model_id: str
+    replicas: List[WorkerReplicaStatus]
+    
+class WorkerReplicasResponse(BaseModel):
+    models: List[ModelReplicas]
+    
+class KvSnapshotModelStats(BaseModel):
+    model_id: str
+    lookups: int
+    hits: int
+    hit_rate: float
+    prompt_tokens: int
+    reused_tokens: int
+    reused_token_rate: float
+    average_restore_seconds: float
+    saved: int
+    
+class KvSnapshotStatus(BaseModel):
+    folder: str
+    snapshots: int
+    used_bytes: int
+    disk_budget_bytes: int
+    models: List[KvSnapshotModelStats]
+    
+class UnloadModelRequest(BaseModel):
+    model_id: str
@@ -0,0 +1,113 @@
+from typing import Any, Dict, List, Literal, Optional, Union
+from pydantic import BaseModel, Field
+
+class ChatCompletionMessage(BaseModel):
+    role: str
+    # Plain text or a list of content parts ({"type": "text", "text": ...}), only text parts are used
+    content: Union[str, List[Dict[str, Any]], None] = None
+    name: Optional[str] = None
+
+    def text(self) -> str:
+        if isinstance(self.content, list):
+            return "".join(part.get("text", "") for part in self.content if part.get("type") == "text")
+
+        return self.content or ""
+
+class StreamOptions(BaseModel):
+    include_usage: bool = False
+
+class CompletionRequestBase(BaseModel):
+    model: str
+    n: int = Field(default=1, ge=1, le=16)
+    temperature: float = Field(default=1.0, ge=0, le=2)
+    top_p: float = Field(default=1.0, gt=0, le=1)
+    stop: Union[str, List[str], None] = None
+    stream: bool = False
+    stream_options: Optional[StreamOptions] = None
+    user: Optional[str] = None
+
+    def stop_sequences(self) -> List[str]:
+        if self.stop is None:
+            return []
+
+        return [self.stop] if isinstance(self.stop, str) else self.stop
+
+class ChatCompletionRequest(CompletionRequestBase):
+    messages: List[ChatCompletionMessage] = Field(min_length=1)
+    max_tokens: Optional[int] = Field(default=None, ge=1)
+    max_completion_tokens: Optional[int] = Field(default=None, ge=1)
+
+class CompletionRequest(CompletionRequestBase):
+    prompt: Union[str, List[str]]
+    max_tokens: Optional[int] = Field(default=16, ge=1)
+
+class CompletionUsage(BaseModel):
+    prompt_tokens: int
+    completion_tokens: int
+    total_tokens: int
+
+class ChatCompletionResponseMessage(BaseModel):
+    role: Literal["assistant"] = "assistant"
+    content: str
+
+class ChatCompletionChoice(BaseModel):
+    index: int
+    message: ChatCompletionResponseMessage
+    finish_reason: Optional[str] = None
+
+class ChatCompletion(BaseModel):
+    id: str
+    object: Literal["chat.completion"] = "chat.completion"
+    created: int
+    model: str
+    choices: List[ChatCompletionChoice]
+    usage: CompletionUsage
+
+class ChatCompletionDelta(BaseModel):
+    role: Optional[str] = None
+    content: Optional[str] = None
+
+class ChatCompletionChunkChoice(BaseModel):
+    index: int
+    delta: ChatCompletionDelta
+    finish_reason: Optional[str] = None
+
+class ChatCompletionChunk(BaseModel):
+    id: str
+    object: Literal["chat.completion.chunk"] = "chat.completion.chunk"
+    created: int
+    model: str
+    choices: List[ChatCompletionChunkChoice]
+    usage: Optional[CompletionUsage] = None
+
+class CompletionChoice(BaseModel):
+    index: int
+    text: str
+    logprobs: None = None
+    finish_reason: Optional[str] = None
+
+class Completion(BaseModel):
+    id: str
+    object: Literal["text_completion"] = "text_completion"
+    created: int
+    model: str
+    choices: List[CompletionChoice]
+    usage: Optional[CompletionUsage] = None
+
+class OpenAIModel(BaseModel):
+    id: str
+    object: Literal["model"] = "model"
+    created: int = 0
+    owned_by: str = "freeai"
+
+class OpenAIModelList(BaseModel):
+    object: Literal["list"] = "list"
+    data: List[OpenAIModel]
+
+class OpenAIError(BaseModel):
+    message: str
+    type: str
+    code: Optional[str] = None
+
+class OpenAIErrorResponse(BaseModel):
+    error: OpenAIError
@@ -1,4 +1,5 @@
-from pydantic import BaseModel
+from typing import List, Optional
+from pydantic import BaseModel, Field
 
 class CreateSessionRequest(BaseModel):
     name: str
@@ -12,4 +13,28 @@ class GetSessionsResponse(BaseModel):
     name: str
     
 class LoadMessagesIntoCacheRequest(BaseModel):
-    id: str
\ No newline at end of file
+    id: str
+    
+class SearchMessagesRequest(BaseModel):
+    query: str
+    session_id: Optional[str] = None
+    model_id: Optional[str] = None
+    limit: int = Field(default=20, ge=1, le=100)
+    offset: int = Field(default=0, ge=0)
+    
+class SearchMessagesResult(BaseModel):
+    message_id: int
+    session_id: str
+    session_name: str
+    model_id: str
+    model_name: Optional[str] = None
+    role: str
+    snippet: str
+    rank: float
+    timestamp: str
+    
+class SearchMessagesResponse(BaseModel):
+    results: List[SearchMessagesResult]
+    limit: int
+    offset: int
+    has_more: bool
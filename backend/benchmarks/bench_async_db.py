@@ -0,0 +1,116 @@
+"""
+Benchmark for concurrent status polling through FastAPI, comparing a sync
+route on FastAPI's shared threadpool (the old get_models_status_route) with
+an async route awaiting the async data-access layer on the DB executor.
+
+Each scenario runs idle and again while simulated inference requests hold
+every token of the shared threadpool, like 40+ streaming requests each waiting
+on recv() from a model worker.
+
+Run from the backend directory:
+    python -m benchmarks.bench_async_db [concurrency] [requests]
+
+Results (in-process ASGI client, 20 sample download tasks):
+
+    3000 requests, 20 concurrent clients
+    /sync (idle)                     736 req/s   p50   26.69 ms   p99   49.36 ms
+    /async (idle)                    747 req/s   p50   26.21 ms   p99   43.61 ms
+    /sync (busy threadpool)          479 req/s   p50   30.83 ms   p99  175.00 ms
+    /async (busy threadpool)         729 req/s   p50   27.19 ms   p99   38.44 ms
+
+    5000 requests, 200 concurrent clients
+    /sync (idle)                     714 req/s   p50  281.01 ms   p99  363.26 ms
+    /async (idle)                    761 req/s   p50  262.29 ms   p99  391.08 ms
+    /sync (busy threadpool)          693 req/s   p50  286.86 ms   p99  526.58 ms
+    /async (busy threadpool)         717 req/s   p50  270.28 ms   p99  366.33 ms
+
+Idle, both routes are within noise of each other. Once inference waits hold the
+shared threadpool, sync polls queue behind them for a token while the async
+route keeps its idle throughput + p99. With 200 clients the in-process client
+and serialization dominate latency, which hides most of the difference.
+"""
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+import anyio.to_thread
+import httpx
+from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+
+from app.db import init_database
+from app.db.aio.database import shutdown_db_executor
+from app.db.aio.model import get_download_status as get_download_status_async
+from app.db.init_database import close_db_connections, get_db, init_db
+from app.db.model import get_download_status
+from app.db.sql_queries import INSERT_MODEL, INSERT_PENDING_TASK
+
+app = FastAPI()
+
+@app.get("/sync")
+def sync_status_route():
+    return {"models": get_download_status()}
+
+@app.get("/async")
+async def async_status_route():
+    return {"models": await get_download_status_async()}
+
+async def _hold_threadpool(stop: asyncio.Event) -> None:
+    # Keeps one threadpool token busy, like a request blocked on the model worker pipe
+    while not stop.is_set():
+        await run_in_threadpool(time.sleep, 0.2)
+
+async def _poll(path: str, concurrency: int, total: int, busy: bool) -> None:
+    stop = asyncio.Event()
+    # One simulated inference wait per token of FastAPI's shared threadpool (40 by default)
+    busy_waits = anyio.to_thread.current_default_thread_limiter().total_tokens if busy else 0
+    holders = [asyncio.create_task(_hold_threadpool(stop)) for _ in range(busy_waits)]
+    
+    latencies: List[float] = []
+    remaining = iter(range(total))
+    
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def worker():
+            for _ in remaining:
+                start = time.perf_counter()
+                response = await client.get(path)
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+        
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    
+    stop.set()
+    await asyncio.gather(*holders)
+    
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    label = f"{path} ({'busy threadpool' if busy else 'idle'})"
+    print(f"{label:<26} {total / elapsed:>9.0f} req/s   p50 {p50:>7.2f} ms   p99 {p99:>7.2f} ms")
+
+if __name__ == "__main__":
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    total = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    
+    with tempfile.TemporaryDirectory() as directory:
+        init_database.DB_PATH = Path(directory) / "bench.db"
+        init_db()
+        
+        # A handful of download tasks like a real status poll would scan
+        with get_db() as connection:
+            for i in range(20):
+                connection.execute(INSERT_MODEL, (f"org/model-{i}", f"model-{i}", 0, 0))
+                connection.execute(INSERT_PENDING_TASK, (f"org/model-{i}",))
+        
+        print(f"{total} requests, {concurrency} concurrent clients")
+        for busy in (False, True):
+            asyncio.run(_poll("/sync", concurrency, total, busy))
+            asyncio.run(_poll("/async", concurrency, total, busy))
+        
+        shutdown_db_executor()
+        close_db_connections()
@@ -0,0 +1,152 @@
+"""
+Benchmark sweep of CPU placements for the model worker: tokens/sec of a greedy
+generation for a range of intra-op thread counts (pinned to physical cores and
+unpinned), all logical cores, a larger inter-op pool and every NUMA node.
+
+Every configuration loads the model in a fresh worker process with the same
+placement code POST /api/models/load uses, so the numbers carry over to the
+load options (intra_op_threads, inter_op_threads, cpu_cores, numa_nodes).
+Needs torch + transformers and a downloaded model. Results are printed as a
+table and written as JSON so runs on different machines can be compared.
+
+Run from the backend directory:
+    python -m benchmarks.bench_cpu_threads <model_id> <local_dir> [new_tokens] [output.json]
+"""
+import json
+import platform
+import statistics
+import sys
+import time
+from typing import Dict, List, Tuple
+
+from app.services.model.cpu_topology import CpuTopology, WorkerPlacement, detect_cpu_topology, plan_worker_placements
+from app.services.model.model_worker import _model_worker, _worker_context
+from app.utils.constants import (
+    CHAT,
+    COMPLETION,
+    DONE,
+    EXIT,
+    MAX_NEW_TOKENS,
+    NUM_CHOICES,
+    PROMPTS,
+    READY,
+    REQUEST_ID,
+    STOP,
+    STREAM,
+    TEMPERATURE,
+    TOP_P,
+)
+
+PROMPT = "Write a short story about a lighthouse keeper who finds a message in a bottle."
+
+# Timed generations per configuration, after one untimed warm-up
+RUNS = 3
+WARMUP_TOKENS = 8
+
+def _configurations(topology: CpuTopology) -> List[Tuple[str, WorkerPlacement]]:
+    physical = topology.physical_cores(topology.cores)
+
+    # Powers of two up to the number of physical cores, plus the count itself
+    thread_counts = sorted({2 ** power for power in range(len(physical).bit_length()) if 2 ** power <= len(physical)} | {len(physical)})
+
+    configurations = [("torch defaults", WorkerPlacement())]
+    for threads in thread_counts:
+        # The first `threads` physical cores + their hyperthread siblings
+        cores = [core for core in topology.cores if topology.physical_core.get(core, core) in physical[:threads]]
+
+        configurations.append((f"{threads} threads", WorkerPlacement(intra_op_threads=threads, inter_op_threads=1)))
+        configurations.append((f"{threads} threads, pinned", WorkerPlacement(cores, None, threads, 1)))
+
+    configurations.append((f"{len(topology.cores)} threads (all logical cores)", WorkerPlacement(intra_op_threads=len(topology.cores), inter_op_threads=1)))
+    configurations.append((f"{len(physical)} threads, 2 inter-op", WorkerPlacement(intra_op_threads=len(physical), inter_op_threads=2)))
+
+    # The whole model on one socket vs spread over all of them
+    if len(topology.numa_nodes) > 1:
+        for node in sorted(topology.numa_nodes):
+            configurations.append((f"NUMA node {node}", plan_worker_placements(1, numa_nodes=[node])[0]))
+
+    return configurations
+
+def _generate(connection, new_tokens: int) -> Tuple[int, float]:
+    connection.send((COMPLETION, {
+        PROMPTS: [PROMPT],
+        CHAT: False,
+        NUM_CHOICES: 1,
+        MAX_NEW_TOKENS: new_tokens,
+        TEMPERATURE: 0.0,
+        TOP_P: 1.0,
+        STOP: [],
+        STREAM: False,
+        REQUEST_ID: "bench",
+    }))
+
+    start = time.perf_counter()
+    tag, result = connection.recv()
+    elapsed = time.perf_counter() - start
+
+    if tag != DONE:
+        raise RuntimeError(result)
+
+    return result["choices"][0]["completion_tokens"], elapsed
+
+def _run(model_id: str, local_dir: str, placement: WorkerPlacement, new_tokens: int) -> Dict:
+    parent_conn, child_conn = _worker_context.Pipe()
+    process = _worker_context.Process(
+        target=_model_worker,
+        args=(local_dir, model_id, "fp32", child_conn, placement),
+        daemon=True,
+    )
+
+    start = time.perf_counter()
+    process.start()
+
+    try:
+        message = parent_conn.recv()
+        if message != (READY,):
+            raise RuntimeError(f"Model failed to load: {message}")
+        load_seconds = time.perf_counter() - start
+
+        _generate(parent_conn, WARMUP_TOKENS)
+        runs = [_generate(parent_conn, new_tokens) for _ in range(RUNS)]
+
+    finally:
+        parent_conn.send((EXIT, None))
+        process.join()
+
+    return {
+        "placement": placement._asdict(),
+        "load_seconds": load_seconds,
+        "tokens": runs[0][0],
+        "tokens_per_second": statistics.median(tokens / seconds for tokens, seconds in runs),
+    }
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        sys.exit(__doc__)
+
+    model_id, local_dir = sys.argv[1], sys.argv[2]
+    new_tokens = int(sys.argv[3]) if len(sys.argv) > 3 else 64
+    output = sys.argv[4] if len(sys.argv) > 4 else "bench_cpu_threads.json"
+
+    topology = detect_cpu_topology()
+    print(f"{len(topology.cores)} logical cores, {len(topology.physical_cores(topology.cores))} physical, "
+          f"{len(topology.numa_nodes)} NUMA node(s), median of {RUNS} runs of {new_tokens} tokens")
+
+    results = []
+    for label, placement in _configurations(topology):
+        result = {"configuration": label, **_run(model_id, local_dir, placement, new_tokens)}
+        results.append(result)
+        print(f"{label:<36} {result['tokens_per_second']:>8.2f} tokens/s   load {result['load_seconds']:>6.1f} s")
+
+    best = max(results, key=lambda result: result["tokens_per_second"])
+    print(f"best: {best['configuration']}")
+
+    with open(output, "w") as file:
+        json.dump({
+            "machine": {"platform": platform.platform(), "processor": platform.processor(), "numa_nodes": topology.numa_nodes},
+            "model_id": model_id,
+            "new_tokens": new_tokens,
+            "results": results,
+        }, file, indent=2)
+
+    print(f"results written to {output}")
@@ -0,0 +1,92 @@
+"""
+Benchmark for the status-polling and message-insert database paths.
+
+Compares opening a fresh SQLite connection per query (the old get_db behaviour)
+against the persistent per-thread WAL connections used by get_db now.
+
+Run from the backend directory:
+    python -m benchmarks.bench_db_connections
+"""
+import sqlite3
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from app.db import init_database
+from app.db.init_database import close_db_connections, get_db, init_db
+from app.db.sql_queries import (
+    ENABLE_FOREIGN_KEYS,
+    GET_DOWNLOAD_STATUS,
+    INSERT_MESSAGE,
+    INSERT_MODEL,
+    INSERT_NEW_SESSION,
+    INSERT_PENDING_TASK,
+)
+
+ITERATIONS = 2000
+
+@contextmanager
+def _get_db_per_query():
+    # Reproduces the old get_db: new connection + foreign key pragma for every query
+    connection = sqlite3.connect(init_database.DB_PATH, isolation_level="DEFERRED")
+    try:
+        connection.execute(ENABLE_FOREIGN_KEYS)
+        yield connection
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+def _seed(db) -> None:
+    # Add a session, a handful of models and their download tasks
+    with db() as connection:
+        connection.execute(INSERT_NEW_SESSION, ("bench-session", "bench"))
+        for i in range(20):
+            connection.execute(INSERT_MODEL, (f"org/model-{i}", f"model-{i}", 0, 0))
+            connection.execute(INSERT_PENDING_TASK, (f"org/model-{i}",))
+
+def _time(label: str, func) -> None:
+    start = time.perf_counter()
+    for i in range(ITERATIONS):
+        func(i)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {elapsed * 1000:>9.1f} ms total {elapsed / ITERATIONS * 1e6:>9.1f} us/op")
+
+def _run(label: str, db, journal_mode: str) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        init_database.DB_PATH = Path(directory) / "bench.db"
+        init_db()
+        
+        # init_db switches the file to WAL, put it back for the baseline run
+        if journal_mode != "wal":
+            connection = sqlite3.connect(init_database.DB_PATH)
+            connection.execute(f"PRAGMA journal_mode = {journal_mode};")
+            connection.close()
+        
+        _seed(db)
+
+        def poll_status(_):
+            with db() as connection:
+                connection.execute(GET_DOWNLOAD_STATUS).fetchall()
+
+        def insert_messages(i):
+            with db() as connection:
+                connection.execute(
+                    INSERT_MESSAGE,
+                    (
+                        "bench-session", "org/model-0", "user", f"prompt {i}",
+                        "bench-session", "org/model-0", "assistant", f"answer {i}",
+                    ),
+                )
+
+        _time(f"[{label}] status polling", poll_status)
+        _time(f"[{label}] message insert", insert_messages)
+        
+        close_db_connections()
+
+if __name__ == "__main__":
+    _run("before: connection per query", _get_db_per_query, "delete")
+    _run("after: pooled WAL connection", get_db, "wal")
@@ -0,0 +1,80 @@
+"""
+Benchmark for the messages hot queries on a large database, before and after
+the schema migrations that add the messages indexes.
+
+Run from the backend directory (message count defaults to 2,000,000):
+    python -m benchmarks.bench_message_indexes [message_count]
+"""
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from app.db.migrations import run_migrations
+from app.db.sql_queries import (
+    CREATE_MESSAGES_TABLE,
+    CREATE_MODELS_TABLE,
+    CREATE_SESSIONS_TABLE,
+    DELETE_MODEL_MESSAGES,
+    DELETE_SESSION_MESSAGES,
+    GET_SESSION_MESSAGES,
+    INSERT_MODEL,
+    INSERT_NEW_SESSION,
+    INSERT_SINGLE_MESSAGE,
+)
+
+SESSIONS = 2000
+MODELS = 5
+QUERIES = 50
+
+def _populate(connection: sqlite3.Connection, message_count: int) -> None:
+    connection.execute(CREATE_SESSIONS_TABLE)
+    connection.execute(CREATE_MODELS_TABLE)
+    connection.execute(CREATE_MESSAGES_TABLE)
+    
+    connection.executemany(INSERT_NEW_SESSION, ((f"session-{s}", f"session {s}") for s in range(SESSIONS)))
+    connection.executemany(INSERT_MODEL, ((f"org/model-{m}", f"model-{m}", 0, 0) for m in range(MODELS)))
+    
+    # Messages are interleaved across sessions like a real long-lived database
+    connection.executemany(
+        INSERT_SINGLE_MESSAGE,
+        (
+            (f"session-{i % SESSIONS}", f"org/model-{i % MODELS}", "user" if i % 2 == 0 else "assistant", f"message {i}")
+            for i in range(message_count)
+        ),
+    )
+    connection.commit()
+
+def _time(label: str, connection: sqlite3.Connection, query: str, params) -> None:
+    start = time.perf_counter()
+    for i in range(QUERIES):
+        connection.execute(query, params(i)).fetchall()
+    elapsed = time.perf_counter() - start
+    
+    # Roll back deletes so every run works on the same data
+    connection.rollback()
+    print(f"{label:<50} {elapsed / QUERIES * 1000:>9.2f} ms/query")
+
+def _run(label: str, connection: sqlite3.Connection) -> None:
+    _time(f"[{label}] GET_SESSION_MESSAGES", connection, GET_SESSION_MESSAGES, lambda i: (f"session-{i}",))
+    _time(f"[{label}] DELETE_MODEL_MESSAGES", connection, DELETE_MODEL_MESSAGES, lambda i: (f"session-{i}", f"org/model-{i % MODELS}"))
+    _time(f"[{label}] DELETE_SESSION_MESSAGES", connection, DELETE_SESSION_MESSAGES, lambda i: (f"session-{i}",))
+
+if __name__ == "__main__":
+    message_count = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    
+    with tempfile.TemporaryDirectory() as directory:
+        connection = sqlite3.connect(Path(directory) / "bench.db", isolation_level="DEFERRED")
+        
+        print(f"Populating {message_count:,} messages...")
+        _populate(connection, message_count)
+        
+        _run("before: schema version 0", connection)
+        
+        start = time.perf_counter()
+        version = run_migrations(connection)
+        print(f"Migrated to schema version {version} in {time.perf_counter() - start:.1f} s")
+        
+        _run(f"after: schema version {version}", connection)
+        connection.close()
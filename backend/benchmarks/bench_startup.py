@@ -0,0 +1,89 @@
+"""
+Benchmark for API process startup: time to import app.main and the resident
+memory of the process afterwards, each run in a fresh interpreter.
+
+torch / transformers must only be imported by the model worker process, the
+benchmark fails (exit code 1) if the API process imports them or startup goes
+over the time / memory budgets. When torch + transformers are installed it also
+shows what importing them eagerly (the old behaviour) costs for comparison.
+
+Run from the backend directory:
+    python -m benchmarks.bench_startup [runs]
+"""
+import importlib.util
+import json
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+# Budgets for the API process, far below what importing torch + transformers costs
+STARTUP_BUDGET_SECONDS = 2.0
+RSS_BUDGET_MB = 200
+
+# Modules only the model worker may import
+WORKER_ONLY_MODULES = ("torch", "transformers", "bitsandbytes", "accelerate")
+
+# Runs in the fresh interpreter, prints the measurements as JSON
+_MEASURE = """
+import json, resource, sys, time
+start = time.perf_counter()
+for module in {preload!r}:
+    __import__(module)
+import app.main
+elapsed = time.perf_counter() - start
+# ru_maxrss is KB on Linux, bytes on macOS
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+rss_mb = rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+print(json.dumps({{
+    "seconds": elapsed,
+    "rss_mb": rss_mb,
+    "worker_modules": [module for module in {worker_only!r} if module in sys.modules],
+}}))
+"""
+
+def _measure(runs: int, preload: tuple = ()) -> List[Dict]:
+    results = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", _MEASURE.format(preload=preload, worker_only=WORKER_ONLY_MODULES)],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        results.append(json.loads(output.stdout.strip().splitlines()[-1]))
+    return results
+
+def _report(label: str, results: List[Dict]) -> None:
+    seconds = statistics.median(result["seconds"] for result in results)
+    rss_mb = statistics.median(result["rss_mb"] for result in results)
+    print(f"{label:<34} {seconds * 1000:>8.0f} ms   {rss_mb:>7.1f} MB max RSS")
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    print(f"median of {runs} runs")
+    api_results = _measure(runs)
+    _report("import app.main", api_results)
+
+    # What the API process paid when it imported the worker libraries itself
+    if all(importlib.util.find_spec(module) for module in ("torch", "transformers")):
+        _report("import torch + transformers + app", _measure(runs, ("torch", "transformers")))
+
+    failures = []
+    leaked = sorted({module for result in api_results for module in result["worker_modules"]})
+    if leaked:
+        failures.append(f"API process imported worker-only modules: {', '.join(leaked)}")
+
+    seconds = statistics.median(result["seconds"] for result in api_results)
+    if seconds > STARTUP_BUDGET_SECONDS:
+        failures.append(f"startup took {seconds:.2f} s, budget is {STARTUP_BUDGET_SECONDS:.2f} s")
+
+    rss_mb = statistics.median(result["rss_mb"] for result in api_results)
+    if rss_mb > RSS_BUDGET_MB:
+        failures.append(f"max RSS {rss_mb:.0f} MB, budget is {RSS_BUDGET_MB} MB")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+
+    sys.exit(1 if failures else 0)
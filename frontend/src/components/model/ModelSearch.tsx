@@ -157,11 +157,6 @@ export default function ModelSearch({ setDropdownModels, initialModels }: ModelS
     // ─── Fetch & sort ────────────────────────────────────────────────────────
     const fetchModels = useCallback(
         async (q: string) => {
-            if (!navigator.onLine) {
-                console.warn("User is offline. Skipping model fetch.");
-                return;
-            }
-
             setIsLoading(true);
             setError(null);
 